@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+State cache benchmark: tool spawns for repeated status collection
+
+Collects the status report --rounds times in quick succession, the way
+the GUI refreshes its pages, once with the state cache disabled and once
+with it enabled. Every fake tool invocation is logged, so the spawn
+counts are exact.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import fake_env, make_fake_sysfs, make_fake_tools, temp_dir
+
+
+def count_lines(path: str) -> int:
+    """Return the number of lines in a file, 0 if it doesn't exist"""
+    try:
+        with open(path, 'r') as f:
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+
+def main():
+    """Run the cache benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20, help='status collections per run')
+    parser.add_argument('--delay', type=float, default=0.02, help='seconds each fake tool call sleeps')
+    args = parser.parse_args()
+    
+    with temp_dir() as workdir:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        sysfs_root = make_fake_sysfs(os.path.join(workdir, 'power_supply'))
+        log_file = os.path.join(workdir, 'spawns.log')
+        os.environ.update(fake_env(tools_dir, extra={'FAKE_TOOL_DELAY': str(args.delay),
+                                                     'FAKE_TOOL_LOG': log_file,
+                                                     'W_HELPER_SYSFS_ROOT': sysfs_root,
+                                                     'W_HELPER_BACKEND': 'cli'}))
+        
+        from w_helper.status import collect_status
+        from w_helper.system_controller import SystemController
+        
+        print(f"📊 {args.rounds} status collections, {args.delay:g}s fake tool latency")
+        for label, cached in (("uncached", False), ("cached", True)):
+            controller = SystemController()
+            # Warm-up resolves tool paths and fills the permanent entries
+            collect_status(controller)
+            spawns_before = count_lines(log_file)
+            
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                if not cached:
+                    controller.cache.invalidate()
+                collect_status(controller)
+            elapsed = time.perf_counter() - start
+            
+            spawns = count_lines(log_file) - spawns_before
+            stats = controller.get_cache_stats()
+            print(f"  {label:<10} {spawns:4d} tool spawns   {elapsed * 1000:8.1f} ms   "
+                  f"hits {stats['hits']:4d}   misses {stats['misses']:4d}")
+            
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Command runner benchmark: timeouts, cancellation and concurrency limits
+
+Runs the fake asusctl through CommandRunner while it sleeps or hangs and
+reports how long each scenario takes to return. A hung tool should come
+back after the timeout, a cancelled one within a poll interval, and
+concurrent calls of a tool limited to one slot should run one after
+another.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import fake_env, make_fake_tools, temp_dir
+
+PROFILE_LIST = ['asusctl', 'profile', '-l']
+
+
+def run_concurrently(runner, count: int):
+    """Start count commands at once; return (elapsed seconds, results)"""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runner.run(PROFILE_LIST)))
+               for _ in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def main():
+    """Run the command runner benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--timeout', type=float, default=0.5, help='timeout for the hung tool')
+    parser.add_argument('--delay', type=float, default=0.1, help='seconds each fake tool call sleeps')
+    parser.add_argument('--concurrent', type=int, default=6, help='simultaneous calls')
+    args = parser.parse_args()
+    
+    with temp_dir() as workdir:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        os.environ.update(fake_env(tools_dir))
+        
+        from w_helper.commands import CommandRunner
+        from w_helper.tools import ToolResolver
+        
+        runner = CommandRunner(ToolResolver())
+        print("📊 Command runner with fake asusctl")
+        
+        # A wedged daemon: the tool never answers
+        os.environ['FAKE_TOOL_DELAY'] = '3600'
+        result = runner.run(PROFILE_LIST, timeout=args.timeout)
+        print(f"  hung tool, {args.timeout:g}s timeout   returned after {result.duration * 1000:7.1f} ms "
+              f"(timed out: {result.timed_out})")
+        
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        result = runner.run(PROFILE_LIST, timeout=60, cancel=cancel)
+        print(f"  hung tool, cancelled at 200 ms  returned after {result.duration * 1000:7.1f} ms "
+              f"(cancelled: {result.cancelled})")
+        
+        threading.Timer(0.2, runner.cancel_all).start()
+        elapsed, results = run_concurrently(runner, args.concurrent)
+        print(f"  {args.concurrent} hung calls, cancel_all at 200 ms   all returned after "
+              f"{elapsed * 1000:7.1f} ms ({sum(r.cancelled for r in results)} cancelled)")
+        
+        os.environ['FAKE_TOOL_DELAY'] = str(args.delay)
+        for label, limits in (("limit 1", None), ("unlimited", {'asusctl': args.concurrent})):
+            elapsed, results = run_concurrently(CommandRunner(ToolResolver(), limits=limits), args.concurrent)
+            print(f"  {args.concurrent} x {args.delay:g}s calls, {label:<10} {elapsed * 1000:7.1f} ms "
+                  f"({sum(r.ok for r in results)} succeeded)")
+            
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the CLI using `python -X importtime`
+
+Reports the cumulative import time of w_helper.cli and whether any
+GObject introspection (gi) modules were loaded, optionally compared
+against a baseline revision:
+
+    python3 benchmarks/bench_import.py --baseline HEAD~1
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import SRC_DIR, export_tree, temp_dir
+
+
+def measure_imports(src_dir: str):
+    """Return (cumulative microseconds of w_helper.cli, imported gi modules)"""
+    env = dict(os.environ, PYTHONPATH=src_dir)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import w_helper.cli'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not import w_helper.cli: {result.stderr.strip().splitlines()[-1]}")
+        
+    cumulative = None
+    gi_modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = [field.strip() for field in line[len('import time:'):].split('|')]
+        if len(fields) != 3 or not fields[1].isdigit():
+            continue
+        module = fields[2].strip()
+        if module == 'w_helper.cli':
+            cumulative = int(fields[1])
+        elif module == 'gi' or module.startswith('gi.'):
+            gi_modules.append(module)
+            
+    if cumulative is None:
+        raise RuntimeError("No import time reported for w_helper.cli")
+    return cumulative, gi_modules
+
+
+def main():
+    """Run the import-time benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', help='git revision to compare against')
+    parser.add_argument('--repeat', type=int, default=10, help='runs per measurement')
+    args = parser.parse_args()
+    
+    with temp_dir() as workdir:
+        trees = [('working tree', SRC_DIR)]
+        if args.baseline:
+            baseline_dir = os.path.join(workdir, 'baseline')
+            os.makedirs(baseline_dir)
+            trees.insert(0, (args.baseline, export_tree(args.baseline, baseline_dir)))
+            
+        print("📦 Cumulative import time of w_helper.cli")
+        for label, src_dir in trees:
+            try:
+                samples = []
+                for _ in range(args.repeat):
+                    cumulative, gi_modules = measure_imports(src_dir)
+                    samples.append(cumulative / 1000)
+            except RuntimeError as e:
+                print(f"  ❌ {label}: {e}")
+                continue
+                
+            gi_note = f"loads {len(gi_modules)} gi modules" if gi_modules else "no gi"
+            print(f"  {label:<24} median {statistics.median(samples):8.2f} ms   "
+                  f"min {min(samples):8.2f} ms   ({gi_note})")
+            
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
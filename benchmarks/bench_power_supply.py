@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Power supply benchmark: per-attribute file reads vs the batched reader
+
+The naive approach opens, reads and closes one sysfs file per attribute
+on every refresh. PowerSupplyReader keeps the files open and re-reads
+them with pread(), so a snapshot costs one syscall per attribute.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import make_fake_sysfs, temp_dir
+from w_helper.power_supply import AC_ATTRIBUTES, BATTERY_ATTRIBUTES, PowerSupplyReader
+
+
+def read_naive(reader: PowerSupplyReader):
+    """Read the same attributes as a snapshot with open/read/close each time"""
+    for supplies, attributes in ((reader.batteries, BATTERY_ATTRIBUTES), (reader.adapters, AC_ATTRIBUTES)):
+        for name in supplies:
+            for attribute in attributes:
+                try:
+                    with open(os.path.join(reader.root, name, attribute), 'r') as f:
+                        f.read().strip()
+                except OSError:
+                    pass
+
+
+def measure(func, iterations: int) -> float:
+    """Return microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000000
+
+
+def run(root: str, iterations: int):
+    """Benchmark both readers against a power_supply directory"""
+    reader = PowerSupplyReader(root)
+    reader.discover()
+    print(f"📊 {iterations} snapshots of {root} "
+          f"(batteries: {', '.join(reader.batteries) or 'none'}, "
+          f"adapters: {', '.join(reader.adapters) or 'none'})")
+    
+    naive = measure(lambda: read_naive(reader), iterations)
+    batched = measure(reader.snapshot, iterations)
+    print(f"  {'open/read/close':<24} {naive:8.1f} µs per snapshot")
+    print(f"  {'batched pread':<24} {batched:8.1f} µs per snapshot")
+    print(f"  speedup {naive / batched:.1f}x")
+    reader.close()
+
+
+def main():
+    """Run the power supply benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000, help='snapshots per measurement')
+    parser.add_argument('--root', help='power_supply directory to read (default: a fake tree)')
+    args = parser.parse_args()
+    
+    if args.root:
+        run(args.root, args.iterations)
+        return 0
+        
+    with temp_dir() as workdir:
+        run(make_fake_sysfs(os.path.join(workdir, 'power_supply')), args.iterations)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Process watcher benchmark: full /proc scans vs PID-set diffs
+
+A naive watcher reads every process's name on every scan. ProcessWatcher
+lists /proc and only inspects PIDs it hasn't seen (plus matching ones and
+unmatched ones younger than its recheck window), so a steady system
+costs one directory listing. The benchmark runs both against a fake
+/proc with thousands of processes, with and without process churn, and
+reports the CPU share at the default scan interval against the budget.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import make_fake_proc, temp_dir, write_process, write_uptime
+from w_helper.processes import DEFAULT_SCAN_INTERVAL, MAX_SCAN_LOAD, ProcessWatcher
+
+RULES = {0: ('cc1*', 'rustc', 'ld'), 1: ('steam', '*.exe', 'gamescope')}
+
+
+def full_scan(watcher: ProcessWatcher):
+    """Read and match every process, as a watcher without a PID diff would"""
+    for pid in watcher.list_pids():
+        watcher.match(*watcher.read_names(pid))
+
+
+def measure(func, repeat: int) -> float:
+    """Return milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def report(label: str, ms: float):
+    """Print a scan time with its CPU share at the default interval"""
+    load = ms / 1000 / DEFAULT_SCAN_INTERVAL
+    verdict = 'within' if load <= MAX_SCAN_LOAD else 'OVER'
+    print(f"  {label:<28} {ms:8.3f} ms/scan   {load * 100:6.3f}% CPU ({verdict} budget)")
+
+
+def run(proc_root: str, repeat: int, churn: int, fake: bool):
+    """Benchmark scans of one /proc tree"""
+    watcher = ProcessWatcher(RULES, proc_root=proc_root)
+    start = time.perf_counter()
+    watcher.scan()
+    initial = (time.perf_counter() - start) * 1000
+    
+    print(f"📊 {len(watcher.pids)} processes in {proc_root}, "
+          f"budget {MAX_SCAN_LOAD * 100:g}% CPU at {DEFAULT_SCAN_INTERVAL:g}s scans")
+    print(f"  {'initial scan (once)':<28} {initial:8.3f} ms")
+    report("full scan every time", measure(lambda: full_scan(watcher), repeat))
+    report("PID diff, no changes", measure(watcher.scan, repeat))
+    
+    if fake and churn:
+        # Replace `churn` processes per scan, one of them a compiler; the
+        # fake clock advances one scan interval per scan
+        next_pid = [max(watcher.pids) + 1]
+        uptime = [watcher.read_uptime()]
+        
+        def churn_scan():
+            uptime[0] += DEFAULT_SCAN_INTERVAL
+            write_uptime(proc_root, uptime[0])
+            for pid in sorted(watcher.pids)[:churn]:
+                shutil.rmtree(os.path.join(proc_root, str(pid)))
+            for offset in range(churn):
+                name = 'cc1plus' if offset == 0 else 'sh'
+                write_process(proc_root, next_pid[0], name, f'/usr/libexec/{name}',
+                              starttime=int(uptime[0] * watcher.ticks_per_second))
+                next_pid[0] += 1
+            start = time.perf_counter()
+            watcher.scan()
+            return time.perf_counter() - start
+            
+        samples = [churn_scan() for _ in range(repeat)]
+        report(f"PID diff, {churn} new/exited", sum(samples) / len(samples) * 1000)
+        print(f"  compiler rule active: {0 in watcher.active()}, "
+              f"{len(watcher.running(0))} matching processes")
+
+
+def main():
+    """Run the process watcher benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=5000, help='processes in the fake /proc')
+    parser.add_argument('--churn', type=int, default=20, help='processes replaced per churn scan')
+    parser.add_argument('--repeat', type=int, default=50, help='scans per measurement')
+    parser.add_argument('--proc', help='scan a real /proc instead of a fake tree')
+    args = parser.parse_args()
+    
+    if args.proc:
+        run(args.proc, args.repeat, 0, fake=False)
+        return 0
+        
+    with temp_dir() as workdir:
+        proc_root = make_fake_proc(os.path.join(workdir, 'proc'), args.processes)
+        run(proc_root, args.repeat, args.churn, fake=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Refresh rate switching benchmark: DisplayConfig calls per AC transition
+
+Runs the policy daemon's evaluation against a fake power_supply tree and
+the mock Mutter DisplayConfig service on a private session bus, with
+[refresh_rate] set to 165 Hz on AC and 60 Hz on battery. The adapter is
+plugged and unplugged --transitions times and every GetCurrentState and
+ApplyMonitorsConfig call is counted, along with evaluations that are no
+transition (repeated events) or whose target mode is already active.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import (FAKE_ADAPTER, dbus_session, display_mock_unavailable, fake_env, fake_mutter,
+                    make_fake_sysfs, make_fake_tools, temp_dir, write_supply)
+
+POLICY = """
+[refresh_rate]
+ac = 165
+battery = 60
+"""
+DISPLAY_CALLS = ('DisplayConfig.GetCurrentState', 'DisplayConfig.ApplyMonitorsConfig')
+
+
+def measure(daemon, sysfs_root: str, ac_online: bool, repeat: int):
+    """Set the adapter state, evaluate repeat times; return (ms, calls)"""
+    from w_helper.instrument import metrics
+    
+    write_supply(sysfs_root, 'AC0', dict(FAKE_ADAPTER, online='1' if ac_online else '0'))
+    metrics.reset()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        daemon.evaluate()
+    elapsed = (time.perf_counter() - start) * 1000
+    calls = [metrics.histograms[('dbus', name)].count if ('dbus', name) in metrics.histograms else 0
+             for name in DISPLAY_CALLS]
+    return elapsed, calls
+
+
+def main():
+    """Run the refresh rate switching benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transitions', type=int, default=10, help='plug/unplug cycles')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds each mock DisplayConfig call sleeps')
+    args = parser.parse_args()
+    
+    reason = display_mock_unavailable()
+    if reason is not None:
+        print(f"⏭️  Skipped: {reason}")
+        return 0
+        
+    with temp_dir() as workdir, dbus_session() as address:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        sysfs_root = make_fake_sysfs(os.path.join(workdir, 'power_supply'))
+        policy_file = os.path.join(workdir, 'policy.toml')
+        with open(policy_file, 'w') as f:
+            f.write(POLICY)
+        env = fake_env(tools_dir, extra={'DBUS_SESSION_BUS_ADDRESS': address,
+                                         'W_HELPER_SYSFS_ROOT': sysfs_root,
+                                         'W_HELPER_BACKEND': 'cli',
+                                         'W_HELPER_REMOTE': '0'})
+        os.environ.update(env)
+        
+        with fake_mutter(env, args.latency):
+            from w_helper.daemon import PolicyDaemon
+            from w_helper.instrument import metrics
+            from w_helper.system_controller import SystemController
+            
+            metrics.enable()
+            controller = SystemController()
+            daemon = PolicyDaemon(controller, policy_file=policy_file)
+            # Start on AC at the mock's 165 Hz
+            measure(daemon, sysfs_root, True, 1)
+            
+            print(f"📊 DisplayConfig calls, {args.latency * 1000:g} ms mock latency "
+                  f"({args.transitions} cycles)")
+            totals = {}
+            for _ in range(args.transitions):
+                for label, ac_online, repeat in (("unplug", False, 1), ("repeated event", False, 3),
+                                                 ("plug in", True, 1), ("repeated event", True, 3)):
+                    elapsed, calls = measure(daemon, sysfs_root, ac_online, repeat)
+                    total = totals.setdefault(label, [0.0, 0, 0, 0])
+                    total[0] += elapsed
+                    total[1] += repeat
+                    total[2] += calls[0]
+                    total[3] += calls[1]
+                    
+            # Switched by hand to the battery rate before unplugging: nothing to apply
+            controller.set_refresh_rate('60')
+            elapsed, calls = measure(daemon, sysfs_root, False, 1)
+            totals['already active'] = [elapsed, 1, calls[0], calls[1]]
+            
+            for label, (elapsed, evaluations, gets, applies) in totals.items():
+                print(f"  {label:<16} {gets / evaluations:4.1f} GetCurrentState  "
+                      f"{applies / evaluations:4.1f} ApplyMonitorsConfig  "
+                      f"{elapsed / evaluations:7.2f} ms per evaluation")
+            daemon.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: `w-helper status` wall time with fake tools on PATH
+
+Compares the working tree against a baseline revision, e.g.:
+
+    python3 benchmarks/bench_startup.py --baseline HEAD~1
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import (SRC_DIR, export_tree, fake_env, make_fake_tools, print_summary,
+                    temp_dir, time_cli)
+
+TOOLS = ['asusctl', 'supergfxctl', 'xrandr']
+
+
+def bench_tool_lookup(tools_dir: str, repeat: int):
+    """Compare forking `which` with the in-process resolver"""
+    from w_helper.tools import ToolResolver
+    
+    search_path = tools_dir + os.pathsep + os.environ.get('PATH', os.defpath)
+    env = dict(os.environ, PATH=search_path)
+    
+    which_samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for tool in TOOLS:
+            subprocess.run(['which', tool], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        which_samples.append(time.perf_counter() - start)
+        
+    cold_samples = []
+    warm_samples = []
+    for _ in range(repeat):
+        resolver = ToolResolver(search_path=search_path)
+        start = time.perf_counter()
+        resolver.missing(TOOLS)
+        cold_samples.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        resolver.missing(TOOLS)
+        warm_samples.append(time.perf_counter() - start)
+        
+    print("🔎 Resolving asusctl, supergfxctl and xrandr")
+    print_summary("fork `which` x3", which_samples)
+    print_summary("resolver (cold)", cold_samples)
+    print_summary("resolver (cached)", warm_samples)
+
+
+def main():
+    """Run the startup benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', help='git revision to compare against')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement')
+    args = parser.parse_args()
+    
+    with temp_dir() as workdir:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        
+        bench_tool_lookup(tools_dir, args.repeat)
+        
+        print("\n🚀 w-helper status wall time")
+        trees = [('working tree', SRC_DIR)]
+        if args.baseline:
+            baseline_dir = os.path.join(workdir, 'baseline')
+            os.makedirs(baseline_dir)
+            trees.insert(0, (args.baseline, export_tree(args.baseline, baseline_dir)))
+            
+        for label, src_dir in trees:
+            env = fake_env(tools_dir, src_dir)
+            try:
+                print_summary(label, time_cli(['status'], env, args.repeat))
+            except RuntimeError as e:
+                print(f"  ❌ {label}: {e}")
+                return 1
+                
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Status benchmark: sequential vs concurrent probes with slow fake tools
+
+Every fake asusctl/supergfxctl call sleeps for --delay seconds, so the
+sequential total is roughly the sum of the probes while the concurrent
+collection should stay close to the slowest single probe.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import fake_env, make_fake_tools, print_summary, temp_dir
+
+
+def main():
+    """Run the status benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds each fake tool call sleeps')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement')
+    args = parser.parse_args()
+    
+    with temp_dir() as workdir:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        os.environ.update(fake_env(tools_dir, extra={'FAKE_TOOL_DELAY': str(args.delay),
+                                                     'W_HELPER_BACKEND': 'cli'}))
+        
+        from w_helper.status import STATUS_PROBES, collect_status
+        from w_helper.system_controller import SystemController
+        
+        controller = SystemController()
+        
+        sequential = []
+        concurrent = []
+        slowest = []
+        for _ in range(args.repeat):
+            # Measure the probes themselves, not the state cache
+            controller.cache.invalidate()
+            start = time.perf_counter()
+            for key, label, getter in STATUS_PROBES:
+                try:
+                    getattr(controller, getter)()
+                except Exception:
+                    pass
+            sequential.append(time.perf_counter() - start)
+            
+            controller.cache.invalidate()
+            start = time.perf_counter()
+            results = collect_status(controller)
+            concurrent.append(time.perf_counter() - start)
+            slowest.append(max(result.duration for result in results.values()))
+            
+        print(f"📊 Status probes with {args.delay:g}s fake tool latency")
+        print_summary("sequential", sequential)
+        print_summary("concurrent", concurrent)
+        print_summary("slowest single probe", slowest)
+        
+        # A stalled supergfxd must not hold up the whole report
+        os.environ['FAKE_GFX_DELAY'] = '30'
+        controller.cache.invalidate()
+        start = time.perf_counter()
+        results = collect_status(controller, timeout=1.0)
+        elapsed = time.perf_counter() - start
+        print(f"\n⏱️  Stalled supergfxctl with 1s probe timeout: {elapsed * 1000:.0f} ms "
+              f"(GPU Mode: {results['gpu_mode'].error})")
+        
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Shared helpers for the W-Helper benchmarks
+
+The benchmarks never touch real hardware: fake asusctl/supergfxctl/xrandr
+scripts are written to a temporary directory that is put first on PATH,
+and a fake power_supply tree can stand in for /sys/class/power_supply.
+"""
+
+import contextlib
+import importlib.util
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_ROOT, 'src')
+BENCH_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+
+FAKE_ASUSCTL = """#!/bin/sh
+[ -n "$FAKE_TOOL_LOG" ] && echo "asusctl $*" >> "$FAKE_TOOL_LOG"
+[ -n "$FAKE_TOOL_DELAY" ] && sleep "$FAKE_TOOL_DELAY"
+state="${FAKE_TOOL_STATE:-/tmp}/asusctl.profile"
+case "$1 $2" in
+    "profile -l") printf 'Starting version 6.0.0\\nQuiet\\nBalanced\\nPerformance\\n' ;;
+    "profile -p") printf 'Starting version 6.0.0\\nActive profile is %s\\n' "$(cat "$state" 2>/dev/null || echo Balanced)" ;;
+    "profile -P") echo "$3" > "$state" ;;
+    "-c "*)
+        [ -n "$W_HELPER_SYSFS_ROOT" ] && echo "$2" > "$W_HELPER_SYSFS_ROOT/BAT0/charge_control_end_threshold"
+        echo "Charge limit set to $2" ;;
+    *) echo "unsupported: $*" >&2; exit 1 ;;
+esac
+"""
+
+FAKE_SUPERGFXCTL = """#!/bin/sh
+[ -n "$FAKE_TOOL_LOG" ] && echo "supergfxctl $*" >> "$FAKE_TOOL_LOG"
+[ -n "$FAKE_TOOL_DELAY" ] && sleep "$FAKE_TOOL_DELAY"
+[ -n "$FAKE_GFX_DELAY" ] && sleep "$FAKE_GFX_DELAY"
+state="${FAKE_TOOL_STATE:-/tmp}/supergfxctl.mode"
+case "$1" in
+    -s) echo '[Integrated, Hybrid, AsusMuxDgpu]' ;;
+    --get|-g) cat "$state" 2>/dev/null || echo Hybrid ;;
+    -m)
+        case "$2" in
+            Integrated|Hybrid|AsusMuxDgpu) echo "$2" > "$state" ;;
+            *) echo "Mode $2 is not supported" >&2; exit 1 ;;
+        esac ;;
+    *) echo "unsupported: $*" >&2; exit 1 ;;
+esac
+"""
+
+FAKE_XRANDR = """#!/bin/sh
+exit 0
+"""
+
+
+def write_script(directory: str, name: str, content: str) -> str:
+    """Write an executable script and return its path"""
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, 0o755)
+    return path
+
+
+def make_fake_tools(directory: str) -> str:
+    """Create fake asusctl, supergfxctl and xrandr scripts in a directory"""
+    os.makedirs(directory, exist_ok=True)
+    write_script(directory, 'asusctl', FAKE_ASUSCTL)
+    write_script(directory, 'supergfxctl', FAKE_SUPERGFXCTL)
+    write_script(directory, 'xrandr', FAKE_XRANDR)
+    return directory
+
+
+FAKE_BATTERY = {
+    'type': 'Battery',
+    'status': 'Discharging',
+    'capacity': '76',
+    'energy_now': '57160000',
+    'energy_full': '75210000',
+    'energy_full_design': '90000000',
+    'power_now': '12450000',
+    'voltage_now': '16102000',
+    'cycle_count': '214',
+    'charge_control_end_threshold': '80',
+}
+
+FAKE_ADAPTER = {
+    'type': 'Mains',
+    'online': '0',
+}
+
+
+def write_supply(root: str, name: str, attributes: Dict[str, str]) -> str:
+    """Write a fake power supply directory and return its path"""
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    for attribute, value in attributes.items():
+        with open(os.path.join(path, attribute), 'w') as f:
+            f.write(value + '\n')
+    return path
+
+
+def make_fake_sysfs(directory: str) -> str:
+    """Create a fake power_supply tree with one battery and one adapter"""
+    write_supply(directory, 'BAT0', FAKE_BATTERY)
+    write_supply(directory, 'AC0', FAKE_ADAPTER)
+    return directory
+
+
+def write_process(root: str, pid: int, name: str, exe: str, starttime: int = 0) -> str:
+    """Write a fake /proc/<pid> entry with comm, exe and stat (start time in clock ticks)"""
+    path = os.path.join(root, str(pid))
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'comm'), 'w') as f:
+        f.write(name[:15] + '\n')
+    with open(os.path.join(path, 'stat'), 'w') as f:
+        f.write(f"{pid} ({name[:15]}) S 1 {pid} {pid} 0 -1 4194304 0 0 0 0 0 0 0 0 20 0 1 0 {starttime} 0 0\n")
+    os.symlink(exe, os.path.join(path, 'exe'))
+    return path
+
+
+def write_uptime(root: str, seconds: float) -> str:
+    """Write a fake /proc/uptime"""
+    path = os.path.join(root, 'uptime')
+    with open(path, 'w') as f:
+        f.write(f"{seconds:.2f} {seconds:.2f}\n")
+    return path
+
+
+def make_fake_proc(directory: str, count: int, first_pid: int = 1000, uptime: float = 86400.0) -> str:
+    """Create a fake /proc tree with `count` processes, all started at boot"""
+    names = ('bash', 'python3', 'gnome-shell', 'firefox', 'systemd', 'pipewire', 'code', 'kworker')
+    for pid in range(first_pid, first_pid + count):
+        name = names[pid % len(names)]
+        write_process(directory, pid, name, f'/usr/bin/{name}')
+    write_uptime(directory, uptime)
+    # Non-process entries are skipped by the scanner
+    os.makedirs(os.path.join(directory, 'sys'), exist_ok=True)
+    return directory
+
+
+def fake_env(tools_dir: str, src_dir: str = SRC_DIR, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Build an environment that runs W-Helper from src_dir against fake tools"""
+    env = dict(os.environ)
+    env['PATH'] = tools_dir + os.pathsep + env.get('PATH', os.defpath)
+    env['PYTHONPATH'] = src_dir
+    env['FAKE_TOOL_STATE'] = tools_dir
+    if extra:
+        env.update(extra)
+    return env
+
+
+def display_mock_unavailable() -> Optional[str]:
+    """Return why the Mutter mock can't run here, or None if it can"""
+    for module in ('gi', 'pydbus'):
+        if importlib.util.find_spec(module) is None:
+            return f"{module} is not installed"
+    if shutil.which('dbus-daemon') is None:
+        return "dbus-daemon is not installed"
+    return None
+
+
+@contextlib.contextmanager
+def dbus_session() -> Iterator[str]:
+    """Run a private session bus and yield its address"""
+    daemon = subprocess.Popen(
+        ['dbus-daemon', '--session', '--nofork', '--print-address=1'],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        address = daemon.stdout.readline().strip()
+        if not address:
+            raise RuntimeError("dbus-daemon did not report an address")
+        yield address
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+
+@contextlib.contextmanager
+def fake_mutter(env: Dict[str, str], latency: float = 0.0) -> Iterator[subprocess.Popen]:
+    """Serve the DisplayConfig mock on env's session bus until the block exits"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'fake_mutter.py'), '--latency', str(latency)],
+        env=env, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        if process.stdout.readline().strip() != 'ready':
+            raise RuntimeError("DisplayConfig mock failed to start")
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def export_tree(ref: str, directory: str) -> str:
+    """Export the src/ tree of a git revision and return its src directory"""
+    archive = subprocess.run(
+        ['git', '-C', REPO_ROOT, 'archive', ref, 'src'],
+        check=True, stdout=subprocess.PIPE
+    )
+    subprocess.run(['tar', '-x', '-C', directory], input=archive.stdout, check=True)
+    return os.path.join(directory, 'src')
+
+
+def time_cli(args: List[str], env: Dict[str, str], repeat: int) -> List[float]:
+    """Run `python -m w_helper.cli` repeatedly and return wall times in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-m', 'w_helper.cli'] + args,
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"w-helper {' '.join(args)} failed: {result.stderr.strip()}")
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize timing samples in milliseconds"""
+    return {
+        'count': len(samples),
+        'min_ms': min(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def print_summary(label: str, samples: List[float]):
+    """Print a one-line timing summary"""
+    s = summarize(samples)
+    print(f"  {label:<24} min {s['min_ms']:8.2f} ms   median {s['median_ms']:8.2f} ms   "
+          f"max {s['max_ms']:8.2f} ms")
+
+
+def temp_dir(prefix: str = 'w-helper-bench-') -> tempfile.TemporaryDirectory:
+    """Create a temporary working directory"""
+    return tempfile.TemporaryDirectory(prefix=prefix)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Mock of GNOME Mutter's DisplayConfig D-Bus service for the benchmarks
+
+Owns org.gnome.Mutter.DisplayConfig on the session bus (normally a
+private one started by the benchmark) and answers GetCurrentState and
+ApplyMonitorsConfig for one 2560x1600 panel at 60/120/165 Hz. Every call
+sleeps for --latency seconds first. "ready" is printed once the name is
+owned.
+
+Needs PyGObject and pydbus, like W-Helper's display support.
+"""
+
+import argparse
+import sys
+import time
+
+from gi.repository import GLib
+from pydbus import SessionBus
+from pydbus.generic import signal
+
+BUS_NAME = 'org.gnome.Mutter.DisplayConfig'
+OBJECT_PATH = '/org/gnome/Mutter/DisplayConfig'
+
+CONNECTOR = 'eDP-1'
+MONITOR_SPEC = (CONNECTOR, 'BOE', '0x0a1c', '0x00000000')
+WIDTH, HEIGHT = 2560, 1600
+REFRESH_RATES = (60.0, 120.0, 165.0)
+SUPPORTED_SCALES = [1.0, 1.25, 1.5, 2.0]
+
+
+class FakeDisplayConfig:
+    """
+    <node>
+      <interface name='org.gnome.Mutter.DisplayConfig'>
+        <method name='GetCurrentState'>
+          <arg type='u' name='serial' direction='out'/>
+          <arg type='a((ssss)a(siiddada{sv})a{sv})' name='monitors' direction='out'/>
+          <arg type='a(iiduba(ssss)a{sv})' name='logical_monitors' direction='out'/>
+          <arg type='a{sv}' name='properties' direction='out'/>
+        </method>
+        <method name='ApplyMonitorsConfig'>
+          <arg type='u' name='serial' direction='in'/>
+          <arg type='u' name='method' direction='in'/>
+          <arg type='a(iiduba(ssa{sv}))' name='logical_monitors' direction='in'/>
+          <arg type='a{sv}' name='properties' direction='in'/>
+        </method>
+        <signal name='MonitorsChanged'/>
+      </interface>
+    </node>
+    """
+    
+    MonitorsChanged = signal()
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.serial = 1
+        self.current = 'mode-165'
+        self.calls = {'GetCurrentState': 0, 'ApplyMonitorsConfig': 0}
+        
+    @staticmethod
+    def mode_id(refresh: float) -> str:
+        return f"mode-{int(refresh)}"
+        
+    def GetCurrentState(self):
+        self.calls['GetCurrentState'] += 1
+        time.sleep(self.latency)
+        modes = []
+        for refresh in REFRESH_RATES:
+            properties = {}
+            if self.mode_id(refresh) == self.current:
+                properties['is-current'] = GLib.Variant('b', True)
+            if refresh == REFRESH_RATES[-1]:
+                properties['is-preferred'] = GLib.Variant('b', True)
+            modes.append((self.mode_id(refresh), WIDTH, HEIGHT, refresh, 1.5, SUPPORTED_SCALES, properties))
+        monitors = [(MONITOR_SPEC, modes, {'display-name': GLib.Variant('s', 'Built-in display'),
+                                           'is-builtin': GLib.Variant('b', True)})]
+        logical_monitors = [(0, 0, 1.5, 0, True, [MONITOR_SPEC], {})]
+        return self.serial, monitors, logical_monitors, {}
+        
+    def ApplyMonitorsConfig(self, serial, method, logical_monitors, properties):
+        self.calls['ApplyMonitorsConfig'] += 1
+        time.sleep(self.latency)
+        if serial != self.serial:
+            raise ValueError(f"The requested configuration is based on stale information (serial {serial})")
+        mode_ids = [self.mode_id(refresh) for refresh in REFRESH_RATES]
+        for x, y, scale, transform, primary, monitors in logical_monitors:
+            if scale not in SUPPORTED_SCALES:
+                raise ValueError(f"Scale {scale} is not supported")
+            for connector, mode_id, monitor_properties in monitors:
+                if connector != CONNECTOR or mode_id not in mode_ids:
+                    raise ValueError(f"Invalid mode {mode_id} for {connector}")
+                # Method 0 only verifies the configuration
+                if method != 0:
+                    self.current = mode_id
+        if method != 0:
+            self.serial += 1
+            self.MonitorsChanged()
+
+
+def main():
+    """Serve the mock until terminated"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds each call sleeps')
+    args = parser.parse_args()
+    
+    service = FakeDisplayConfig(args.latency)
+    bus = SessionBus()
+    bus.publish(BUS_NAME, (OBJECT_PATH, service))
+    print('ready', flush=True)
+    try:
+        GLib.MainLoop().run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: CLI cold start, status, setters and GUI startup as JSON
+
+Runs every scenario against fake asusctl/supergfxctl scripts, a fake
+power_supply tree and, when PyGObject and pydbus are installed, a mock
+Mutter DisplayConfig service and a `w-helper daemon --bus` on a private
+session bus, so it works on a headless box without ASUS hardware. Results are written as JSON and can
+be compared with an earlier run:
+
+    python3 benchmarks/suite.py -o before.json
+    python3 benchmarks/suite.py -o after.json --baseline before.json
+    python3 benchmarks/suite.py --compare before.json after.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from common import (REPO_ROOT, dbus_session, display_mock_unavailable, fake_env, fake_mutter,
+                    make_fake_sysfs, make_fake_tools, summarize, temp_dir, time_cli)
+
+RESULTS_VERSION = 1
+# A metric regresses when its median grows by more than the threshold
+# and by more than this many milliseconds (to ignore noise in fast paths)
+MIN_REGRESSION_MS = 1.0
+GUI_STARTUP_TIMEOUT = 30.0
+
+
+class SkipScenario(Exception):
+    """Raised by a scenario that can't run in this environment"""
+
+
+def bench_cli(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """Cold start of short CLI commands, one process per run"""
+    return OrderedDict([
+        ('help', time_cli(['--help'], env, repeat)),
+        ('cpu_get', time_cli(['cpu', 'get'], env, repeat)),
+        ('status', time_cli(['status'], env, repeat)),
+    ])
+
+
+def bench_status(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """In-process status collection with the state cache cleared"""
+    from w_helper.status import collect_status
+    
+    controller = new_controller(env)
+    samples = []
+    for _ in range(repeat):
+        controller.cache.invalidate()
+        start = time.perf_counter()
+        collect_status(controller)
+        samples.append(time.perf_counter() - start)
+    return OrderedDict([('collect', samples)])
+
+
+def round_trip(setter: Callable, getter: Callable, values: List, repeat: int, cache=None) -> List[float]:
+    """Time set-then-read-back cycles, alternating between values"""
+    samples = []
+    for index in range(repeat):
+        value = values[index % len(values)]
+        if cache is not None:
+            cache.invalidate()
+        start = time.perf_counter()
+        if not setter(value):
+            raise RuntimeError(f"{setter.__name__}({value!r}) failed")
+        read_back = getter()
+        samples.append(time.perf_counter() - start)
+        if str(read_back) != str(value):
+            raise RuntimeError(f"{getter.__name__}() returned {read_back!r} after setting {value!r}")
+    return samples
+
+
+def bench_setters(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """Setter round-trips: write a value and read it back uncached"""
+    controller = new_controller(env)
+    return OrderedDict([
+        ('cpu_profile', round_trip(controller.set_cpu_profile, controller.get_current_cpu_profile,
+                                   ['Quiet', 'Performance'], repeat, controller.cache)),
+        ('gpu_mode', round_trip(controller.set_gpu_mode, controller.get_current_gpu_mode,
+                                ['Integrated', 'Hybrid'], repeat, controller.cache)),
+        ('charge_limit', round_trip(controller.set_battery_charge_limit,
+                                    controller.get_battery_charge_limit, [60, 80], repeat)),
+    ])
+
+
+def bench_display(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """Refresh rate reads (and writes, where supported) through the Mutter mock"""
+    controller = new_controller(env)
+    results = OrderedDict()
+    for name, getter in (('refresh_rates', controller.get_available_refresh_rates),
+                         ('current_refresh_rate', controller.get_current_refresh_rate)):
+        for suffix, invalidate in (('', True), ('_cached', False)):
+            samples = []
+            for _ in range(repeat):
+                if invalidate:
+                    controller.display.invalidate()
+                start = time.perf_counter()
+                getter()
+                samples.append(time.perf_counter() - start)
+            results[name + suffix] = samples
+        
+    rates = controller.get_available_refresh_rates()
+    if controller.set_refresh_rate(rates[0]):
+        results['set_refresh_rate'] = round_trip(
+            controller.set_refresh_rate, controller.get_current_refresh_rate,
+            [rates[-1], rates[0]], repeat, controller.display
+        )
+    return results
+
+
+def bench_gui(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """GUI process start to first frame and to every widget having loaded"""
+    if importlib.util.find_spec('gi') is None:
+        raise SkipScenario("PyGObject is not installed")
+    command = [sys.executable, '-m', 'w_helper.main']
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        if shutil.which('xvfb-run') is None:
+            raise SkipScenario("no display and xvfb-run is not installed")
+        command = ['xvfb-run', '-a'] + command
+        
+    results: Dict[str, List[float]] = OrderedDict()
+    trace_file = os.path.join(env['FAKE_TOOL_STATE'], 'startup.json')
+    for _ in range(repeat):
+        if os.path.exists(trace_file):
+            os.unlink(trace_file)
+        process = subprocess.Popen(command, env=dict(env, W_HELPER_STARTUP_TRACE=trace_file),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + GUI_STARTUP_TIMEOUT
+            while not os.path.exists(trace_file):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("GUI did not report its startup timings")
+                time.sleep(0.05)
+            # The file is complete once it parses
+            while True:
+                try:
+                    with open(trace_file, 'r') as f:
+                        timings = json.load(f)
+                    break
+                except ValueError:
+                    time.sleep(0.01)
+        finally:
+            process.terminate()
+            process.wait()
+        for mark, ms in timings.items():
+            results.setdefault(mark, []).append(ms / 1000)
+    return results
+
+
+def bench_daemon(env: Dict[str, str], repeat: int) -> Dict[str, List[float]]:
+    """CLI commands and setting round-trips through `w-helper daemon --bus`"""
+    if importlib.util.find_spec('gi') is None:
+        raise SkipScenario("PyGObject is not installed")
+    if not env.get('DBUS_SESSION_BUS_ADDRESS'):
+        raise SkipScenario("no private session bus")
+    # A runtime directory of its own, so a GUI the user runs isn't used
+    runtime_dir = os.path.join(env['FAKE_TOOL_STATE'], 'run')
+    os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+    env = dict(env, XDG_RUNTIME_DIR=runtime_dir)
+    instance_file = os.path.join(runtime_dir, 'w-helper', 'instance.json')
+    
+    process = subprocess.Popen([sys.executable, '-m', 'w_helper.cli', 'daemon', '--bus', '--no-policy'],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + GUI_STARTUP_TIMEOUT
+        while not os.path.exists(instance_file):
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("w-helper daemon did not start serving")
+            time.sleep(0.05)
+            
+        results = OrderedDict([('cpu_get', time_cli(['cpu', 'get'], env, repeat))])
+        os.environ.update(env)
+        from w_helper.service import connect_service_backend
+        
+        backend = connect_service_backend()
+        if backend is None:
+            raise RuntimeError("w-helper daemon is not reachable")
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            backend.get_current_cpu_profile()
+            samples.append(time.perf_counter() - start)
+        results['cpu_profile_property'] = samples
+        results['set_cpu_profile'] = round_trip(lambda profile: backend.set_cpu_profile(profile)[0],
+                                                backend.get_current_cpu_profile,
+                                                ['Quiet', 'Performance'], repeat)
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+SCENARIOS = OrderedDict([
+    ('cli', bench_cli),
+    ('status', bench_status),
+    ('setters', bench_setters),
+    ('display', bench_display),
+    ('gui', bench_gui),
+    ('daemon', bench_daemon),
+])
+
+
+def new_controller(env: Dict[str, str]):
+    """Create a controller that sees the fake environment"""
+    os.environ.update(env)
+    from w_helper.system_controller import SystemController
+    return SystemController()
+
+
+def git_revision() -> Optional[str]:
+    """Return the checked-out revision, marked -dirty with local changes"""
+    try:
+        revision = subprocess.run(['git', '-C', REPO_ROOT, 'describe', '--always', '--dirty'],
+                                  check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True).stdout.strip()
+        return revision or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> Dict:
+    """Run the selected scenarios and return the results document"""
+    document = OrderedDict([
+        ('version', RESULTS_VERSION),
+        ('timestamp', datetime.datetime.now().astimezone().isoformat(timespec='seconds')),
+        ('revision', git_revision()),
+        ('python', platform.python_version()),
+        ('machine', platform.machine()),
+        ('settings', OrderedDict([('repeat', args.repeat), ('tool_delay', args.tool_delay),
+                                  ('display_latency', args.display_latency)])),
+        ('results', OrderedDict()),
+        ('skipped', OrderedDict()),
+    ])
+    
+    with temp_dir() as workdir:
+        tools_dir = make_fake_tools(os.path.join(workdir, 'bin'))
+        sysfs_root = make_fake_sysfs(os.path.join(workdir, 'power_supply'))
+        env = fake_env(tools_dir, extra={
+            'FAKE_TOOL_DELAY': str(args.tool_delay),
+            'W_HELPER_BACKEND': 'cli',
+            'W_HELPER_SYSFS_ROOT': sysfs_root,
+            'XDG_STATE_HOME': os.path.join(workdir, 'state'),
+            'XDG_CONFIG_HOME': os.path.join(workdir, 'config'),
+        })
+        
+        with contextlib.ExitStack() as stack:
+            reason = display_mock_unavailable()
+            if reason is None:
+                env['DBUS_SESSION_BUS_ADDRESS'] = stack.enter_context(dbus_session())
+                stack.enter_context(fake_mutter(env, args.display_latency))
+                
+            for name in args.scenarios:
+                if name == 'display' and reason is not None:
+                    document['skipped'][name] = reason
+                    print(f"⏭️  {name}: {reason}")
+                    continue
+                print(f"▶️  {name}", flush=True)
+                try:
+                    metrics = SCENARIOS[name](env, args.repeat)
+                except SkipScenario as e:
+                    document['skipped'][name] = str(e)
+                    print(f"⏭️  {name}: {e}")
+                    continue
+                for metric, samples in metrics.items():
+                    summary = summarize(samples)
+                    document['results'][f"{name}.{metric}"] = OrderedDict(
+                        (key, round(value, 3)) for key, value in summary.items()
+                    )
+                    print(f"  {metric:<24} median {summary['median_ms']:9.2f} ms   "
+                          f"max {summary['max_ms']:9.2f} ms")
+    return document
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Print median changes per metric and return the regressed ones"""
+    regressions = []
+    print(f"\n📊 {baseline.get('revision') or 'baseline'} → {current.get('revision') or 'current'}")
+    for metric, result in current['results'].items():
+        before = baseline['results'].get(metric)
+        if before is None:
+            print(f"   {metric:<32} {result['median_ms']:9.2f} ms   (new)")
+            continue
+        old, new = before['median_ms'], result['median_ms']
+        change = (new - old) / old if old else 0.0
+        regressed = change > threshold and new - old > MIN_REGRESSION_MS
+        marker = '❌' if regressed else ('✅' if change < -threshold else '  ')
+        print(f"{marker} {metric:<32} {old:9.2f} → {new:9.2f} ms   {change:+7.1%}")
+        if regressed:
+            regressions.append(metric)
+    for metric in baseline['results']:
+        if metric not in current['results']:
+            print(f"   {metric:<32} (not measured)")
+    return regressions
+
+
+def load_results(path: str) -> Dict:
+    """Read a results file written by this script"""
+    with open(path, 'r') as f:
+        document = json.load(f)
+    if document.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path} is not a version {RESULTS_VERSION} results file")
+    return document
+
+
+def main():
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--repeat', type=int, default=10, help='runs per measurement')
+    parser.add_argument('--tool-delay', type=float, default=0.0,
+                        help='seconds each fake asusctl/supergfxctl call sleeps')
+    parser.add_argument('--display-latency', type=float, default=0.0,
+                        help='seconds each mock DisplayConfig call sleeps')
+    parser.add_argument('--output', '-o', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare the results with an earlier results file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='only compare two results files')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative median increase counted as a regression (default: 0.1)')
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+        
+    try:
+        if args.compare:
+            baseline, current = (load_results(path) for path in args.compare)
+        else:
+            args.scenarios = args.scenarios or list(SCENARIOS)
+            baseline = load_results(args.baseline) if args.baseline else None
+            current = run_suite(args)
+            if args.output:
+                with open(args.output, 'w') as f:
+                    json.dump(current, f, indent=2)
+                print(f"📄 Wrote {args.output}")
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return 1
+        
+    if baseline is not None:
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
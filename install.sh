@@ -52,6 +52,12 @@ echo "📦 Installing desktop entry..."
 mkdir -p ~/.local/share/applications
 cp w-helper.desktop ~/.local/share/applications/
 
+# Let the session bus start the daemon when its API is called
+echo "📦 Installing session bus service..."
+mkdir -p ~/.local/share/dbus-1/services
+sed "s|@BINDIR@|$(python3 -m site --user-base)/bin|" com.github.w_helper.Daemon.service.in \
+    > ~/.local/share/dbus-1/services/com.github.w_helper.Daemon.service
+
 # Update desktop database
 echo "📦 Updating desktop database..."
 update-desktop-database ~/.local/share/applications/
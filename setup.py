@@ -32,6 +32,7 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "PyGObject>=3.42.0",
+        "tomli>=1.1.0; python_version < '3.11'",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,366 @@
+"""
+Hardware backends used by SystemController to talk to asusd and supergfxd
+"""
+
+import importlib.util
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .instrument import metrics
+
+logger = logging.getLogger(__name__)
+
+# asusd D-Bus interface
+ASUSD_BUS_NAME = 'org.asuslinux.Daemon'
+ASUSD_PLATFORM_PATH = '/org/asuslinux/Platform'
+ASUSD_PLATFORM_INTERFACE = 'org.asuslinux.Platform'
+
+# supergfxd D-Bus interface
+SUPERGFXD_BUS_NAME = 'org.supergfxctl.Daemon'
+SUPERGFXD_PATH = '/org/supergfxctl/Gfx'
+SUPERGFXD_INTERFACE = 'org.supergfxctl.Daemon'
+
+# Enum values as serialized by asusd (PlatformProfile) and supergfxd (GfxMode)
+PLATFORM_PROFILES = ['Balanced', 'Performance', 'Quiet', 'LowPower', 'Custom']
+GFX_MODES = ['Hybrid', 'Integrated', 'NvidiaNoModeset', 'Vfio', 'AsusEgpu', 'AsusMuxDgpu', 'None']
+
+# Seconds before a daemon that couldn't be reached is tried again
+UNAVAILABLE_RETRY = 30.0
+
+
+def profile_name(value: Any) -> Optional[str]:
+    """Name of an asusd PlatformProfile value (enum index, or name on older asusd)"""
+    if isinstance(value, str):
+        return value or None
+    if 0 <= value < len(PLATFORM_PROFILES):
+        return PLATFORM_PROFILES[value]
+    return None
+
+
+class HardwareBackend:
+    """Common interface for CPU profile, GPU mode and charge limit control"""
+    
+    name = 'base'
+    
+    def get_cpu_profiles(self) -> List[str]:
+        """Get available CPU profiles"""
+        raise NotImplementedError
+        
+    def get_current_cpu_profile(self) -> Optional[str]:
+        """Get current CPU profile"""
+        raise NotImplementedError
+        
+    def set_cpu_profile(self, profile: str) -> Tuple[bool, str]:
+        """Set CPU profile and return success status and output"""
+        raise NotImplementedError
+        
+    def get_gpu_modes(self) -> List[str]:
+        """Get available GPU modes"""
+        raise NotImplementedError
+        
+    def get_current_gpu_mode(self) -> Optional[str]:
+        """Get current GPU mode"""
+        raise NotImplementedError
+        
+    def set_gpu_mode(self, mode: str) -> Tuple[bool, str]:
+        """Set GPU mode and return success status and output"""
+        raise NotImplementedError
+        
+    def set_battery_charge_limit(self, limit: int) -> Tuple[bool, str]:
+        """Set battery charge limit and return success status and output"""
+        raise NotImplementedError
+        
+    def watch(self, callback: Callable[[str, Any], None]) -> bool:
+        """Report changes made outside this process as callback(key, value)
+        
+        Keys are 'cpu_profile', 'gpu_mode' or 'charge_limit'; value is None
+        if only the fact of a change is known. Delivery needs a running GLib
+        main loop.
+        Returns False if the backend can't watch for changes.
+        """
+        return False
+
+
+class CliBackend(HardwareBackend):
+    """Backend that shells out to asusctl and supergfxctl"""
+    
+    name = 'cli'
+    
+    def __init__(self, run_command: Callable[..., Tuple[bool, str]]):
+        self.run_command = run_command
+        
+    def get_cpu_profiles(self) -> List[str]:
+        """Get available CPU profiles"""
+        success, output = self.run_command(['asusctl', 'profile', '-l'], False)
+        if not success:
+            raise RuntimeError(f"Failed to get CPU profiles: {output}")
+            
+        profiles = []
+        for line in output.split('\n'):
+            line = line.strip()
+            if line and 'Starting' not in line:
+                profiles.append(line)
+                
+        if not profiles:
+            raise RuntimeError(f"No CPU profiles found in output: {repr(output)}")
+            
+        return profiles
+        
+    def get_current_cpu_profile(self) -> Optional[str]:
+        """Get current CPU profile"""
+        success, output = self.run_command(['asusctl', 'profile', '-p'], False)
+        if not success:
+            return None
+            
+        # Parse output to find current profile
+        match = re.search(r'Active profile is\s*(\w+)', output)
+        if match:
+            return match.group(1)
+        return None
+        
+    def set_cpu_profile(self, profile: str) -> Tuple[bool, str]:
+        """Set CPU profile"""
+        return self.run_command(['asusctl', 'profile', '-P', profile])
+        
+    def get_gpu_modes(self) -> List[str]:
+        """Get available GPU modes"""
+        success, output = self.run_command(['supergfxctl', '-s'], False)
+        if not success:
+            raise RuntimeError(f"Failed to run 'supergfxctl -s': {output}")
+            
+        # Parse the output - it can be in different formats
+        modes = []
+        
+        # Check if output looks like a list format: [Mode1, Mode2, Mode3]
+        if output.startswith('[') and output.endswith(']'):
+            # Remove brackets and split by comma
+            content = output[1:-1]
+            for item in content.split(','):
+                mode = item.strip()
+                if mode:
+                    modes.append(mode)
+        else:
+            # Parse line by line for text format
+            for line in output.split('\n'):
+                line = line.strip()
+                if line and not line.startswith('Available') and not line.startswith('Current'):
+                    modes.append(line)
+                    
+        if not modes:
+            raise RuntimeError(f"No GPU modes found in supergfxctl output: {repr(output)}")
+            
+        return modes
+        
+    def get_current_gpu_mode(self) -> Optional[str]:
+        """Get current GPU mode"""
+        success, output = self.run_command(['supergfxctl', '--get'], False)
+        if not success:
+            return None
+        return output.strip()
+        
+    def set_gpu_mode(self, mode: str) -> Tuple[bool, str]:
+        """Set GPU mode"""
+        return self.run_command(['supergfxctl', '-m', mode])
+        
+    def set_battery_charge_limit(self, limit: int) -> Tuple[bool, str]:
+        """Set battery charge limit"""
+        return self.run_command(['asusctl', '-c', str(limit)])
+
+
+class DbusBackend(HardwareBackend):
+    """Backend that talks to asusd and supergfxd over one system bus connection
+    
+    Every call falls back to the given backend (normally CliBackend) when
+    the bus or a daemon is unavailable, so the daemons' D-Bus API is an
+    optimization rather than a requirement. A daemon that can't be reached
+    is tried again after retry_after seconds, so a GUI or policy daemon
+    started before asusd/supergfxd switches to D-Bus once they are up.
+    """
+    
+    name = 'dbus'
+    
+    def __init__(self, fallback: HardwareBackend, bus=None, retry_after: float = UNAVAILABLE_RETRY):
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self._bus = bus
+        self._proxies = {}
+        self._profile_values: Optional[Dict[str, Any]] = None
+        self._unavailable: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        
+    @property
+    def bus(self):
+        """Persistent system bus connection, created on first use"""
+        if self._bus is None:
+            from pydbus import SystemBus
+            self._bus = SystemBus()
+        return self._bus
+        
+    def _proxy(self, bus_name: str, path: str, interface: str):
+        """Return a cached proxy for a daemon interface"""
+        with self._lock:
+            retry_at = self._unavailable.get(bus_name)
+            if retry_at is not None:
+                if time.monotonic() < retry_at:
+                    raise RuntimeError(f"{bus_name} is not available")
+                del self._unavailable[bus_name]
+                
+            key = (bus_name, path, interface)
+            if key not in self._proxies:
+                try:
+                    self._proxies[key] = self.bus.get(bus_name, path)[interface]
+                except Exception:
+                    # Don't pay for a failing introspection on every call
+                    self._unavailable[bus_name] = time.monotonic() + self.retry_after
+                    raise
+            return self._proxies[key]
+            
+    def _platform(self):
+        """asusd platform interface"""
+        return self._proxy(ASUSD_BUS_NAME, ASUSD_PLATFORM_PATH, ASUSD_PLATFORM_INTERFACE)
+        
+    def _gfx(self):
+        """supergfxd interface"""
+        return self._proxy(SUPERGFXD_BUS_NAME, SUPERGFXD_PATH, SUPERGFXD_INTERFACE)
+        
+    def _profiles(self) -> Dict[str, Any]:
+        """Profiles asusd offers (PlatformProfileChoices), mapped to the values it expects"""
+        if self._profile_values is None:
+            values = {}
+            for value in self._platform().PlatformProfileChoices:
+                name = profile_name(value)
+                if name is not None:
+                    values[name] = value
+            if not values:
+                raise RuntimeError("asusd offers no platform profiles")
+            self._profile_values = values
+        return self._profile_values
+        
+    def _call(self, description: str, func: Callable, fallback: Callable):
+        """Run a D-Bus call, using the fallback backend if it fails"""
+        try:
+            with metrics.span('dbus', description):
+                return func()
+        except Exception as e:
+            logger.debug(f"D-Bus {description} failed, falling back to {self.fallback.name}: {e}")
+            return fallback()
+            
+    def get_cpu_profiles(self) -> List[str]:
+        """Get available CPU profiles"""
+        return self._call('profile list', lambda: list(self._profiles()), self.fallback.get_cpu_profiles)
+        
+    def get_current_cpu_profile(self) -> Optional[str]:
+        """Get current CPU profile"""
+        return self._call(
+            'profile read',
+            lambda: profile_name(self._platform().PlatformProfile),
+            self.fallback.get_current_cpu_profile
+        )
+        
+    def set_cpu_profile(self, profile: str) -> Tuple[bool, str]:
+        """Set CPU profile"""
+        def write():
+            profiles = self._profiles()
+            if profile not in profiles:
+                raise ValueError(f"asusd doesn't offer the {profile} profile")
+            self._platform().PlatformProfile = profiles[profile]
+            return True, ''
+        return self._call('profile write', write, lambda: self.fallback.set_cpu_profile(profile))
+        
+    def get_gpu_modes(self) -> List[str]:
+        """Get available GPU modes"""
+        return self._call(
+            'GPU mode list',
+            lambda: [GFX_MODES[mode] for mode in self._gfx().Supported()],
+            self.fallback.get_gpu_modes
+        )
+        
+    def get_current_gpu_mode(self) -> Optional[str]:
+        """Get current GPU mode"""
+        return self._call(
+            'GPU mode read',
+            lambda: GFX_MODES[self._gfx().Mode()],
+            self.fallback.get_current_gpu_mode
+        )
+        
+    def set_gpu_mode(self, mode: str) -> Tuple[bool, str]:
+        """Set GPU mode"""
+        if mode not in GFX_MODES:
+            return self.fallback.set_gpu_mode(mode)
+            
+        def write():
+            self._gfx().SetMode(GFX_MODES.index(mode))
+            return True, ''
+        return self._call('GPU mode write', write, lambda: self.fallback.set_gpu_mode(mode))
+        
+    def set_battery_charge_limit(self, limit: int) -> Tuple[bool, str]:
+        """Set battery charge limit"""
+        def write():
+            self._platform().ChargeControlEndThreshold = limit
+            return True, ''
+        return self._call(
+            'charge limit write', write,
+            lambda: self.fallback.set_battery_charge_limit(limit)
+        )
+        
+    def watch(self, callback: Callable[[str, Any], None]) -> bool:
+        """Subscribe to asusd property changes and supergfxd mode notifications"""
+        def on_platform_changed(sender, path, interface, signal, params):
+            changed_interface, changed, invalidated = params
+            if changed_interface != ASUSD_PLATFORM_INTERFACE:
+                return
+            if 'PlatformProfile' in changed:
+                callback('cpu_profile', profile_name(changed['PlatformProfile']))
+            elif 'PlatformProfile' in invalidated:
+                callback('cpu_profile', None)
+                
+        def on_gfx_changed(sender, path, interface, signal, params):
+            mode = params[0] if params else -1
+            callback('gpu_mode', GFX_MODES[mode] if 0 <= mode < len(GFX_MODES) else None)
+            
+        try:
+            self.bus.subscribe(
+                sender=ASUSD_BUS_NAME, iface='org.freedesktop.DBus.Properties',
+                signal='PropertiesChanged', object=ASUSD_PLATFORM_PATH,
+                signal_fired=on_platform_changed
+            )
+            self.bus.subscribe(
+                sender=SUPERGFXD_BUS_NAME, iface=SUPERGFXD_INTERFACE, signal='NotifyGfx',
+                object=SUPERGFXD_PATH, signal_fired=on_gfx_changed
+            )
+        except Exception as e:
+            logger.debug(f"Cannot watch daemon signals: {e}")
+            return False
+        return True
+
+
+def create_backend(run_command: Callable[..., Tuple[bool, str]], kind: Optional[str] = None,
+                   local: bool = False) -> HardwareBackend:
+    """Create the configured backend (W_HELPER_BACKEND: auto, service, dbus or cli)
+    
+    With auto, a running `w-helper daemon` is used when there is one, so
+    only the daemon talks to the hardware. local=True skips that check.
+    """
+    kind = kind or os.environ.get('W_HELPER_BACKEND', 'auto')
+    cli = CliBackend(run_command)
+    if kind == 'cli':
+        return cli
+        
+    if kind in ('auto', 'service') and not local:
+        from .service import connect_service_backend
+        backend = connect_service_backend()
+        if backend is not None:
+            return backend
+        if kind == 'service':
+            logger.warning("No w-helper daemon is running, using the local backend")
+            
+    if importlib.util.find_spec('pydbus') is None:
+        if kind == 'dbus':
+            logger.warning("pydbus is not installed, using the asusctl/supergfxctl CLI backend")
+        return cli
+        
+    return DbusBackend(fallback=cli)
@@ -0,0 +1,115 @@
+"""
+Short-lived cache for hardware state reads
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_TTL = 2.0
+# Values that can't change while the process runs
+PERMANENT = float('inf')
+
+
+class StateCache:
+    """Cache getter results per key with a time-to-live
+    
+    Only one thread loads a given key at a time; others asking for it
+    meanwhile wait for that result instead of starting their own
+    subprocess. None results and exceptions are not cached. Hits and
+    misses are counted per key.
+    
+    set() and invalidate() bump a per-key generation; a load that was
+    already running when the key was written or invalidated returns its
+    value to its caller but doesn't store it over the newer state.
+    """
+    
+    def __init__(self, ttl: float = DEFAULT_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._values: Dict[str, Tuple[Any, float]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._generations: Dict[str, int] = {}
+        # Bumped by invalidate() without a key
+        self._cleared = 0
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        
+    def _lookup(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for an unexpired entry"""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and self.clock() < entry[1]:
+                return True, entry[0]
+            return False, None
+            
+    def get(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for key, calling loader() on a miss"""
+        found, value = self._lookup(key)
+        if found:
+            self._count(self.hits, key)
+            return value
+            
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have loaded it while we waited
+            found, value = self._lookup(key)
+            if found:
+                self._count(self.hits, key)
+                return value
+                
+            self._count(self.misses, key)
+            with self._lock:
+                generation = self._generation(key)
+            value = loader()
+            if value is not None:
+                with self._lock:
+                    if self._generation(key) == generation:
+                        self._store(key, value, ttl)
+            return value
+            
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value, e.g. after a successful write"""
+        with self._lock:
+            self._bump(key)
+            self._store(key, value, ttl)
+            
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key, or every key"""
+        with self._lock:
+            if key is None:
+                self._cleared += 1
+                self._values.clear()
+            else:
+                self._bump(key)
+                self._values.pop(key, None)
+                
+    def _generation(self, key: str) -> Tuple[int, int]:
+        """Return what a load of key has to match to be stored (lock held)"""
+        return self._cleared, self._generations.get(key, 0)
+        
+    def _bump(self, key: str):
+        """Make loads of key that are running now stale (lock held)"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        
+    def _store(self, key: str, value: Any, ttl: Optional[float]):
+        """Store a value (lock held)"""
+        ttl = self.ttl if ttl is None else ttl
+        self._values[key] = (value, self.clock() + ttl)
+                
+    def _count(self, counter: Dict[str, int], key: str):
+        with self._lock:
+            counter[key] = counter.get(key, 0) + 1
+            
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts, in total and per key"""
+        with self._lock:
+            keys = sorted(set(self.hits) | set(self.misses))
+            return {
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'keys': {key: {'hits': self.hits.get(key, 0), 'misses': self.misses.get(key, 0)}
+                         for key in keys},
+            }
@@ -1,8 +1,37 @@
 #!/usr/bin/env python3
 
 import argparse
+import csv
+import json
 import sys
-from .system_controller import SystemController
+import time
+from .system_controller import STATE_LABELS, SystemController
+from .daemon import DEFAULT_POLL_INTERVAL, PolicyDaemon
+from .history import (DEFAULT_SAMPLE_INTERVAL, EXPORT_FIELDS, HistoryFile, PowerSampler,
+                      downsample, export_row, parse_duration)
+from .instrument import metrics
+from .policy import PolicyError, load_preset, parse_policy
+from .runtime import format_duration
+from .service import DaemonBus, RemoteError, connect_remote
+from .status import (DEFAULT_PROBE_TIMEOUT, DEFAULT_WATCH_INTERVAL, STATUS_PROBES,
+                     collect_status, status_record, watch_status)
+
+# Commands a running GUI can run with its already warm controller
+REMOTE_COMMANDS = ('cpu', 'gpu', 'display', 'battery', 'status')
+
+# Controller getters exercised by `w-helper profile`
+PROFILE_GETTERS = [
+    'get_cpu_profiles',
+    'get_current_cpu_profile',
+    'get_gpu_modes',
+    'get_current_gpu_mode',
+    'get_available_refresh_rates',
+    'get_current_refresh_rate',
+    'get_power_snapshot',
+    'get_battery_info',
+    'get_battery_charge_limit',
+    'get_runtime_estimate',
+]
 
 
 def main():
@@ -35,10 +64,14 @@ def main():
     display_parser = subparsers.add_parser('display', help='Display control')
     display_subparsers = display_parser.add_subparsers(dest='display_action')
     
-    display_subparsers.add_parser('list', help='List available refresh rates')
+    display_subparsers.add_parser('list', help="List each monitor's modes")
     display_subparsers.add_parser('get', help='Get current refresh rate')
     display_set_parser = display_subparsers.add_parser('set', help='Set refresh rate')
     display_set_parser.add_argument('rate', help='Refresh rate in Hz (e.g., 60, 120, 165)')
+    display_set_parser.add_argument(
+        '--persistent', action='store_true',
+        help='Save the change (GNOME asks to keep it) instead of applying it for this session'
+    )
     
     # Battery commands
     battery_parser = subparsers.add_parser('battery', help='Battery control')
@@ -50,7 +83,78 @@ def main():
     battery_set_parser.add_argument('limit', type=int, help='Charge limit percentage (60-100)')
     
     # Status command
-    subparsers.add_parser('status', help='Show system status')
+    status_parser = subparsers.add_parser('status', help='Show system status')
+    status_parser.add_argument(
+        '--timeout', type=float, default=DEFAULT_PROBE_TIMEOUT,
+        help=f'Seconds to wait for each probe (default: {DEFAULT_PROBE_TIMEOUT:g})'
+    )
+    status_parser.add_argument('--json', action='store_true', help='Print status as JSON')
+    status_parser.add_argument(
+        '--watch', action='store_true',
+        help='Keep running and stream newline-delimited JSON records of changed fields'
+    )
+    status_parser.add_argument(
+        '--interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+        help=f'Seconds between --watch samples (default: {DEFAULT_WATCH_INTERVAL:g})'
+    )
+    
+    # History command
+    history_parser = subparsers.add_parser('history', help='Export power draw history')
+    history_parser.add_argument('--format', choices=('csv', 'json'), default='csv',
+                                help='Export format (default: csv)')
+    history_parser.add_argument('--since', default='24h',
+                                help='Export samples newer than this, e.g. 90m, 24h, 7d (default: 24h)')
+    history_parser.add_argument('--resolution',
+                                help='Average samples into buckets of this size, e.g. 5m')
+    history_parser.add_argument('--output', '-o', help='Write to a file instead of stdout')
+    history_parser.add_argument('--file', help='History file (default: under $XDG_STATE_HOME)')
+    history_parser.add_argument(
+        '--record', action='store_true',
+        help='Record samples in the foreground instead of exporting (the GUI records automatically)'
+    )
+    history_parser.add_argument(
+        '--interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+        help=f'Seconds between --record samples (default: {DEFAULT_SAMPLE_INTERVAL:g})'
+    )
+    
+    # Preset command
+    apply_parser = subparsers.add_parser('apply', help='Apply several settings from a preset file')
+    apply_parser.add_argument('preset', help='TOML file with cpu_profile, gpu_mode and/or charge_limit')
+    apply_parser.add_argument('--dry-run', action='store_true', help='Show what would change')
+    
+    # Policy daemon command
+    daemon_parser = subparsers.add_parser(
+        'daemon', help='Switch profiles automatically according to a power policy, optionally serving the session bus'
+    )
+    daemon_parser.add_argument('--config', help='Policy file (default: ~/.config/w-helper/policy.toml)')
+    daemon_parser.add_argument(
+        '--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+        help=f'Seconds between safety re-evaluations (default: {DEFAULT_POLL_INTERVAL:g})'
+    )
+    daemon_parser.add_argument('--once', action='store_true',
+                               help='Evaluate the policy once and exit')
+    daemon_parser.add_argument('--dry-run', action='store_true',
+                               help='Log what the policy would change without applying it')
+    daemon_parser.add_argument(
+        '--bus', action='store_true',
+        help='Serve the controller on the session bus; the GUI and CLI then go through the daemon'
+    )
+    daemon_parser.add_argument('--no-policy', action='store_true',
+                               help='Apply no policy, only serve the session bus (needs --bus)')
+    
+    # Profiling command
+    profile_parser = subparsers.add_parser(
+        'profile', help='Time every getter and print a latency table'
+    )
+    profile_parser.add_argument('--iterations', '-n', type=int, default=10,
+                                help='Calls per getter (default: 10)')
+    profile_parser.add_argument(
+        '--cached', action='store_true',
+        help='Keep the state cache between calls instead of measuring the backend every time'
+    )
+    profile_parser.add_argument('--json', metavar='FILE', help='Write the latency table as JSON')
+    profile_parser.add_argument('--trace', metavar='FILE',
+                                help='Write every call in Chrome trace format (chrome://tracing, Perfetto)')
     
     # GUI command
     subparsers.add_parser('gui', help='Launch GUI interface')
@@ -67,13 +171,36 @@ def main():
         from .main import main as gui_main
         return gui_main()
     
+    # Exporting history only reads the history file
+    if args.command == 'history' and not args.record:
+        return handle_history_export(args)
+    
+    # Use the running instance's controller if there is one
+    controller = None
+    if args.command in REMOTE_COMMANDS and not getattr(args, 'watch', False):
+        controller = connect_remote()
+    
     # Create system controller
+    if controller is None:
+        try:
+            # The daemon is what other instances talk to, so it must drive the hardware itself
+            controller = SystemController(local=args.command == 'daemon')
+        except Exception as e:
+            print(f"❌ Error initializing system controller: {e}")
+            return 1
+    
     try:
-        controller = SystemController()
-    except Exception as e:
-        print(f"❌ Error initializing system controller: {e}")
+        return dispatch_command(controller, args)
+    except RemoteError as e:
+        print(f"❌ Running instance failed: {e}")
         return 1
-    
+    finally:
+        # Stop tool invocations abandoned by a status probe timeout
+        controller.cancel_commands()
+
+
+def dispatch_command(controller, args):
+    """Run a command that needs the system controller"""
     # Handle CPU commands
     if args.command == 'cpu':
         return handle_cpu_command(controller, args)
@@ -92,7 +219,23 @@ def main():
     
     # Handle status command
     elif args.command == 'status':
-        return handle_status_command(controller)
+        return handle_status_command(controller, args)
+    
+    # Handle history recording
+    elif args.command == 'history':
+        return handle_history_record(controller, args)
+    
+    # Handle presets
+    elif args.command == 'apply':
+        return handle_apply_command(controller, args)
+    
+    # Handle policy daemon
+    elif args.command == 'daemon':
+        return handle_daemon_command(controller, args)
+    
+    # Handle profiling
+    elif args.command == 'profile':
+        return handle_profile_command(controller, args)
     
     return 0
 
@@ -163,10 +306,19 @@ def handle_gpu_command(controller, args):
 def handle_display_command(controller, args):
     """Handle display commands"""
     if args.display_action == 'list':
-        rates = controller.get_available_refresh_rates()
-        print("Available refresh rates:")
-        for rate in rates:
-            print(f"  • {rate}Hz")
+        try:
+            monitors = controller.get_monitors()
+        except Exception as e:
+            print(f"❌ Failed to get display modes: {e}")
+            return 1
+        print("Display modes (* current, + preferred):")
+        for monitor in monitors:
+            state = '' if monitor.enabled else ' (disabled)'
+            print(f"  {monitor.connector}: {monitor.display_name}{state}")
+            for width, height in monitor.resolutions:
+                rates = [f"{mode.label}Hz{'*' if mode.is_current else ''}{'+' if mode.is_preferred else ''}"
+                         for mode in monitor.modes_at(width, height)]
+                print(f"    {width}x{height}  {'  '.join(rates)}")
     
     elif args.display_action == 'get':
         rate = controller.get_current_refresh_rate()
@@ -177,7 +329,7 @@ def handle_display_command(controller, args):
             return 1
     
     elif args.display_action == 'set':
-        success = controller.set_refresh_rate(args.rate)
+        success = controller.set_refresh_rate(args.rate, args.persistent)
         if success:
             print(f"✅ Refresh rate set to {args.rate}Hz")
         else:
@@ -194,7 +346,8 @@ def handle_battery_command(controller, args):
         if info:
             print("Battery Information:")
             for key, value in info.items():
-                print(f"  {key.capitalize()}: {value}")
+                print(f"  {key.replace('_', ' ').capitalize()}: {value}")
+            print_runtime_estimate(controller.get_runtime_estimate())
         else:
             print("❌ Could not get battery information")
             return 1
@@ -222,50 +375,265 @@ def handle_battery_command(controller, args):
     return 0
 
 
-def handle_status_command(controller):
+def print_runtime_estimate(estimate):
+    """Print the remaining runtime and what other CPU profiles/GPU modes would give"""
+    if estimate is None:
+        return
+    
+    basis = 'average' if estimate.source == 'learned' else 'current draw'
+    print(f"  Runtime: {format_duration(estimate.seconds)} at {estimate.watts:.1f} W ({basis})")
+    
+    current = (estimate.cpu_profile, estimate.gpu_mode)
+    others = sorted((seconds, key) for key, seconds in estimate.alternatives.items() if key != current)
+    if others:
+        print("  Runtime by CPU profile / GPU mode:")
+        for seconds, (profile, mode) in reversed(others):
+            print(f"    {profile or 'Unknown'} / {mode or 'Unknown'}: {format_duration(seconds)}")
+
+
+def format_status_value(key, value):
+    """Format a status probe value for display"""
+    if key == 'refresh_rate':
+        return f"{value}Hz" if value else 'Unknown'
+    if key == 'battery':
+        if not value:
+            return 'Unknown'
+        capacity = value.get('capacity', 'Unknown')
+        status = value.get('status', 'Unknown')
+        return f"{capacity} ({status})"
+    if key == 'charge_limit':
+        return f"{value}%" if value else 'Unknown'
+    return value if value else 'Unknown'
+
+
+def handle_status_command(controller, args):
     """Handle status command"""
+    if args.watch:
+        if args.interval <= 0:
+            print("❌ Interval must be greater than 0")
+            return 1
+        try:
+            for changes in watch_status(controller, interval=args.interval, timeout=args.timeout):
+                print(json.dumps(changes), flush=True)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return 0
+    
+    results = collect_status(controller, timeout=args.timeout)
+    
+    if args.json:
+        print(json.dumps(status_record(results), indent=2))
+        return 0
+    
     print("W-Helper System Status")
     print("=====================")
     
-    # CPU Profile
+    for key, label, getter in STATUS_PROBES:
+        result = results[key]
+        if result.error is not None:
+            print(f"{label}: Error - {result.error}")
+        else:
+            print(f"{label}: {format_status_value(key, result.value)}")
+    
+    return 0
+
+
+def handle_history_export(args):
+    """Export recorded power draw history"""
     try:
-        cpu_profile = controller.get_current_cpu_profile()
-        print(f"CPU Profile: {cpu_profile if cpu_profile else 'Unknown'}")
-    except Exception as e:
-        print(f"CPU Profile: Error - {e}")
+        since = time.time() - parse_duration(args.since)
+        resolution = parse_duration(args.resolution) if args.resolution else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if resolution is not None and resolution <= 0:
+        print("❌ Resolution must be greater than 0")
+        return 1
     
-    # GPU Mode
+    samples = HistoryFile(args.file).samples(since=since)
+    if resolution:
+        samples = downsample(samples, resolution)
+    
+    output = sys.stdout
     try:
-        gpu_mode = controller.get_current_gpu_mode()
-        print(f"GPU Mode: {gpu_mode if gpu_mode else 'Unknown'}")
-    except Exception as e:
-        print(f"GPU Mode: Error - {e}")
+        if args.output:
+            output = open(args.output, 'w', newline='')
+        if args.format == 'json':
+            json.dump([export_row(sample) for sample in samples], output, indent=2)
+            output.write('\n')
+        else:
+            writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for sample in samples:
+                writer.writerow(export_row(sample))
+    except (OSError, ValueError) as e:
+        print(f"❌ Failed to export history: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
     
-    # Display
+    return 0
+
+
+def handle_history_record(controller, args):
+    """Record power draw history until interrupted"""
+    if args.interval <= 0:
+        print("❌ Interval must be greater than 0")
+        return 1
+    
+    sampler = PowerSampler(controller, history_file=HistoryFile(args.file), interval=args.interval)
+    print(f"Recording power draw to {sampler.file.path} every {args.interval:g}s (Ctrl+C to stop)")
+    sampler.start()
     try:
-        refresh_rate = controller.get_current_refresh_rate()
-        print(f"Refresh Rate: {refresh_rate + 'Hz' if refresh_rate else 'Unknown'}")
-    except Exception as e:
-        print(f"Refresh Rate: Error - {e}")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.stop()
     
-    # Battery
+    return 0
+
+
+def handle_apply_command(controller, args):
+    """Apply a preset file"""
     try:
-        battery_info = controller.get_battery_info()
-        if battery_info:
-            capacity = battery_info.get('capacity', 'Unknown')
-            status = battery_info.get('status', 'Unknown')
-            print(f"Battery: {capacity} ({status})")
-        else:
-            print("Battery: Unknown")
-    except Exception as e:
-        print(f"Battery: Error - {e}")
+        desired = load_preset(args.preset)
+    except PolicyError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    if args.dry_run:
+        current, changes = controller.diff_state(desired)
+        for key, value in current.items():
+            label = STATE_LABELS[key][0].upper() + STATE_LABELS[key][1:]
+            if key in changes:
+                print(f"  {label}: {value if value is not None else 'Unknown'} → {changes[key]}")
+            else:
+                print(f"  {label}: {value} (unchanged)")
+        return 0
+    
+    result = controller.apply_state(desired)
+    if result.success:
+        print(f"✅ {result.message}")
+        return 0
+    print(f"❌ {result.message}")
+    return 1
+
+
+def handle_daemon_command(controller, args):
+    """Run the power policy daemon"""
+    if args.poll_interval <= 0:
+        print("❌ Poll interval must be greater than 0")
+        return 1
+    if args.no_policy and not args.bus:
+        print("❌ --no-policy only makes sense with --bus")
+        return 1
+    
+    try:
+        daemon = PolicyDaemon(controller, policy_file=args.config,
+                              policy=parse_policy({}) if args.no_policy else None,
+                              poll_interval=args.poll_interval, dry_run=args.dry_run)
+    except PolicyError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    if args.once:
+        state = daemon.read_state()
+        daemon.engine.step(state, dry_run=args.dry_run)
+        rates = daemon.refresh_rates.update(state.ac_online, dry_run=args.dry_run)
+        daemon.close()
+        if not daemon.engine.applied and not rates:
+            print("No policy rule matches")
+        for key, value in daemon.engine.applied.items():
+            print(f"  {key.replace('_', ' ').capitalize()}: {value} ({daemon.engine.reasons[key]})")
+        for connector, rate in rates.items():
+            print(f"  Refresh rate of {connector}: {rate:g}Hz ({'AC' if state.ac_online else 'battery'})")
+        return 0
+    
+    bus = None
+    if args.bus:
+        bus = DaemonBus(controller)
+        if not bus.start():
+            print(f"❌ Cannot serve on the session bus: {bus.error}")
+            daemon.close()
+            return 1
     
     try:
-        charge_limit = controller.get_battery_charge_limit()
-        print(f"Charge Limit: {charge_limit}%" if charge_limit else "Charge Limit: Unknown")
-    except Exception as e:
-        print(f"Charge Limit: Error - {e}")
+        daemon.run()
+    finally:
+        if bus is not None:
+            bus.stop()
+    return 0
+
+
+def format_latency(ms):
+    """Format a duration in milliseconds, switching to µs below 1 ms"""
+    if ms < 1:
+        return f"{ms * 1000:.0f}µs"
+    return f"{ms:.1f}ms"
+
+
+def print_latency_table(rows):
+    """Print metrics rows grouped by category"""
+    width = max([len(row['name']) for row in rows] + [9])
+    print(f"  {'Operation':<{width}} {'Count':>6} {'Total':>9} {'p50':>8} {'p95':>8} {'Max':>8}")
+    for category in ('controller', 'command', 'dbus', 'sysfs'):
+        category_rows = [row for row in rows if row['category'] == category]
+        if not category_rows:
+            continue
+        print(f"{category}:")
+        for row in category_rows:
+            print(f"  {row['name']:<{width}} {row['count']:>6} {format_latency(row['total_ms']):>9} "
+                  f"{format_latency(row['p50_ms']):>8} {format_latency(row['p95_ms']):>8} "
+                  f"{format_latency(row['max_ms']):>8}")
+
+
+def handle_profile_command(controller, args):
+    """Call every getter repeatedly and report latencies"""
+    if args.iterations <= 0:
+        print("❌ Iterations must be greater than 0")
+        return 1
+    
+    metrics.reset()
+    metrics.enable(tracing=bool(args.trace))
+    errors = {}
+    for _ in range(args.iterations):
+        for getter in PROFILE_GETTERS:
+            if not args.cached:
+                controller.cache.invalidate()
+                controller.display.invalidate()
+            try:
+                getattr(controller, getter)()
+            except Exception as e:
+                errors[getter] = str(e)
+    metrics.disable()
+    
+    rows = metrics.summary()
+    print(f"W-Helper latency profile ({args.iterations} calls per getter, {controller.backend.name} backend)")
+    print("=" * 60)
+    print_latency_table(rows)
+    if args.cached:
+        stats = controller.get_cache_stats()
+        print(f"State cache: {stats['hits']} hits, {stats['misses']} misses")
+    for getter, error in errors.items():
+        print(f"⚠️  {getter}: {error}")
     
+    try:
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'iterations': args.iterations, 'backend': controller.backend.name,
+                           'operations': rows, 'cache': controller.get_cache_stats(),
+                           'errors': errors}, f, indent=2)
+            print(f"📄 Wrote {args.json}")
+        if args.trace:
+            with open(args.trace, 'w') as f:
+                json.dump(metrics.chrome_trace(), f)
+            print(f"📄 Wrote {args.trace}")
+    except OSError as e:
+        print(f"❌ Failed to write profile: {e}")
+        return 1
     return 0
 
 
@@ -0,0 +1,135 @@
+"""
+Debounced, coalesced writes for slider-style controls
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUIET_PERIOD = 0.4
+
+
+class WriteCoalescer:
+    """Apply only the latest value per setting once input has settled
+    
+    submit() records a pending value and (re)arms a quiet-period timer.
+    When the timer expires the latest value is written through the
+    registered setter, unless it equals the last value known to be on the
+    hardware (or the one already being written), in which case the write
+    is skipped. Writes for one key are serialized on a task queue named
+    after the key.
+    """
+    
+    def __init__(self, run_async: Callable, quiet_period: float = DEFAULT_QUIET_PERIOD):
+        self.run_async = run_async
+        self.quiet_period = quiet_period
+        self._setters: Dict[str, Callable[[Any], bool]] = {}
+        self._known: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+        self._in_flight: Dict[str, Any] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._callbacks: Dict[str, Optional[Callable]] = {}
+        self._lock = threading.Lock()
+        
+    def register(self, key: str, setter: Callable[[Any], bool]):
+        """Register the setter used to apply a key; it must return success"""
+        self._setters[key] = setter
+        
+    def set_known(self, key: str, value: Any):
+        """Record the value currently on the hardware"""
+        with self._lock:
+            self._known[key] = value
+            
+    def get_known(self, key: str) -> Any:
+        """Return the last value known to be on the hardware"""
+        return self._known.get(key)
+        
+    def submit(self, key: str, value: Any, callback: Optional[Callable[[bool], Any]] = None):
+        """Schedule a write of value, replacing any pending value for key
+        
+        callback(success) is delivered through the controller's dispatcher
+        when the write finishes; it is not called for skipped writes.
+        """
+        if key not in self._setters:
+            raise KeyError(f"No setter registered for {key}")
+            
+        with self._lock:
+            self._pending[key] = value
+            self._callbacks[key] = callback
+            self._deadlines[key] = time.monotonic() + self.quiet_period
+            if key not in self._timers:
+                self._start_timer(key, self.quiet_period)
+                
+    def flush(self, key: str):
+        """Apply a pending value immediately"""
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+        self._apply(key)
+        
+    def cancel(self, key: str):
+        """Drop a pending value without writing it"""
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            self._pending.pop(key, None)
+            self._callbacks.pop(key, None)
+            
+    def _start_timer(self, key: str, delay: float):
+        """Arm the quiet-period timer for a key (lock held)"""
+        timer = threading.Timer(delay, self._on_timer, args=(key,))
+        timer.daemon = True
+        self._timers[key] = timer
+        timer.start()
+        
+    def _on_timer(self, key: str):
+        """Apply the pending value, or wait longer if input is still arriving"""
+        with self._lock:
+            if self._timers.get(key) is not threading.current_thread():
+                # Cancelled or superseded by flush()
+                return
+                
+            # One timer per burst: rather than restarting it on every
+            # submit, re-arm it for whatever is left of the quiet period
+            remaining = self._deadlines.get(key, 0) - time.monotonic()
+            if remaining > 0:
+                self._start_timer(key, remaining)
+                return
+            self._timers.pop(key, None)
+        self._apply(key)
+        
+    def _apply(self, key: str):
+        """Write the pending value for a key if it differs from the hardware"""
+        with self._lock:
+            if key not in self._pending:
+                return
+            value = self._pending.pop(key)
+            callback = self._callbacks.pop(key, None)
+            
+            expected = self._in_flight.get(key, self._known.get(key))
+            if expected is not None and expected == value:
+                logger.debug(f"Skipping {key} write, already {value}")
+                return
+            self._in_flight[key] = value
+            
+        setter = self._setters[key]
+        
+        def write():
+            success = False
+            try:
+                success = setter(value)
+                return success
+            finally:
+                with self._lock:
+                    if self._in_flight.get(key) == value:
+                        del self._in_flight[key]
+                    if success:
+                        self._known[key] = value
+                        
+        self.run_async(write, callback=callback, queue=key)
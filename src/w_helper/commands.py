@@ -0,0 +1,237 @@
+"""
+Managed execution of the external command line tools
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .instrument import command_label, metrics
+from .tools import ToolResolver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+TIMEOUT_ENV = 'W_HELPER_COMMAND_TIMEOUT'
+# Commands known to take longer than the default, by argument prefix.
+# A GPU mode switch waits for the driver to be unloaded.
+DEFAULT_TIMEOUTS: Dict[Tuple[str, ...], float] = {
+    ('supergfxctl', '-m'): 60.0,
+}
+# Concurrent invocations per tool. asusctl and supergfxctl only forward
+# requests to their daemon, which handles them one at a time anyway.
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TOOL_LIMITS: Dict[str, int] = {
+    'asusctl': 1,
+    'supergfxctl': 1,
+}
+# Grace period between SIGTERM and SIGKILL
+KILL_GRACE = 0.5
+# How often a waiting command checks for cancellation
+POLL_INTERVAL = 0.05
+
+
+class CommandResult(NamedTuple):
+    """Outcome of a command run through CommandRunner"""
+    command: List[str]
+    # None if the command did not exit on its own
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+    cancelled: bool = False
+    # Set when the command could not be started
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the command ran and exited with status 0"""
+        return self.returncode == 0
+        
+    @property
+    def message(self) -> str:
+        """Error description for a failed command, or its output"""
+        if self.error is not None:
+            return self.error
+        if self.timed_out:
+            return f"{self.command[0]} timed out after {self.duration:.1f}s"
+        if self.cancelled:
+            return f"{self.command[0]} was cancelled"
+        if self.returncode != 0:
+            return self.stderr.strip() or f"{self.command[0]} exited with status {self.returncode}"
+        return self.stdout.strip()
+
+
+def default_timeout() -> float:
+    """Return the default command timeout, honouring W_HELPER_COMMAND_TIMEOUT"""
+    value = os.environ.get(TIMEOUT_ENV)
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid {TIMEOUT_ENV}: {value}")
+    return DEFAULT_TIMEOUT
+
+
+class CommandRunner:
+    """Run tools with timeouts, cancellation and per-tool concurrency limits
+    
+    Every command runs in its own process group, so a timeout or cancel
+    also stops whatever the tool spawned. At most `limits[tool]` commands
+    of the same tool run at once (DEFAULT_CONCURRENCY for other tools);
+    further calls wait their turn, and that wait counts towards their
+    timeout. cancel_all() stops running and waiting commands, e.g. when
+    the application shuts down.
+    """
+    
+    def __init__(self, tools: ToolResolver, timeout: Optional[float] = None,
+                 timeouts: Optional[Dict[Tuple[str, ...], float]] = None,
+                 limits: Optional[Dict[str, int]] = None):
+        self.tools = tools
+        self.timeout = timeout if timeout is not None else default_timeout()
+        self.timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self.limits = dict(DEFAULT_TOOL_LIMITS if limits is None else limits)
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._running: Set[subprocess.Popen] = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        
+    def timeout_for(self, command: List[str]) -> float:
+        """Return the timeout for a command (the longest matching prefix wins)"""
+        best = None
+        for prefix, seconds in self.timeouts.items():
+            if tuple(command[:len(prefix)]) == prefix and (best is None or len(prefix) > len(best[0])):
+                best = (prefix, seconds)
+        return best[1] if best is not None else self.timeout
+        
+    def _slot(self, tool: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if tool not in self._slots:
+                self._slots[tool] = threading.BoundedSemaphore(self.limits.get(tool, DEFAULT_CONCURRENCY))
+            return self._slots[tool]
+            
+    def run(self, command: List[str], timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None) -> CommandResult:
+        """Run a command and return its result; never raises for command failures
+        
+        `cancel` stops this command when set; cancel_all() stops every
+        command started before it was called.
+        """
+        with metrics.span('command', command_label(command)):
+            return self._run(command, timeout, cancel)
+            
+    def _run(self, command: List[str], timeout: Optional[float],
+             cancel: Optional[threading.Event]) -> CommandResult:
+        start = time.monotonic()
+        timeout = timeout if timeout is not None else self.timeout_for(command)
+        deadline = start + timeout
+        with self._lock:
+            generation = self._generation
+            
+        def cancelled() -> bool:
+            with self._lock:
+                if self._generation != generation:
+                    return True
+            return cancel is not None and cancel.is_set()
+            
+        def finish(**fields) -> CommandResult:
+            fields.setdefault('returncode', None)
+            fields.setdefault('stdout', '')
+            fields.setdefault('stderr', '')
+            return CommandResult(command=list(command), duration=time.monotonic() - start, **fields)
+            
+        executable = self.tools.resolve(command[0])
+        if executable is None:
+            return finish(error=f"Command not found: {command[0]}")
+            
+        slot = self._slot(command[0])
+        while not slot.acquire(timeout=POLL_INTERVAL):
+            if cancelled():
+                return finish(cancelled=True)
+            if time.monotonic() >= deadline:
+                return finish(timed_out=True)
+                
+        try:
+            if cancelled():
+                return finish(cancelled=True)
+            try:
+                process = subprocess.Popen(
+                    [executable] + command[1:],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    start_new_session=True
+                )
+            except FileNotFoundError:
+                # The binary disappeared since it was resolved
+                self.tools.invalidate(command[0])
+                return finish(error=f"Command not found: {command[0]}")
+            except OSError as e:
+                return finish(error=f"Cannot run {command[0]}: {e}")
+                
+            with self._lock:
+                self._running.add(process)
+            try:
+                return self._wait(process, deadline, cancelled, finish)
+            finally:
+                with self._lock:
+                    self._running.discard(process)
+        finally:
+            slot.release()
+            
+    def _wait(self, process: subprocess.Popen, deadline: float, cancelled, finish) -> CommandResult:
+        """Collect a process's output, stopping it on timeout or cancel"""
+        while True:
+            try:
+                stdout, stderr = process.communicate(
+                    timeout=max(0.0, min(POLL_INTERVAL, deadline - time.monotonic()))
+                )
+                if process.returncode < 0 and cancelled():
+                    # Killed by cancel_all() before we got to it
+                    return finish(stdout=stdout, stderr=stderr, cancelled=True)
+                return finish(returncode=process.returncode, stdout=stdout, stderr=stderr)
+            except subprocess.TimeoutExpired:
+                pass
+            if cancelled():
+                stdout, stderr = self._stop(process)
+                return finish(stdout=stdout, stderr=stderr, cancelled=True)
+            if time.monotonic() >= deadline:
+                stdout, stderr = self._stop(process)
+                return finish(stdout=stdout, stderr=stderr, timed_out=True)
+                
+    def _stop(self, process: subprocess.Popen) -> Tuple[str, str]:
+        """Terminate a process group and return the output collected so far"""
+        for sig, grace in ((signal.SIGTERM, KILL_GRACE), (signal.SIGKILL, KILL_GRACE)):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                pass
+            try:
+                stdout, stderr = process.communicate(timeout=grace)
+                return stdout or '', stderr or ''
+            except subprocess.TimeoutExpired:
+                continue
+        return '', ''
+        
+    def cancel_all(self):
+        """Stop every running and waiting command"""
+        with self._lock:
+            self._generation += 1
+            running = list(self._running)
+        for process in running:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+                
+    @property
+    def running(self) -> int:
+        """Number of commands currently executing"""
+        with self._lock:
+            return len(self._running)
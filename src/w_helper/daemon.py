@@ -0,0 +1,265 @@
+"""
+Background service that applies the power policy on power supply events
+"""
+
+import datetime
+import logging
+import os
+import selectors
+import signal
+import socket
+import time
+from typing import Callable, Optional
+
+from .policy import PolicyConfig, PolicyEngine, PolicyError, PowerState, load_policy
+from .power_supply import DEFAULT_SYSFS_ROOT
+from .processes import DEFAULT_PROC_ROOT, ProcessWatcher
+from .refresh_rate import RefreshRateSwitcher
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_BUFFER_SIZE = 16384
+# Safety re-evaluation for firmware that skips capacity uevents
+DEFAULT_POLL_INTERVAL = 60.0
+
+
+class UeventListener:
+    """Receive kernel power_supply uevents over netlink
+    
+    The kernel broadcasts a uevent whenever an adapter is plugged in or
+    unplugged and when a battery changes state; reading them needs no
+    privileges and no GObject main loop.
+    """
+    
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.setblocking(False)
+        # Group 1 carries the raw kernel events
+        self.sock.bind((0, 1))
+        
+    def fileno(self) -> int:
+        return self.sock.fileno()
+        
+    def read(self) -> bool:
+        """Drain pending events; return whether any came from a power supply"""
+        relevant = False
+        while True:
+            try:
+                data = self.sock.recv(UEVENT_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return relevant
+            if b'\0SUBSYSTEM=power_supply\0' in data + b'\0':
+                relevant = True
+                
+    def close(self):
+        self.sock.close()
+
+
+class PolicyDaemon:
+    """Evaluate the policy when power supplies change or a time rule flips
+    
+    The loop sleeps in select() until a uevent arrives, the next
+    time-of-day boundary is reached or the safety poll expires. Events are
+    debounced so a flapping adapter causes one evaluation. When rules
+    have `running` conditions, /proc is also scanned periodically and
+    the policy re-evaluated when one of them starts or stops matching.
+    Monitors are switched to their [refresh_rate] for the power source
+    when the AC adapter is plugged in or removed. SIGHUP reloads the
+    policy file, SIGUSR1 forces an evaluation, SIGINT/SIGTERM stop.
+    
+    uevents are only used with the real /sys tree; with a fake tree
+    (W_HELPER_SYSFS_ROOT) the daemon relies on the poll interval and
+    SIGUSR1.
+    """
+    
+    def __init__(self, controller, policy_file: Optional[str] = None, policy: Optional[PolicyConfig] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, dry_run: bool = False,
+                 clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+                 proc_root: str = DEFAULT_PROC_ROOT):
+        self.controller = controller
+        self.policy_file = policy_file
+        self.poll_interval = poll_interval
+        self.dry_run = dry_run
+        self.clock = clock
+        self.proc_root = proc_root
+        # A policy passed in (e.g. an empty one) is not reloaded from a file
+        self.static_policy = policy is not None
+        self.engine = PolicyEngine(controller, policy if policy is not None else load_policy(policy_file))
+        self.refresh_rates = RefreshRateSwitcher(controller, self.config.refresh_rates)
+        self.watcher: Optional[ProcessWatcher] = None
+        self._next_scan = 0.0
+        self._boundary: Optional[datetime.datetime] = None
+        self.create_watcher()
+        self.listener: Optional[UeventListener] = None
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self._pending_signals = []
+        self._running = False
+        
+    @property
+    def config(self) -> PolicyConfig:
+        return self.engine.config
+        
+    def create_watcher(self):
+        """Watch processes if any rule has a `running` condition"""
+        rules = self.config.process_rules
+        if not rules:
+            self.watcher = None
+            return
+        self.watcher = ProcessWatcher(rules, proc_root=self.proc_root,
+                                      interval=self.config.process_scan_interval,
+                                      linger=self.config.process_linger)
+        self.scan_processes()
+        
+    def scan_processes(self) -> bool:
+        """Scan /proc; return whether a process rule became active or inactive"""
+        try:
+            changed = self.watcher.scan()
+        except OSError as e:
+            logger.warning(f"Process scan failed: {e}")
+            changed = False
+        self._next_scan = time.monotonic() + self.watcher.interval
+        return changed
+        
+    def read_state(self) -> PowerState:
+        """Read the inputs for the rules"""
+        snapshot = self.controller.get_power_snapshot()
+        battery = snapshot.battery
+        return PowerState(
+            ac_online=snapshot.ac_online,
+            capacity=battery.capacity if battery is not None else None,
+            now=self.clock(),
+            running=self.watcher.active() if self.watcher is not None else frozenset(),
+        )
+        
+    def evaluate(self):
+        """Evaluate the rules against the current state"""
+        try:
+            state = self.read_state()
+            self.engine.step(state, dry_run=self.dry_run)
+            self.refresh_rates.update(state.ac_online, dry_run=self.dry_run)
+        except Exception:
+            logger.exception("Policy evaluation failed")
+            
+    def reload(self):
+        """Re-read the policy file, keeping the old rules if it is invalid"""
+        if self.static_policy:
+            self.evaluate()
+            return
+        try:
+            self.engine.reload(load_policy(self.policy_file))
+            self.refresh_rates.reload(self.config.refresh_rates)
+            self.create_watcher()
+            logger.info("Policy reloaded")
+        except PolicyError as e:
+            logger.error(f"Keeping previous policy: {e}")
+            return
+        self.evaluate()
+        
+    def open_listener(self):
+        """Subscribe to uevents when reading the real sysfs tree"""
+        if os.path.realpath(self.controller.power.root) != os.path.realpath(DEFAULT_SYSFS_ROOT):
+            logger.info(f"Reading {self.controller.power.root}; polling every {self.poll_interval:g}s")
+            return
+        try:
+            self.listener = UeventListener()
+        except OSError as e:
+            logger.warning(f"Cannot listen for uevents ({e}); polling every {self.poll_interval:g}s")
+            return
+        self._selector.register(self.listener, selectors.EVENT_READ)
+        
+    def on_signal(self, signum, frame):
+        """Queue a signal for the main loop"""
+        self._pending_signals.append(signum)
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except BlockingIOError:
+            pass
+            
+    def next_wakeup(self, *deadlines: Optional[float]) -> float:
+        """Seconds until the earliest monotonic deadline or time rule boundary"""
+        now = time.monotonic()
+        timeout = min(deadline - now for deadline in deadlines if deadline is not None)
+        self._boundary = self.engine.next_boundary(self.clock())
+        if self._boundary is not None:
+            # A second late so the new minute is definitely inside the window
+            self._boundary += datetime.timedelta(seconds=1)
+            timeout = min(timeout, (self._boundary - self.clock()).total_seconds())
+        return max(0.0, timeout)
+        
+    def handle_signals(self) -> bool:
+        """Handle queued signals; return True if the daemon should evaluate now"""
+        evaluate = False
+        while self._pending_signals:
+            signum = self._pending_signals.pop(0)
+            if signum in (signal.SIGINT, signal.SIGTERM):
+                self._running = False
+            elif signum == signal.SIGHUP:
+                self.reload()
+            elif signum == signal.SIGUSR1:
+                evaluate = True
+        return evaluate
+        
+    def run(self):
+        """Run until SIGINT/SIGTERM"""
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(signum, self.on_signal)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self.open_listener()
+        
+        logger.info(f"Policy daemon started with {len(self.config.rules)} rules")
+        if self.watcher is not None:
+            logger.info(f"Watching processes for {len(self.watcher.rules)} rules, "
+                        f"initial scan of {len(self.watcher.pids)} processes took "
+                        f"{self.watcher.last_scan_duration * 1000:.1f} ms")
+        self.evaluate()
+        
+        self._running = True
+        debounce_until = None
+        next_poll = time.monotonic() + self.poll_interval
+        try:
+            while self._running:
+                next_scan = self._next_scan if self.watcher is not None else None
+                events = self._selector.select(self.next_wakeup(next_poll, next_scan, debounce_until))
+                evaluate = False
+                
+                for key, _ in events:
+                    if key.fileobj is self.listener:
+                        if self.listener.read() and debounce_until is None:
+                            debounce_until = time.monotonic() + self.config.debounce
+                    else:
+                        try:
+                            os.read(self._wakeup_read, 512)
+                        except BlockingIOError:
+                            pass
+                        evaluate |= self.handle_signals()
+                        
+                now = time.monotonic()
+                if self.watcher is not None and now >= self._next_scan:
+                    evaluate |= self.scan_processes()
+                if debounce_until is not None:
+                    if now < debounce_until:
+                        continue
+                    debounce_until = None
+                    evaluate = True
+                evaluate |= now >= next_poll
+                evaluate |= self._boundary is not None and self.clock() >= self._boundary
+                    
+                if evaluate and self._running:
+                    self.evaluate()
+                    next_poll = now + self.poll_interval
+        finally:
+            self.close()
+        logger.info("Policy daemon stopped")
+        
+    def close(self):
+        """Release the event sources"""
+        self._selector.close()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
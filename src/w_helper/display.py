@@ -0,0 +1,312 @@
+"""
+Shared client for GNOME Mutter's DisplayConfig D-Bus interface
+"""
+
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .instrument import metrics
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_CONFIG_BUS_NAME = 'org.gnome.Mutter.DisplayConfig'
+DISPLAY_CONFIG_PATH = '/org/gnome/Mutter/DisplayConfig'
+
+# ApplyMonitorsConfig methods: verify only, apply until the session ends,
+# or apply and save to monitors.xml (GNOME Shell then asks to keep it)
+APPLY_VERIFY = 0
+APPLY_TEMPORARY = 1
+APPLY_PERSISTENT = 2
+
+
+def format_refresh_rate(refresh: float) -> str:
+    """Label a refresh rate: "165" for whole rates, "164.97" otherwise"""
+    if abs(refresh - round(refresh)) < 0.005:
+        return str(int(round(refresh)))
+    return f"{refresh:.2f}"
+
+
+class DisplayMode(NamedTuple):
+    """One mode of a monitor as reported by GetCurrentState"""
+    id: str
+    width: int
+    height: int
+    refresh: float
+    preferred_scale: float
+    supported_scales: Tuple[float, ...]
+    is_current: bool
+    is_preferred: bool
+    
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        return self.width, self.height
+        
+    @property
+    def label(self) -> str:
+        return format_refresh_rate(self.refresh)
+
+
+class Monitor:
+    """A physical monitor and its mode table
+    
+    Modes are indexed by (width, height, refresh) and by (width, height,
+    rounded refresh), so finding the mode for a rate at a resolution is a
+    dictionary lookup plus a pick among the few modes in the nearest
+    whole Hz (e.g. 165.00 and 164.97). The current and preferred modes
+    are found while parsing.
+    """
+    
+    def __init__(self, raw: Sequence):
+        # Kept as received so the monitor can be sent over the bus as-is
+        self.raw = raw
+        spec, modes, properties = raw
+        self.connector, self.vendor, self.product, self.serial_number = spec
+        self.display_name: str = properties.get('display-name') or self.connector
+        self.is_builtin: bool = bool(properties.get('is-builtin', False))
+        self.modes: List[DisplayMode] = []
+        self.current: Optional[DisplayMode] = None
+        self.preferred: Optional[DisplayMode] = None
+        self._by_rate: Dict[Tuple[int, int, float], DisplayMode] = {}
+        self._by_whole_rate: Dict[Tuple[int, int, int], List[DisplayMode]] = {}
+        self._by_resolution: Dict[Tuple[int, int], List[DisplayMode]] = {}
+        
+        for mode_id, width, height, refresh, preferred_scale, scales, mode_properties in modes:
+            mode = DisplayMode(mode_id, width, height, refresh, preferred_scale, tuple(scales),
+                               bool(mode_properties.get('is-current', False)),
+                               bool(mode_properties.get('is-preferred', False)))
+            self.modes.append(mode)
+            self._by_rate.setdefault((width, height, refresh), mode)
+            self._by_whole_rate.setdefault((width, height, round(refresh)), []).append(mode)
+            self._by_resolution.setdefault((width, height), []).append(mode)
+            if mode.is_current:
+                self.current = mode
+            if mode.is_preferred:
+                self.preferred = mode
+        for modes_at in self._by_resolution.values():
+            modes_at.sort(key=lambda mode: -mode.refresh)
+            
+    @property
+    def enabled(self) -> bool:
+        return self.current is not None
+        
+    @property
+    def resolutions(self) -> List[Tuple[int, int]]:
+        """Resolutions in the order Mutter lists them (largest first)"""
+        return list(self._by_resolution)
+        
+    def modes_at(self, width: int, height: int) -> List[DisplayMode]:
+        """Modes at a resolution, fastest first"""
+        return list(self._by_resolution.get((width, height), ()))
+        
+    def find_mode(self, rate: float, width: Optional[int] = None,
+                  height: Optional[int] = None) -> Optional[DisplayMode]:
+        """Return the mode with the rate nearest to rate
+        
+        The resolution defaults to the current one. None if there is no
+        mode within half a Hz of rate.
+        """
+        if width is None or height is None:
+            if self.current is None:
+                return None
+            width, height = self.current.resolution
+        mode = self._by_rate.get((width, height, rate))
+        if mode is not None:
+            return mode
+        # A mode within half a Hz rounds to the same whole Hz or a neighbour
+        whole = round(rate)
+        candidates = [mode for bucket in (whole - 1, whole, whole + 1)
+                      for mode in self._by_whole_rate.get((width, height, bucket), ())
+                      if abs(mode.refresh - rate) < 0.5]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda mode: abs(mode.refresh - rate))
+        
+    def __repr__(self):
+        return f"Monitor({self.connector!r}, {len(self.modes)} modes, current={self.current})"
+
+
+class LogicalMonitor(NamedTuple):
+    """A region of the desktop and the monitors showing it"""
+    x: int
+    y: int
+    scale: float
+    transform: int
+    primary: bool
+    connectors: Tuple[str, ...]
+    properties: dict
+
+
+class DisplayState:
+    """Parsed GetCurrentState() result, built once per serial"""
+    
+    def __init__(self, raw: Sequence):
+        serial, monitors, logical_monitors, properties = raw
+        self.serial: int = serial
+        self.properties: dict = properties
+        self.monitors: List[Monitor] = [Monitor(monitor) for monitor in monitors]
+        self.logical_monitors: List[LogicalMonitor] = [
+            LogicalMonitor(x, y, scale, transform, primary, tuple(spec[0] for spec in specs), logical_properties)
+            for x, y, scale, transform, primary, specs, logical_properties in logical_monitors
+        ]
+        self._by_connector: Dict[str, Monitor] = {monitor.connector: monitor for monitor in self.monitors}
+        
+    def monitor(self, connector: str) -> Optional[Monitor]:
+        """Look up a monitor by connector name"""
+        return self._by_connector.get(connector)
+        
+    @property
+    def enabled_monitors(self) -> List[Monitor]:
+        return [monitor for monitor in self.monitors if monitor.enabled]
+        
+    @property
+    def primary(self) -> Optional[Monitor]:
+        """The monitor showing the primary logical monitor, else the first enabled one"""
+        for logical in self.logical_monitors:
+            if logical.primary:
+                for connector in logical.connectors:
+                    monitor = self.monitor(connector)
+                    if monitor is not None and monitor.enabled:
+                        return monitor
+        enabled = self.enabled_monitors
+        return enabled[0] if enabled else None
+
+
+def build_mode_config(state: DisplayState, rates: Dict[str, float]) -> Tuple[int, List, List[str]]:
+    """Build ApplyMonitorsConfig arguments switching monitors to new rates
+    
+    The logical monitor layout (position, scale, transform, primary) of
+    state is kept as it is; each monitor in rates gets the mode with its
+    rate at its current resolution and every other monitor keeps its
+    current mode. Returns (serial, logical_monitors, changed connectors).
+    Raises ValueError if a monitor is disabled or lacks the mode.
+    """
+    modes: Dict[str, DisplayMode] = {}
+    for monitor in state.enabled_monitors:
+        mode = monitor.current
+        if monitor.connector in rates:
+            rate = rates[monitor.connector]
+            mode = monitor.find_mode(rate)
+            if mode is None:
+                width, height = monitor.current.resolution
+                raise ValueError(f"{monitor.connector} has no {rate:g} Hz mode at {width}x{height}")
+        modes[monitor.connector] = mode
+        
+    missing = set(rates) - set(modes)
+    if missing:
+        raise ValueError(f"No enabled monitor {', '.join(sorted(missing))}")
+        
+    config = []
+    changed = []
+    for logical in state.logical_monitors:
+        assigned = []
+        for connector in logical.connectors:
+            mode = modes[connector]
+            assigned.append((connector, mode.id, {}))
+            if not mode.is_current:
+                changed.append(connector)
+        config.append((logical.x, logical.y, logical.scale, logical.transform, logical.primary, assigned))
+    return state.serial, config, changed
+
+
+def build_refresh_rate_config(state: DisplayState, rate: float) -> Tuple[int, List, List[str]]:
+    """Like build_mode_config() for every enabled monitor that has rate
+    
+    Raises ValueError if no monitor has the rate at its resolution.
+    """
+    rates = {monitor.connector: rate for monitor in state.enabled_monitors if monitor.find_mode(rate)}
+    if not rates:
+        raise ValueError(f"No monitor has a {rate:g} Hz mode at its current resolution")
+    return build_mode_config(state, rates)
+
+
+class DisplayConfigClient:
+    """Lazily connected DisplayConfig proxy with a cached monitor state
+    
+    The result of GetCurrentState() is parsed into a DisplayState and
+    reused until Mutter emits MonitorsChanged, so repeated reads don't
+    cost a D-Bus round-trip (or a walk over every mode) until the monitor
+    layout actually changes.
+    
+    MonitorsChanged is subscribed on a private main context that every
+    read dispatches first, so the cache is invalidated in time whether or
+    not the process runs a main loop (the CLI doesn't, the daemon runs
+    its own on another thread).
+    """
+    
+    def __init__(self, bus=None):
+        self._bus = bus
+        self._proxy = None
+        self._context = None
+        self._dispatch_lock = threading.Lock()
+        self._state = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        
+    @property
+    def proxy(self):
+        """Introspected DisplayConfig proxy, created on first use"""
+        with self._lock:
+            if self._proxy is None:
+                if self._bus is None:
+                    from pydbus import SessionBus
+                    self._bus = SessionBus()
+                    
+                from gi.repository import GLib
+                
+                proxy = self._bus.get(DISPLAY_CONFIG_BUS_NAME, DISPLAY_CONFIG_PATH)
+                # Signals are dispatched on the context that is the thread
+                # default when subscribing
+                context = GLib.MainContext.new()
+                context.push_thread_default()
+                try:
+                    proxy.MonitorsChanged.connect(self.invalidate)
+                finally:
+                    context.pop_thread_default()
+                self._context = context
+                self._proxy = proxy
+            return self._proxy
+            
+    def dispatch_signals(self):
+        """Deliver MonitorsChanged signals received since the last read"""
+        context = self._context
+        if context is None:
+            return
+        with self._dispatch_lock:
+            while context.pending() and context.iteration(False):
+                pass
+            
+    @property
+    def serial(self) -> Optional[int]:
+        """Serial of the cached state, if any"""
+        state = self._state
+        return state.serial if state is not None else None
+        
+    def get_current_state(self) -> DisplayState:
+        """Return the current monitors, modes and layout"""
+        self.dispatch_signals()
+        state = self._state
+        if state is None:
+            generation = self._generation
+            with metrics.span('dbus', 'DisplayConfig.GetCurrentState'):
+                raw = self.proxy.GetCurrentState()
+            state = DisplayState(raw)
+            # Don't cache a state that MonitorsChanged already superseded
+            if generation == self._generation:
+                self._state = state
+            logger.debug(f"Fetched display state with serial {state.serial}")
+        return state
+        
+    def apply_monitors_config(self, serial: int, method: int, logical_monitors: List,
+                              properties: Optional[dict] = None):
+        """Call ApplyMonitorsConfig; the cached state is dropped either way"""
+        try:
+            with metrics.span('dbus', 'DisplayConfig.ApplyMonitorsConfig'):
+                self.proxy.ApplyMonitorsConfig(serial, method, logical_monitors, properties or {})
+        finally:
+            self.invalidate()
+            
+    def invalidate(self, *args):
+        """Drop the cached state (connected to MonitorsChanged)"""
+        self._generation += 1
+        self._state = None
@@ -0,0 +1,48 @@
+import threading
+
+from gi.repository import GLib, GObject
+
+
+class GObjectSystemController(GObject.Object):
+    """GObject wrapper that re-emits SystemController signals for the GUI
+    
+    Attribute access is forwarded to the wrapped controller, so widgets can
+    use it like a SystemController. Signals raised on worker threads and
+    run_async() completion callbacks are delivered on the GLib main loop.
+    """
+    
+    __gsignals__ = {
+        'status-changed': (GObject.SignalFlags.RUN_FIRST, None, (str, str, bool))
+    }
+    
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        controller.tasks.dispatch = self.dispatch_idle
+        controller.connect('status-changed', self.on_status_changed)
+        # The GUI runs a main loop, so daemon change signals can reach the cache
+        controller.watch_backend()
+        
+    def __getattr__(self, name):
+        # Only called for attributes GObject doesn't provide itself
+        return getattr(self.controller, name)
+        
+    @staticmethod
+    def dispatch_idle(func, *args):
+        """Run a callback once on the GLib main loop"""
+        def run():
+            func(*args)
+            return False
+        GLib.idle_add(run)
+        
+    def on_status_changed(self, controller, status_type, message, success):
+        """Forward status-changed from the controller"""
+        if threading.current_thread() is threading.main_thread():
+            self.emit('status-changed', status_type, message, success)
+        else:
+            GLib.idle_add(self.emit_status_changed, status_type, message, success)
+            
+    def emit_status_changed(self, status_type, message, success):
+        """Emit status-changed from the main loop"""
+        self.emit('status-changed', status_type, message, success)
+        return False
@@ -0,0 +1,426 @@
+"""
+Rolling power draw history
+"""
+
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from .backends import GFX_MODES, PLATFORM_PROFILES
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE_ENV = 'W_HELPER_HISTORY_FILE'
+
+DEFAULT_SAMPLE_INTERVAL = 30
+DEFAULT_FLUSH_INTERVAL = 600
+# 24 hours at the default interval
+DEFAULT_RING_SIZE = 2880
+# 30 days at the default interval (about 1.3 MB on disk)
+DEFAULT_MAX_RECORDS = 86400
+# CPU profile and GPU mode are re-read at least this often even without a
+# status-changed signal, to catch changes made by other tools
+MODE_REFRESH_INTERVAL = 300
+
+FILE_MAGIC = b'WHPH\x01\x00\x00\x00'
+# timestamp, power (mW), flags, capacity (%), CPU profile code, GPU mode code
+RECORD = struct.Struct('<diBbbb')
+READ_CHUNK = RECORD.size * 4096
+
+UNKNOWN = -1
+FLAG_AC_ONLINE = 0x01
+FLAG_CHARGING = 0x02
+
+
+class PowerSample(NamedTuple):
+    """One history sample"""
+    timestamp: float
+    power_mw: Optional[int]
+    capacity: Optional[int]
+    ac_online: bool
+    charging: bool
+    cpu_profile: Optional[str]
+    gpu_mode: Optional[str]
+
+
+def encode_name(names: List[str], name: Optional[str]) -> int:
+    """Map a profile or mode name to its stable code"""
+    if name:
+        for index, known in enumerate(names):
+            if known.lower() == name.lower():
+                return index
+    return UNKNOWN
+
+
+def decode_name(names: List[str], code: int) -> Optional[str]:
+    """Map a stored code back to its name"""
+    return names[code] if 0 <= code < len(names) else None
+
+
+def pack_sample(sample: PowerSample) -> bytes:
+    """Encode a sample as a fixed-size record"""
+    flags = (FLAG_AC_ONLINE if sample.ac_online else 0) | (FLAG_CHARGING if sample.charging else 0)
+    return RECORD.pack(
+        sample.timestamp,
+        UNKNOWN if sample.power_mw is None else sample.power_mw,
+        flags,
+        UNKNOWN if sample.capacity is None else sample.capacity,
+        encode_name(PLATFORM_PROFILES, sample.cpu_profile),
+        encode_name(GFX_MODES, sample.gpu_mode),
+    )
+
+
+def unpack_sample(timestamp: float, power_mw: int, flags: int, capacity: int,
+                  profile: int, gpu_mode: int) -> PowerSample:
+    """Decode the fields of a record"""
+    return PowerSample(
+        timestamp=timestamp,
+        power_mw=None if power_mw < 0 else power_mw,
+        capacity=None if capacity < 0 else capacity,
+        ac_online=bool(flags & FLAG_AC_ONLINE),
+        charging=bool(flags & FLAG_CHARGING),
+        cpu_profile=decode_name(PLATFORM_PROFILES, profile),
+        gpu_mode=decode_name(GFX_MODES, gpu_mode),
+    )
+
+
+class PowerHistory:
+    """Fixed-size ring buffer of power samples
+    
+    Each field lives in its own preallocated array, so memory use is fixed
+    (16 bytes per slot) however long the sampler runs; once the buffer is
+    full the oldest sample is overwritten.
+    """
+    
+    def __init__(self, size: int = DEFAULT_RING_SIZE):
+        if size <= 0:
+            raise ValueError("History size must be positive")
+        self.size = size
+        self.timestamps = array('d', [0.0]) * size
+        self.power = array('i', [0]) * size
+        self.flags = array('B', [0]) * size
+        self.capacity = array('b', [0]) * size
+        self.profiles = array('b', [0]) * size
+        self.gpu_modes = array('b', [0]) * size
+        # Total number of samples ever appended
+        self.count = 0
+        
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+        
+    def append(self, sample: PowerSample):
+        """Add a sample, overwriting the oldest one when full"""
+        fields = RECORD.unpack(pack_sample(sample))
+        index = self.count % self.size
+        (self.timestamps[index], self.power[index], self.flags[index],
+         self.capacity[index], self.profiles[index], self.gpu_modes[index]) = fields
+        self.count += 1
+        
+    def _raw(self, index: int) -> tuple:
+        """Return the stored fields of a slot"""
+        return (self.timestamps[index], self.power[index], self.flags[index],
+                self.capacity[index], self.profiles[index], self.gpu_modes[index])
+        
+    def _indices(self, last: Optional[int] = None) -> range:
+        """Return slot positions of the newest `last` samples, oldest first"""
+        length = len(self)
+        last = length if last is None else min(last, length)
+        return range(self.count - last, self.count)
+        
+    def samples(self, last: Optional[int] = None) -> Iterator[PowerSample]:
+        """Iterate over the newest `last` samples (default all), oldest first"""
+        for position in self._indices(last):
+            yield unpack_sample(*self._raw(position % self.size))
+            
+    def pack(self, last: Optional[int] = None) -> bytes:
+        """Encode the newest `last` samples as file records"""
+        return b''.join(RECORD.pack(*self._raw(position % self.size))
+                        for position in self._indices(last))
+
+
+def default_state_dir() -> str:
+    """Return W-Helper's directory under $XDG_STATE_HOME"""
+    state_home = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+    return os.path.join(state_home, 'w-helper')
+
+
+def default_history_file() -> str:
+    """Return the history file under the XDG state directory"""
+    return os.environ.get(HISTORY_FILE_ENV) or os.path.join(default_state_dir(), 'power-history.bin')
+
+
+class HistoryFile:
+    """Append-only binary file of fixed-size history records
+    
+    The file starts with an 8 byte magic/version header followed by
+    RECORD.size byte records in time order. When it grows beyond
+    max_records the newest three quarters are kept.
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_records: int = DEFAULT_MAX_RECORDS):
+        self.path = path or default_history_file()
+        self.max_records = max_records
+        
+    def append(self, data: bytes):
+        """Append encoded records"""
+        if not data:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        
+        with open(self.path, 'ab') as f:
+            size = f.tell()
+            if size < len(FILE_MAGIC):
+                f.truncate(0)
+                f.write(FILE_MAGIC)
+                size = len(FILE_MAGIC)
+            else:
+                # Drop a partial record left behind by an interrupted write
+                excess = (size - len(FILE_MAGIC)) % RECORD.size
+                if excess:
+                    f.truncate(size - excess)
+                    size -= excess
+            f.write(data)
+            size += len(data)
+            
+        if (size - len(FILE_MAGIC)) // RECORD.size > self.max_records:
+            self.compact()
+            
+    def compact(self):
+        """Keep only the newest records"""
+        keep = self.max_records * 3 // 4
+        with open(self.path, 'rb') as f:
+            self._check_header(f)
+            f.seek(0, os.SEEK_END)
+            records = (f.tell() - len(FILE_MAGIC)) // RECORD.size
+            f.seek(len(FILE_MAGIC) + max(0, records - keep) * RECORD.size)
+            data = f.read(min(records, keep) * RECORD.size)
+            
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(FILE_MAGIC)
+            f.write(data)
+        os.replace(temp_path, self.path)
+        logger.debug(f"Compacted {self.path} to {len(data) // RECORD.size} records")
+        
+    def _check_header(self, f):
+        """Raise ValueError unless f starts with the history header"""
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{self.path} is not a W-Helper history file")
+            
+    def samples(self, since: Optional[float] = None) -> Iterator[PowerSample]:
+        """Iterate over stored samples, oldest first, without loading the whole file"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+            
+        with f:
+            self._check_header(f)
+            while True:
+                chunk = f.read(READ_CHUNK)
+                usable = len(chunk) - len(chunk) % RECORD.size
+                for fields in RECORD.iter_unpack(chunk[:usable]):
+                    if since is None or fields[0] >= since:
+                        yield unpack_sample(*fields)
+                if len(chunk) < READ_CHUNK:
+                    break
+
+
+class PowerSampler:
+    """Sample power draw in the background into a ring buffer and a file
+    
+    A daemon thread takes a sample every `interval` seconds, feeds it to
+    the controller's runtime estimator and appends new samples to the
+    history file every `flush_interval` seconds (and on stop()). The
+    flush interval must stay below the time the ring buffer covers, or
+    samples are dropped before they reach the file.
+    """
+    
+    def __init__(self, controller, history: Optional[PowerHistory] = None,
+                 history_file: Optional[HistoryFile] = None,
+                 interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.controller = controller
+        self.estimator = controller.runtime
+        self.history = history if history is not None else PowerHistory()
+        self.file = history_file if history_file is not None else HistoryFile()
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._modes = (None, None)
+        self._modes_read_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._handler_id: Optional[int] = None
+        
+    @property
+    def running(self) -> bool:
+        """Whether the sampler thread is running"""
+        return self._thread is not None
+        
+    def start(self):
+        """Start sampling"""
+        if self.running:
+            return
+        self._handler_id = self.controller.connect('status-changed', self.on_status_changed)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='w-helper-history', daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """Stop sampling and write pending samples"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.controller.disconnect(self._handler_id)
+        self._handler_id = None
+        self.flush()
+        
+    def on_status_changed(self, controller, category, message, success):
+        """Re-read CPU profile and GPU mode after they were changed"""
+        if category in ('cpu', 'gpu'):
+            self._modes_read_at = None
+            
+    def _run(self):
+        """Sampler thread"""
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"Failed to sample power draw: {e}")
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            if self._stop.wait(self.interval):
+                return
+                
+    def current_modes(self) -> tuple:
+        """Return (cpu_profile, gpu_mode), re-reading them only when stale"""
+        now = time.monotonic()
+        if self._modes_read_at is None or now - self._modes_read_at >= MODE_REFRESH_INTERVAL:
+            self._modes_read_at = now
+            self._modes = (self.controller.get_current_cpu_profile(),
+                           self.controller.get_current_gpu_mode())
+        return self._modes
+        
+    def sample(self) -> PowerSample:
+        """Take one sample and add it to the ring buffer"""
+        snapshot = self.controller.get_power_snapshot()
+        battery = snapshot.battery
+        cpu_profile, gpu_mode = self.current_modes()
+        
+        power_mw = None
+        capacity = None
+        charging = False
+        if battery is not None:
+            if battery.power_now is not None:
+                power_mw = abs(battery.power_now) // 1000
+            capacity = battery.capacity
+            charging = battery.status == 'Charging'
+            
+        sample = PowerSample(
+            timestamp=snapshot.timestamp,
+            power_mw=power_mw,
+            capacity=capacity,
+            ac_online=bool(snapshot.ac_online),
+            charging=charging,
+            cpu_profile=cpu_profile,
+            gpu_mode=gpu_mode,
+        )
+        with self._lock:
+            self.history.append(sample)
+            self._unflushed += 1
+            
+        if battery is not None:
+            self.estimator.update(snapshot.timestamp, battery.status == 'Discharging',
+                                  battery.energy_now, battery.power_now, cpu_profile, gpu_mode)
+        return sample
+        
+    def flush(self):
+        """Append samples taken since the last flush to the history file"""
+        with self._lock:
+            if self._unflushed > len(self.history):
+                logger.warning(f"Dropped {self._unflushed - len(self.history)} history samples "
+                               f"before they were written")
+            data = self.history.pack(self._unflushed)
+            self._unflushed = 0
+            self._last_flush = time.monotonic()
+            
+        try:
+            self.file.append(data)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to write power history: {e}")
+        self.estimator.save()
+
+
+def parse_duration(text: str) -> float:
+    """Parse a duration such as 90, 90s, 15m, 24h or 7d into seconds"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', text)
+    if not match:
+        raise ValueError(f"Invalid duration: {text}")
+    value, unit = match.groups()
+    return float(value) * {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}[unit]
+
+
+def downsample(samples: Iterable[PowerSample], resolution: float) -> Iterator[PowerSample]:
+    """Merge samples into buckets of `resolution` seconds
+    
+    Each bucket reports the mean power, the last capacity and the most
+    common CPU profile and GPU mode. Buckets are emitted as soon as they
+    are complete, so this works on streams of any length.
+    """
+    bucket: List[PowerSample] = []
+    bucket_start = None
+    
+    for sample in samples:
+        start = sample.timestamp - sample.timestamp % resolution
+        if bucket and start != bucket_start:
+            yield _merge(bucket_start, bucket)
+            bucket = []
+        bucket_start = start
+        bucket.append(sample)
+        
+    if bucket:
+        yield _merge(bucket_start, bucket)
+
+
+def _merge(timestamp: float, bucket: List[PowerSample]) -> PowerSample:
+    """Merge one downsampling bucket"""
+    power = [sample.power_mw for sample in bucket if sample.power_mw is not None]
+    capacity = [sample.capacity for sample in bucket if sample.capacity is not None]
+    return PowerSample(
+        timestamp=timestamp,
+        power_mw=round(sum(power) / len(power)) if power else None,
+        capacity=capacity[-1] if capacity else None,
+        ac_online=bucket[-1].ac_online,
+        charging=bucket[-1].charging,
+        cpu_profile=Counter(sample.cpu_profile for sample in bucket).most_common(1)[0][0],
+        gpu_mode=Counter(sample.gpu_mode for sample in bucket).most_common(1)[0][0],
+    )
+
+
+EXPORT_FIELDS = ('timestamp', 'time', 'power_w', 'capacity', 'ac_online', 'charging',
+                 'cpu_profile', 'gpu_mode')
+
+
+def export_row(sample: PowerSample) -> dict:
+    """Convert a sample to an export row"""
+    return {
+        'timestamp': round(sample.timestamp, 3),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(sample.timestamp)),
+        'power_w': None if sample.power_mw is None else sample.power_mw / 1000,
+        'capacity': sample.capacity,
+        'ac_online': sample.ac_online,
+        'charging': sample.charging,
+        'cpu_profile': sample.cpu_profile,
+        'gpu_mode': sample.gpu_mode,
+    }
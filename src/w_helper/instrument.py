@@ -0,0 +1,220 @@
+"""
+Lightweight timing instrumentation for backend calls
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROFILE_ENV = 'W_HELPER_PROFILE'
+# Buckets per doubling of the duration; quantiles are accurate to ~9%
+BUCKETS_PER_OCTAVE = 8
+# Durations are bucketed in microseconds
+MIN_DURATION_US = 1.0
+MAX_TRACE_EVENTS = 100000
+
+
+class Histogram:
+    """Count, total, max and log-bucketed durations of one operation
+    
+    Memory stays constant however many durations are added: each one
+    increments a bucket covering 1/BUCKETS_PER_OCTAVE of a doubling, and
+    quantiles are read back as the bucket's geometric midpoint.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+        
+    @staticmethod
+    def bucket(seconds: float) -> int:
+        micros = max(seconds * 1000000, MIN_DURATION_US)
+        return int(math.log2(micros) * BUCKETS_PER_OCTAVE)
+        
+    def add(self, seconds: float):
+        """Record one duration"""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = self.bucket(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        
+    def quantile(self, q: float) -> float:
+        """Return the approximate q-quantile in seconds (0 if empty)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                micros = 2 ** ((index + 0.5) / BUCKETS_PER_OCTAVE)
+                return min(micros / 1000000, self.max)
+        return self.max
+        
+    def summary(self) -> Dict[str, Any]:
+        """Return count and times in milliseconds"""
+        return OrderedDict([
+            ('count', self.count),
+            ('total_ms', round(self.total * 1000, 3)),
+            ('p50_ms', round(self.quantile(0.5) * 1000, 3)),
+            ('p95_ms', round(self.quantile(0.95) * 1000, 3)),
+            ('max_ms', round(self.max * 1000, 3)),
+        ])
+
+
+class Span:
+    """Times a block and records it when the block exits"""
+    
+    __slots__ = ('metrics', 'category', 'name', 'start')
+    
+    def __init__(self, metrics: 'Metrics', category: str, name: str):
+        self.metrics = metrics
+        self.category = category
+        self.name = name
+        
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+        
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.category, self.name, self.start, time.perf_counter())
+        return False
+
+
+class NullSpan:
+    """Span used while instrumentation is disabled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """In-memory histograms per (category, operation)
+    
+    Disabled unless W_HELPER_PROFILE is set or enable() is called; while
+    disabled, span() returns a shared no-op context manager and timed()
+    functions cost one attribute check. With tracing on, every span is
+    also kept as an event for export in Chrome's trace format.
+    """
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.tracing = False
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.events: List[Tuple[str, str, float, float, int]] = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        
+    def enable(self, tracing: bool = False):
+        """Start collecting timings (and trace events if tracing)"""
+        self.enabled = True
+        self.tracing = self.tracing or tracing
+        
+    def disable(self):
+        """Stop collecting; collected data is kept"""
+        self.enabled = False
+        self.tracing = False
+        
+    def reset(self):
+        """Drop collected data"""
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+            self.origin = time.perf_counter()
+            
+    def span(self, category: str, name: str):
+        """Return a context manager timing one operation"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, category, name)
+        
+    def record(self, category: str, name: str, start: float, end: float):
+        """Add a finished operation (perf_counter timestamps)"""
+        with self._lock:
+            key = (category, name)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.add(end - start)
+            if self.tracing and len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append((category, name, start, end, threading.get_ident()))
+                
+    def summary(self) -> List[Dict[str, Any]]:
+        """Return one row per operation, sorted by total time"""
+        with self._lock:
+            items = list(self.histograms.items())
+        rows = []
+        for (category, name), histogram in sorted(items, key=lambda item: -item[1].total):
+            row = OrderedDict([('category', category), ('name', name)])
+            row.update(histogram.summary())
+            rows.append(row)
+        return rows
+        
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Return trace events in the Chrome trace event format"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            origin = self.origin
+        return {
+            'traceEvents': [
+                {
+                    'name': name,
+                    'cat': category,
+                    'ph': 'X',
+                    'ts': round((start - origin) * 1000000, 1),
+                    'dur': round((end - start) * 1000000, 1),
+                    'pid': pid,
+                    'tid': tid,
+                }
+                for category, name, start, end, tid in events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+
+metrics = Metrics(enabled=bool(os.environ.get(PROFILE_ENV)))
+
+
+def timed(category: str, name: Optional[str] = None) -> Callable:
+    """Decorator recording a function's duration in the shared metrics"""
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(category, label, start, time.perf_counter())
+        return wrapper
+    return decorator
+
+
+def command_label(command: List[str]) -> str:
+    """Name a command by its tool and options, leaving out values"""
+    words = [command[0]]
+    for word in command[1:]:
+        words.append(word)
+        if word.startswith('-'):
+            break
+    return ' '.join(words)
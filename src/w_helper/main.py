@@ -12,6 +12,13 @@ import logging
 
 from .window import WHelperWindow
 from .system_controller import SystemController
+from .gobject_controller import GObjectSystemController
+from .history import PowerSampler
+from .instrument import metrics
+from .service import ControllerService, remove_instance, write_instance
+from .startup import StartupTimer
+
+logger = logging.getLogger(__name__)
 
 
 class WHelperApplication(Adw.Application):
@@ -21,7 +28,12 @@ class WHelperApplication(Adw.Application):
         super().__init__(application_id='com.github.w-helper',
                          flags=Gio.ApplicationFlags.FLAGS_NONE)
         
-        self.system_controller = SystemController()
+        self.startup_timer = StartupTimer()
+        # Created in do_startup, which only runs in the primary instance;
+        # a second launch just asks the running one to activate
+        self.system_controller = None
+        self.power_sampler = None
+        self.service = None
         self.window = None
         
     def do_activate(self):
@@ -29,7 +41,8 @@ class WHelperApplication(Adw.Application):
         if not self.window:
             self.window = WHelperWindow(
                 application=self,
-                system_controller=self.system_controller
+                system_controller=self.system_controller,
+                startup_timer=self.startup_timer
             )
         
         self.window.present()
@@ -38,6 +51,10 @@ class WHelperApplication(Adw.Application):
         """Called when the application starts"""
         Adw.Application.do_startup(self)
         
+        self.system_controller = GObjectSystemController(SystemController())
+        self.power_sampler = PowerSampler(self.system_controller)
+        self.export_controller()
+        
         # Create actions
         self.create_action('quit', self.quit_app)
         self.create_action('about', self.show_about)
@@ -45,6 +62,40 @@ class WHelperApplication(Adw.Application):
         # Set up keyboard shortcuts
         self.set_accels_for_action('app.quit', ['<Control>q'])
         
+        # Record power draw history while the application runs
+        self.power_sampler.start()
+        
+    def export_controller(self):
+        """Let CLI commands use this instance's controller over the session bus"""
+        connection = self.get_dbus_connection()
+        if connection is None:
+            return
+        if self.system_controller.backend.name == 'service':
+            # Already a client of the daemon, which CLI commands reach directly
+            return
+        # The raw controller: its connect() is the one carrying 'state-changed'
+        self.service = ControllerService(self.system_controller.controller)
+        if self.service.register(connection):
+            self.service.start()
+            self.system_controller.run_async(self.service.refresh)
+            write_instance(self.get_application_id(), 'gui')
+            
+    def do_shutdown(self):
+        """Called when the application exits"""
+        if self.service is not None:
+            remove_instance()
+            self.service.unregister()
+        self.power_sampler.stop()
+        # Don't leave a hung asusctl/supergfxctl behind
+        self.system_controller.cancel_commands()
+        if metrics.enabled:
+            # W_HELPER_PROFILE: report where the session's backend time went
+            for row in metrics.summary():
+                logger.info(f"{row['category']} {row['name']}: {row['count']} calls, "
+                            f"total {row['total_ms']:.1f} ms, p50 {row['p50_ms']:.2f} ms, "
+                            f"p95 {row['p95_ms']:.2f} ms, max {row['max_ms']:.2f} ms")
+        Adw.Application.do_shutdown(self)
+        
     def create_action(self, name, callback):
         """Create an application action"""
         action = Gio.SimpleAction.new(name, None)
@@ -0,0 +1,403 @@
+"""
+Rule-based power policy: pick CPU profile, GPU mode and charge limit
+from AC state, battery level and time of day
+"""
+
+import datetime
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from .processes import DEFAULT_LINGER, DEFAULT_SCAN_INTERVAL
+from .system_controller import STATE_KEYS
+
+logger = logging.getLogger(__name__)
+
+POLICY_FILE_ENV = 'W_HELPER_POLICY_FILE'
+
+DEFAULT_HYSTERESIS = 3
+DEFAULT_DEBOUNCE = 2.0
+# Seconds before settings that failed to apply are tried again, doubling
+# on every failure for the same outcome up to RETRY_MAX
+RETRY_INITIAL = 60.0
+RETRY_MAX = 3600.0
+
+CONDITION_KEYS = ('ac', 'battery_below', 'battery_above', 'time', 'running')
+# Key of the top-level [refresh_rate] rates, used where a monitor's own table sets none
+ALL_MONITORS = '*'
+
+
+class PolicyError(Exception):
+    """Invalid policy configuration"""
+
+
+class Rule(NamedTuple):
+    """A set of conditions and the settings to apply when all of them hold"""
+    name: str
+    ac: Optional[bool]
+    battery_below: Optional[int]
+    battery_above: Optional[int]
+    # Minutes since midnight; the window wraps if start > end
+    time: Optional[Tuple[int, int]]
+    # Executable name patterns; any matching process satisfies the rule
+    running: Optional[Tuple[str, ...]]
+    settings: Dict[str, Any]
+
+
+class RefreshRates(NamedTuple):
+    """Refresh rates of a monitor on AC and on battery (None: leave it alone)"""
+    ac: Optional[float] = None
+    battery: Optional[float] = None
+    
+    def for_source(self, ac_online: bool) -> Optional[float]:
+        return self.ac if ac_online else self.battery
+
+
+class PolicyConfig(NamedTuple):
+    """Parsed policy file"""
+    rules: List[Rule]
+    hysteresis: int
+    debounce: float
+    process_scan_interval: float = DEFAULT_SCAN_INTERVAL
+    process_linger: float = DEFAULT_LINGER
+    # By connector name, with ALL_MONITORS for the defaults
+    refresh_rates: Dict[str, RefreshRates] = {}
+    
+    @property
+    def process_rules(self) -> Dict[int, Tuple[str, ...]]:
+        """Patterns of rules with a `running` condition, by rule index"""
+        return {index: rule.running for index, rule in enumerate(self.rules) if rule.running}
+
+
+class PowerState(NamedTuple):
+    """Inputs the rules are evaluated against"""
+    ac_online: Optional[bool]
+    capacity: Optional[int]
+    now: datetime.datetime
+    # Indexes of rules whose `running` processes are present
+    running: FrozenSet[int] = frozenset()
+
+
+def default_policy_file() -> str:
+    """Return the policy file under the XDG config directory"""
+    override = os.environ.get(POLICY_FILE_ENV)
+    if override:
+        return override
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(config_home, 'w-helper', 'policy.toml')
+
+
+def load_toml(path: str) -> Dict[str, Any]:
+    """Read a TOML file with tomllib (Python 3.11+) or tomli"""
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise PolicyError("Reading TOML needs Python 3.11 or the 'tomli' package")
+            
+    try:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    except OSError as e:
+        raise PolicyError(f"Cannot read {path}: {e.strerror}")
+    except tomllib.TOMLDecodeError as e:
+        raise PolicyError(f"Invalid TOML in {path}: {e}")
+
+
+def parse_time_window(text: str) -> Tuple[int, int]:
+    """Parse 'HH:MM-HH:MM' into minutes since midnight"""
+    match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*', text)
+    if not match:
+        raise ValueError(f"expected HH:MM-HH:MM, got {text!r}")
+    start_h, start_m, end_h, end_m = (int(part) for part in match.groups())
+    if start_h > 23 or end_h > 24 or start_m > 59 or end_m > 59:
+        raise ValueError(f"invalid time in {text!r}")
+    return start_h * 60 + start_m, end_h * 60 + end_m
+
+
+def parse_percentage(value: Any, what: str) -> int:
+    """Validate a 0-100 integer"""
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 100:
+        raise ValueError(f"{what} must be a whole number between 0 and 100")
+    return value
+
+
+def check_settings(settings: Dict[str, Any]):
+    """Validate setting values (keys are checked by the caller)"""
+    if 'charge_limit' in settings:
+        limit = parse_percentage(settings['charge_limit'], 'charge_limit')
+        if limit < 60:
+            raise ValueError("charge_limit must be between 60 and 100")
+    for key in ('cpu_profile', 'gpu_mode'):
+        if key in settings and not isinstance(settings[key], str):
+            raise ValueError(f"{key} must be a string")
+
+
+def load_preset(path: str) -> Dict[str, Any]:
+    """Load a preset file: top-level charge_limit, cpu_profile and gpu_mode keys"""
+    settings = load_toml(path)
+    unknown = set(settings) - set(STATE_KEYS)
+    if unknown:
+        raise PolicyError(f"{path}: unknown keys: {', '.join(sorted(unknown))}")
+    if not settings:
+        raise PolicyError(f"{path}: preset sets nothing")
+    try:
+        check_settings(settings)
+    except ValueError as e:
+        raise PolicyError(f"{path}: {e}")
+    return settings
+
+
+def parse_rule(index: int, table: Dict[str, Any]) -> Rule:
+    """Parse one [[rule]] table"""
+    name = table.get('name', f"rule {index + 1}")
+    try:
+        conditions = table.get('when', {})
+        settings = table.get('apply', {})
+        if not isinstance(conditions, dict) or not isinstance(settings, dict):
+            raise ValueError("'when' and 'apply' must be tables")
+        unknown = set(table) - {'name', 'when', 'apply'}
+        unknown |= set(conditions) - set(CONDITION_KEYS)
+        unknown |= set(settings) - set(STATE_KEYS)
+        if unknown:
+            raise ValueError(f"unknown keys: {', '.join(sorted(unknown))}")
+        if not settings:
+            raise ValueError("'apply' sets nothing")
+            
+        ac = conditions.get('ac')
+        if ac is not None and not isinstance(ac, bool):
+            raise ValueError("'ac' must be true or false")
+        below = conditions.get('battery_below')
+        above = conditions.get('battery_above')
+        window = conditions.get('time')
+        running = conditions.get('running')
+        if isinstance(running, str):
+            running = [running]
+        if running is not None and (not running or not all(
+                isinstance(pattern, str) and pattern for pattern in running)):
+            raise ValueError("'running' must be a name pattern or a list of them")
+            
+        check_settings(settings)
+        
+        return Rule(
+            name=name,
+            ac=ac,
+            battery_below=None if below is None else parse_percentage(below, 'battery_below'),
+            battery_above=None if above is None else parse_percentage(above, 'battery_above'),
+            time=None if window is None else parse_time_window(str(window)),
+            running=None if running is None else tuple(running),
+            settings=dict(settings),
+        )
+    except ValueError as e:
+        raise PolicyError(f"{name}: {e}")
+
+
+def parse_refresh_rates(table: Any) -> Dict[str, RefreshRates]:
+    """Parse the [refresh_rate] table and its per-connector subtables"""
+    if not isinstance(table, dict):
+        raise PolicyError("refresh_rate must be a table")
+        
+    def parse_rates(name: str, values: Dict[str, Any]) -> RefreshRates:
+        rates = {}
+        for source in RefreshRates._fields:
+            value = values.get(source)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                raise PolicyError(f"{name}.{source} must be a refresh rate in Hz")
+            rates[source] = None if value is None else float(value)
+        return RefreshRates(**rates)
+        
+    defaults = {key: value for key, value in table.items() if not isinstance(value, dict)}
+    unknown = set(defaults) - set(RefreshRates._fields)
+    for connector, values in table.items():
+        if isinstance(values, dict):
+            unknown |= {f"{connector}.{key}" for key in set(values) - set(RefreshRates._fields)}
+    if unknown:
+        raise PolicyError(f"refresh_rate: unknown keys: {', '.join(sorted(unknown))}")
+        
+    preferences = {connector: parse_rates(f"refresh_rate.{connector}", values)
+                   for connector, values in table.items() if isinstance(values, dict)}
+    if defaults:
+        preferences[ALL_MONITORS] = parse_rates('refresh_rate', defaults)
+    return preferences
+
+
+def parse_policy(data: Dict[str, Any]) -> PolicyConfig:
+    """Build a PolicyConfig from parsed TOML"""
+    settings = data.get('settings', {})
+    hysteresis = settings.get('hysteresis', DEFAULT_HYSTERESIS)
+    debounce = settings.get('debounce', DEFAULT_DEBOUNCE)
+    if isinstance(hysteresis, bool) or not isinstance(hysteresis, int) or hysteresis < 0:
+        raise PolicyError("settings.hysteresis must be a non-negative whole number")
+    scan_interval = settings.get('process_scan_interval', DEFAULT_SCAN_INTERVAL)
+    linger = settings.get('process_linger', DEFAULT_LINGER)
+    for key, value, minimum in (('debounce', debounce, 0), ('process_linger', linger, 0),
+                                ('process_scan_interval', scan_interval, 0.1)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+            raise PolicyError(f"settings.{key} must be a number of seconds (at least {minimum:g})")
+        
+    tables = data.get('rule', [])
+    if not isinstance(tables, list):
+        raise PolicyError("rules must be written as [[rule]] tables")
+    return PolicyConfig(
+        rules=[parse_rule(index, table) for index, table in enumerate(tables)],
+        hysteresis=hysteresis,
+        debounce=float(debounce),
+        process_scan_interval=float(scan_interval),
+        process_linger=float(linger),
+        refresh_rates=parse_refresh_rates(data.get('refresh_rate', {})),
+    )
+
+
+def load_policy(path: Optional[str] = None) -> PolicyConfig:
+    """Load and validate a policy file"""
+    return parse_policy(load_toml(path or default_policy_file()))
+
+
+def in_window(window: Tuple[int, int], now: datetime.datetime) -> bool:
+    """Whether now falls inside a time window"""
+    start, end = window
+    minute = now.hour * 60 + now.minute
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+class PolicyEngine:
+    """Evaluate policy rules and apply the resulting settings
+    
+    Rules are checked in file order; for each setting the first matching
+    rule that sets it wins. Battery thresholds have hysteresis: a
+    `battery_below = 30` rule starts matching below 30% and keeps matching
+    until the battery is back at 30% + hysteresis (and the reverse for
+    `battery_above`), so a battery hovering at a threshold doesn't flap.
+    
+    Settings are only applied when the policy's outcome changes, so a
+    manual change made in the GUI or CLI stays in place until the next
+    transition. A setting whose write failed (or was rolled back) is
+    tried again, after RETRY_INITIAL seconds and then less and less
+    often while the same outcome keeps failing, so a setting the hardware
+    never accepts doesn't make every step rewrite (and roll back) the
+    others. A new outcome is applied at once.
+    """
+    
+    def __init__(self, controller, config: PolicyConfig):
+        self.controller = controller
+        self.config = config
+        # Battery conditions currently held by hysteresis, per rule index
+        self._latched: Dict[Tuple[int, str], bool] = {}
+        self.applied: Optional[Dict[str, Any]] = None
+        self.reasons: Dict[str, str] = {}
+        # Outcome that failed to apply, when to retry it and the delay used
+        self._failed: Optional[Dict[str, Any]] = None
+        self._retry_at = 0.0
+        self._retry_delay = 0.0
+        
+    def reload(self, config: PolicyConfig):
+        """Replace the rules; the next step re-applies the outcome"""
+        self.config = config
+        self._latched.clear()
+        self.applied = None
+        self._failed = None
+        
+    def _battery_matches(self, index: int, kind: str, threshold: int, capacity: Optional[int]) -> bool:
+        """Evaluate a battery threshold with hysteresis"""
+        key = (index, kind)
+        if capacity is None:
+            self._latched.pop(key, None)
+            return False
+            
+        margin = self.config.hysteresis if self._latched.get(key) else 0
+        if kind == 'battery_below':
+            matched = capacity < threshold + margin
+        else:
+            matched = capacity > threshold - margin
+        self._latched[key] = matched
+        return matched
+        
+    def rule_matches(self, index: int, rule: Rule, state: PowerState) -> bool:
+        """Whether every condition of a rule holds"""
+        # Evaluate battery conditions first so their hysteresis state is
+        # kept up to date even when another condition fails
+        matched = True
+        if rule.battery_below is not None:
+            matched &= self._battery_matches(index, 'battery_below', rule.battery_below, state.capacity)
+        if rule.battery_above is not None:
+            matched &= self._battery_matches(index, 'battery_above', rule.battery_above, state.capacity)
+        if rule.ac is not None:
+            matched &= state.ac_online is not None and rule.ac == state.ac_online
+        if rule.time is not None:
+            matched &= in_window(rule.time, state.now)
+        if rule.running is not None:
+            matched &= index in state.running
+        return matched
+        
+    def evaluate(self, state: PowerState) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Return the desired settings and the rule that chose each one"""
+        desired: Dict[str, Any] = {}
+        reasons: Dict[str, str] = {}
+        for index, rule in enumerate(self.config.rules):
+            if not self.rule_matches(index, rule, state):
+                continue
+            for key, value in rule.settings.items():
+                if key not in desired:
+                    desired[key] = value
+                    reasons[key] = rule.name
+        return desired, reasons
+        
+    def step(self, state: PowerState, dry_run: bool = False) -> Dict[str, Any]:
+        """Evaluate the rules and apply what changed; returns the applied settings"""
+        desired, reasons = self.evaluate(state)
+        self.reasons = reasons
+        if desired != self._failed:
+            self._failed = None
+        if desired == self.applied:
+            return {}
+        if self._failed is not None and time.monotonic() < self._retry_at:
+            return {}
+            
+        previous = self.applied or {}
+        changes = {key: value for key, value in desired.items() if previous.get(key) != value}
+        for key in STATE_KEYS:
+            if key in changes:
+                logger.info(f"Policy '{reasons[key]}': {key} -> {changes[key]}")
+        if dry_run:
+            self.applied = desired
+            return changes
+            
+        result = self.apply(changes)
+        # Only what is actually in place counts as applied; settings that
+        # failed or were rolled back are retried after a delay
+        applied = {key: value for key, value in previous.items() if key in desired and key not in changes}
+        applied.update((key, changes[key]) for key in result.unchanged)
+        applied.update(result.changed)
+        self.applied = applied
+        if applied == desired:
+            self._failed = None
+        else:
+            self._retry_delay = min(self._retry_delay * 2, RETRY_MAX) if self._failed else RETRY_INITIAL
+            self._failed = desired
+            self._retry_at = time.monotonic() + self._retry_delay
+            logger.info(f"Policy settings not applied, retrying in {self._retry_delay:g}s")
+        return result.changed
+        
+    def apply(self, changes: Dict[str, Any]):
+        """Apply settings that differ from the hardware; returns the ApplyResult"""
+        return self.controller.apply_state(changes)
+        
+    def next_boundary(self, now: datetime.datetime) -> Optional[datetime.datetime]:
+        """Return the next time a time-of-day condition changes, if any"""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        upcoming = []
+        for rule in self.config.rules:
+            if rule.time is None:
+                continue
+            for minute in rule.time:
+                boundary = midnight + datetime.timedelta(minutes=minute)
+                if boundary <= now:
+                    boundary += datetime.timedelta(days=1)
+                upcoming.append(boundary)
+        return min(upcoming) if upcoming else None
@@ -0,0 +1,118 @@
+"""
+Event-driven power supply monitoring for the GLib main loop
+"""
+
+import logging
+from typing import Any, Callable, Optional
+
+import gi
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 120
+
+
+class PowerSupplyMonitor:
+    """Report power supply state changes to a callback
+    
+    Subscribes to udev `power_supply` uevents through GUdev when it is
+    available. Without an event source it polls adaptively: the interval
+    starts at min_interval, doubles every time nothing changed up to
+    max_interval, and drops back after a change. The callback only runs
+    when read_state() returns something different from the last result.
+    """
+    
+    def __init__(self, read_state: Callable[[], Any], callback: Callable[[Any], None],
+                 min_interval: int = MIN_POLL_INTERVAL, max_interval: int = MAX_POLL_INTERVAL):
+        self.read_state = read_state
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.last_state = None
+        self.udev_client = None
+        self.uevent_handler = None
+        self.timeout_id: Optional[int] = None
+        
+    @property
+    def running(self) -> bool:
+        """Whether the monitor is started"""
+        return self.udev_client is not None or self.timeout_id is not None
+        
+    def start(self, initial_state: Any = None):
+        """Start monitoring; initial_state is the state the caller already shows"""
+        if self.running:
+            return
+        self.last_state = initial_state
+        
+        self.udev_client = self.create_udev_client()
+        if self.udev_client is not None:
+            self.uevent_handler = self.udev_client.connect('uevent', self.on_uevent)
+            # Not every firmware sends a uevent for each capacity step, so
+            # keep a slow safety poll even when uevents are available
+            self.interval = self.max_interval
+            logger.debug("Monitoring power supplies through udev")
+        else:
+            self.interval = self.min_interval
+            logger.debug("GUdev not available, polling power supplies")
+        self.schedule_poll()
+        
+    def stop(self):
+        """Stop monitoring"""
+        if self.udev_client is not None:
+            self.udev_client.disconnect(self.uevent_handler)
+            self.udev_client = None
+            self.uevent_handler = None
+        if self.timeout_id is not None:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+            
+    @staticmethod
+    def create_udev_client():
+        """Return a GUdev client for power_supply events, or None"""
+        try:
+            gi.require_version('GUdev', '1.0')
+            from gi.repository import GUdev
+        except (ImportError, ValueError):
+            return None
+        return GUdev.Client.new(['power_supply'])
+        
+    def schedule_poll(self):
+        """Schedule the next poll at the current interval"""
+        if self.timeout_id is not None:
+            GLib.source_remove(self.timeout_id)
+        self.timeout_id = GLib.timeout_add_seconds(self.interval, self.on_poll)
+        
+    def on_uevent(self, client, action, device):
+        """Handle a power_supply uevent"""
+        self.check()
+        
+    def on_poll(self):
+        """Handle a poll timeout"""
+        self.timeout_id = None
+        changed = self.check()
+        
+        if self.udev_client is None:
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+        self.schedule_poll()
+        return False
+        
+    def check(self) -> bool:
+        """Read the state and notify the callback if it changed"""
+        try:
+            state = self.read_state()
+        except Exception as e:
+            logger.warning(f"Failed to read power supply state: {e}")
+            return False
+            
+        if state == self.last_state:
+            return False
+            
+        self.last_state = state
+        self.callback(state)
+        return True
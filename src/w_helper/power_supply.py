@@ -0,0 +1,276 @@
+"""
+Batched power supply telemetry read from sysfs
+"""
+
+import errno
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .instrument import metrics, timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSFS_ROOT = '/sys/class/power_supply'
+SYSFS_ROOT_ENV = 'W_HELPER_SYSFS_ROOT'
+
+# Sysfs attribute values are short; one read covers any of them
+READ_SIZE = 128
+
+BATTERY_ATTRIBUTES = (
+    'status', 'capacity', 'energy_now', 'energy_full', 'energy_full_design',
+    'charge_now', 'charge_full', 'charge_full_design', 'power_now', 'current_now',
+    'voltage_now', 'cycle_count', 'charge_control_end_threshold',
+)
+AC_ATTRIBUTES = ('online',)
+AC_TYPES = ('Mains', 'USB')
+
+MISSING = -1
+
+
+class BatterySnapshot(NamedTuple):
+    """One battery's readings; energy in µWh, power in µW, voltage in µV"""
+    name: str
+    status: Optional[str]
+    capacity: Optional[int]
+    energy_now: Optional[int]
+    energy_full: Optional[int]
+    power_now: Optional[int]
+    voltage_now: Optional[int]
+    cycle_count: Optional[int]
+    health: Optional[float]
+    charge_limit: Optional[int]
+
+
+class PowerSnapshot(NamedTuple):
+    """All power supplies at one point in time"""
+    timestamp: float
+    ac_online: Optional[bool]
+    batteries: Tuple[BatterySnapshot, ...]
+    
+    @property
+    def battery(self) -> Optional[BatterySnapshot]:
+        """The primary battery, if any"""
+        return self.batteries[0] if self.batteries else None
+
+
+def default_sysfs_root() -> str:
+    """Return the power supply class directory (W_HELPER_SYSFS_ROOT overrides it)"""
+    return os.environ.get(SYSFS_ROOT_ENV) or DEFAULT_SYSFS_ROOT
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    """Parse an integer attribute"""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class OpenFiles:
+    """Attribute file descriptors of one discovery, closed once unused
+    
+    Rediscovery replaces the table instead of closing it under a reader:
+    a retired table is closed by the last read still using it, so a
+    pread() never sees a closed (or reused) descriptor number.
+    """
+    
+    def __init__(self):
+        self.fds: Dict[Tuple[str, str], int] = {}
+        self.readers = 0
+        self.retired = False
+        
+    def close(self):
+        """Close every descriptor"""
+        for fd in self.fds.values():
+            if fd != MISSING:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.fds = {}
+
+
+class PowerSupplyReader:
+    """Read all batteries and AC adapters with as few syscalls as possible
+    
+    Supplies are discovered once. Attribute files are opened on first use
+    and kept open; each snapshot re-reads them with os.pread() at offset 0,
+    which makes sysfs regenerate the value without an open/close per
+    attribute. Attributes a supply doesn't have are remembered as missing.
+    The reader is shared between threads; see OpenFiles for how
+    rediscovery avoids closing descriptors that are being read.
+    """
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_sysfs_root()
+        self.batteries: List[str] = []
+        self.adapters: List[str] = []
+        self._files = OpenFiles()
+        self._discovered = False
+        self._lock = threading.Lock()
+        
+    def discover(self):
+        """Find batteries and AC adapters under the sysfs root"""
+        with self._lock:
+            self._discover()
+            
+    def _discover(self):
+        """Discover supplies (lock held)"""
+        self._retire_files()
+        batteries = []
+        adapters = []
+        try:
+            names = sorted(os.listdir(self.root))
+        except OSError as e:
+            logger.debug(f"Cannot list {self.root}: {e}")
+            names = []
+            
+        for name in names:
+            supply_type = self._read_once(os.path.join(self.root, name, 'type'))
+            if supply_type == 'Battery':
+                batteries.append(name)
+            elif supply_type in AC_TYPES:
+                adapters.append(name)
+        # Replaced, not filled in, so a concurrent snapshot sees one or the other
+        self.batteries = batteries
+        self.adapters = adapters
+        self._discovered = True
+        logger.debug(f"Power supplies: batteries={batteries} adapters={adapters}")
+        
+    @staticmethod
+    def _read_once(path: str) -> Optional[str]:
+        """Read a file without keeping it open"""
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+            
+    def read(self, supply: str, attribute: str) -> Optional[str]:
+        """Read one attribute of a supply, or None if it doesn't exist"""
+        key = (supply, attribute)
+        with self._lock:
+            files = self._files
+            fd = files.fds.get(key)
+            if fd is None:
+                try:
+                    fd = os.open(os.path.join(self.root, supply, attribute), os.O_RDONLY | os.O_CLOEXEC)
+                except OSError:
+                    fd = MISSING
+                files.fds[key] = fd
+            if fd == MISSING:
+                return None
+            files.readers += 1
+            
+        try:
+            with metrics.span('sysfs', f"{supply}/{attribute}"):
+                data = os.pread(fd, READ_SIZE, 0)
+            return data.decode('utf-8', 'replace').strip()
+        except OSError as e:
+            if e.errno == errno.ENODEV:
+                # The supply went away (e.g. an unplugged USB-C adapter)
+                self._discovered = False
+            # Some drivers also return errors while a value is unavailable
+            logger.debug(f"Failed to read {supply}/{attribute}: {e}")
+            return None
+        finally:
+            with self._lock:
+                files.readers -= 1
+                if files.retired and not files.readers:
+                    files.close()
+                    
+    def ensure_discovered(self):
+        """Discover supplies on first use (or after one went away)"""
+        if not self._discovered:
+            with self._lock:
+                # Another thread may have discovered them meanwhile
+                if not self._discovered:
+                    self._discover()
+            
+    @property
+    def primary_battery(self) -> Optional[str]:
+        """Name of the first battery"""
+        self.ensure_discovered()
+        return self.batteries[0] if self.batteries else None
+        
+    def read_battery(self, name: str) -> BatterySnapshot:
+        """Read one battery"""
+        values = {attribute: self.read(name, attribute) for attribute in BATTERY_ATTRIBUTES}
+        voltage_now = _to_int(values['voltage_now'])
+        
+        energy_now = _to_int(values['energy_now'])
+        energy_full = _to_int(values['energy_full'])
+        energy_full_design = _to_int(values['energy_full_design'])
+        if energy_now is None and voltage_now:
+            # Batteries reporting charge (µAh) instead of energy (µWh)
+            charge_now = _to_int(values['charge_now'])
+            charge_full = _to_int(values['charge_full'])
+            charge_full_design = _to_int(values['charge_full_design'])
+            if charge_now is not None:
+                energy_now = charge_now * voltage_now // 1000000
+            if charge_full is not None:
+                energy_full = charge_full * voltage_now // 1000000
+            if charge_full_design is not None:
+                energy_full_design = charge_full_design * voltage_now // 1000000
+                
+        power_now = _to_int(values['power_now'])
+        if power_now is None and voltage_now:
+            current_now = _to_int(values['current_now'])
+            if current_now is not None:
+                power_now = abs(current_now) * voltage_now // 1000000
+                
+        health = None
+        if energy_full and energy_full_design:
+            health = round(energy_full * 100 / energy_full_design, 1)
+            
+        return BatterySnapshot(
+            name=name,
+            status=values['status'],
+            capacity=_to_int(values['capacity']),
+            energy_now=energy_now,
+            energy_full=energy_full,
+            power_now=power_now,
+            voltage_now=voltage_now,
+            cycle_count=_to_int(values['cycle_count']),
+            health=health,
+            charge_limit=_to_int(values['charge_control_end_threshold']),
+        )
+        
+    def read_ac_online(self) -> Optional[bool]:
+        """Whether any AC adapter is online, or None if there is none"""
+        self.ensure_discovered()
+        online = None
+        for name in self.adapters:
+            value = _to_int(self.read(name, 'online'))
+            if value is not None:
+                online = bool(online) or value > 0
+        return online
+        
+    @timed('sysfs')
+    def snapshot(self) -> PowerSnapshot:
+        """Read every battery and adapter"""
+        self.ensure_discovered()
+        return PowerSnapshot(
+            timestamp=time.time(),
+            ac_online=self.read_ac_online(),
+            batteries=tuple(self.read_battery(name) for name in self.batteries),
+        )
+        
+    def _retire_files(self):
+        """Start a new descriptor table; the old one closes when unused (lock held)"""
+        files = self._files
+        self._files = OpenFiles()
+        files.retired = True
+        if not files.readers:
+            files.close()
+            
+    def close(self):
+        """Close all cached file descriptors"""
+        with self._lock:
+            self._retire_files()
+            self._discovered = False
@@ -0,0 +1,197 @@
+"""
+Running process detection for application-driven policy rules
+"""
+
+import fnmatch
+import logging
+import os
+import time
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+# (PID, start time in clock ticks since boot)
+ProcessKey = Tuple[int, int]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROC_ROOT = '/proc'
+DEFAULT_SCAN_INTERVAL = 2.0
+# Keep a rule active this long after its last process exited, so build
+# steps that run one compiler process after another don't flap
+DEFAULT_LINGER = 10.0
+# Processes that match no rule are looked at again until they are this
+# old, in case they exec a matching program
+DEFAULT_RECHECK = 10.0
+# Scans may use at most this fraction of one CPU; slower scans stretch
+# the interval instead
+MAX_SCAN_LOAD = 0.01
+
+
+class ProcessWatcher:
+    """Track which process rules have matching processes running
+    
+    Each scan lists the PIDs in /proc and diffs them against the previous
+    scan. Processes are identified by PID and start time (from
+    /proc/<pid>/stat), so a reused PID counts as a new process. New
+    processes are inspected (their comm name and executable); those that
+    match nothing are inspected again on every scan until they are
+    `recheck` seconds old, which catches launchers, wrapper scripts and
+    Steam/Flatpak shims that exec the real program shortly after
+    starting. Processes that match are re-read to confirm their PID wasn't
+    reused; everything else costs nothing, so a steady system costs about
+    one directory listing per scan. Every rule keeps a count of its
+    matching processes; a rule is active while the count is above zero
+    and for `linger` seconds after it drops to zero.
+    
+    Patterns are shell-style globs matched against the process name and
+    the executable's file name; patterns containing '/' are matched
+    against the full executable path.
+    """
+    
+    def __init__(self, rules: Dict[int, Sequence[str]], proc_root: str = DEFAULT_PROC_ROOT,
+                 interval: float = DEFAULT_SCAN_INTERVAL, linger: float = DEFAULT_LINGER,
+                 recheck: float = DEFAULT_RECHECK):
+        self.rules = {index: tuple(patterns) for index, patterns in rules.items()}
+        self.proc_root = proc_root
+        self.base_interval = interval
+        self.interval = interval
+        self.linger = linger
+        self.recheck = recheck
+        self.ticks_per_second = os.sysconf('SC_CLK_TCK')
+        # Start time of every known PID
+        self.pids: Dict[int, int] = {}
+        # Matching rule indexes, for processes that match anything
+        self.matches: Dict[ProcessKey, Tuple[int, ...]] = {}
+        # Processes that match nothing yet but are young enough to exec
+        # something that does
+        self.unmatched: Set[ProcessKey] = set()
+        self.counts: Dict[int, int] = {index: 0 for index in self.rules}
+        self.released: Dict[int, float] = {}
+        self._last_active: FrozenSet[int] = frozenset()
+        self.scans = 0
+        self.scan_time = 0.0
+        self.last_scan_duration = 0.0
+        
+    def read_starttime(self, pid: int) -> Optional[int]:
+        """Return a process's start time in clock ticks since boot, or None if it is gone"""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), 'stat'), 'rb') as f:
+                stat = f.read()
+            # The name in parentheses may contain spaces; starttime is the
+            # 20th field after it
+            return int(stat[stat.rindex(b')') + 2:].split()[19])
+        except (OSError, ValueError, IndexError):
+            return None
+            
+    def read_uptime(self) -> Optional[float]:
+        """Return seconds since boot, or None if /proc/uptime can't be read"""
+        try:
+            with open(os.path.join(self.proc_root, 'uptime'), 'rb') as f:
+                return float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+            
+    def read_names(self, pid: int) -> Tuple[Optional[str], Optional[str]]:
+        """Return (comm, exe path) of a process; either may be None"""
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            with open(os.path.join(base, 'comm'), 'rb') as f:
+                comm = f.read().decode('utf-8', 'replace').rstrip('\n')
+        except OSError:
+            comm = None
+        try:
+            exe = os.readlink(os.path.join(base, 'exe'))
+        except OSError:
+            # Kernel threads and other users' processes
+            exe = None
+        return comm, exe
+        
+    def match(self, comm: Optional[str], exe: Optional[str]) -> Tuple[int, ...]:
+        """Return the indexes of rules matching a process"""
+        exe_name = os.path.basename(exe) if exe else None
+        matched = []
+        for index, patterns in self.rules.items():
+            for pattern in patterns:
+                if '/' in pattern:
+                    hit = exe is not None and fnmatch.fnmatchcase(exe, pattern)
+                else:
+                    hit = ((comm is not None and fnmatch.fnmatchcase(comm, pattern)) or
+                           (exe_name is not None and fnmatch.fnmatchcase(exe_name, pattern)))
+                if hit:
+                    matched.append(index)
+                    break
+        return tuple(matched)
+        
+    def list_pids(self) -> Set[int]:
+        """Return the PIDs currently in /proc"""
+        return {int(name) for name in os.listdir(self.proc_root) if name.isdigit()}
+        
+    def scan(self) -> bool:
+        """Update process counts; return whether the set of active rules changed"""
+        start = time.perf_counter()
+        
+        current = self.list_pids()
+        now = time.monotonic()
+        for pid in self.pids.keys() - current:
+            self.forget(pid, now)
+        # A followed PID may have exited and been reused since the last scan
+        for pid, starttime in list(self.matches) + list(self.unmatched):
+            if pid in current and self.read_starttime(pid) != starttime:
+                self.forget(pid, now)
+                
+        uptime = self.read_uptime()
+        rechecked = list(self.unmatched)
+        for pid in current - self.pids.keys():
+            starttime = self.read_starttime(pid)
+            if starttime is not None:
+                self.pids[pid] = starttime
+                self.inspect((pid, starttime), uptime)
+        for key in rechecked:
+            self.unmatched.discard(key)
+            self.inspect(key, uptime)
+            
+        duration = time.perf_counter() - start
+        self.scans += 1
+        self.scan_time += duration
+        self.last_scan_duration = duration
+        # Stay within the CPU budget on systems with very many processes
+        self.interval = max(self.base_interval, duration / MAX_SCAN_LOAD)
+        if self.interval > self.base_interval:
+            logger.debug(f"Process scan took {duration * 1000:.1f} ms, "
+                         f"scanning every {self.interval:.1f}s")
+            
+        active = self.active()
+        changed = active != self._last_active
+        self._last_active = active
+        return changed
+        
+    def inspect(self, key: ProcessKey, uptime: Optional[float]):
+        """Match a process against the rules, or keep it for a recheck while it is young"""
+        matched = self.match(*self.read_names(key[0]))
+        if matched:
+            self.matches[key] = matched
+            for index in matched:
+                self.counts[index] += 1
+                self.released.pop(index, None)
+        elif uptime is not None and uptime - key[1] / self.ticks_per_second < self.recheck:
+            self.unmatched.add(key)
+            
+    def forget(self, pid: int, now: float):
+        """Drop an exited process, releasing the rules it matched"""
+        key = (pid, self.pids.pop(pid))
+        self.unmatched.discard(key)
+        for index in self.matches.pop(key, ()):
+            self.counts[index] -= 1
+            if self.counts[index] == 0:
+                self.released[index] = now
+                
+    def active(self) -> FrozenSet[int]:
+        """Return indexes of rules with running (or recently exited) processes"""
+        now = time.monotonic()
+        return frozenset(
+            index for index, count in self.counts.items()
+            if count > 0 or now - self.released.get(index, float('-inf')) < self.linger
+        )
+        
+    def running(self, index: int) -> List[int]:
+        """Return the PIDs matching a rule"""
+        return sorted(pid for (pid, _), matched in self.matches.items() if index in matched)
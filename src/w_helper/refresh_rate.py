@@ -0,0 +1,88 @@
+"""
+Switch monitor refresh rates when the laptop moves between AC and battery
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from .display import Monitor
+from .policy import ALL_MONITORS, RefreshRates
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshRateSwitcher:
+    """Apply the configured AC or battery refresh rate of each monitor
+    
+    Only acts when the power source changes (and on the first update), so
+    a rate picked by hand stays until the next transition. Monitors that
+    already run at their target rate are left out of the request, and if
+    none needs to change, ApplyMonitorsConfig isn't called at all: a
+    transition costs one GetCurrentState and at most one
+    ApplyMonitorsConfig, however many monitors there are.
+    """
+    
+    def __init__(self, controller, preferences: Dict[str, RefreshRates]):
+        self.controller = controller
+        self.preferences = preferences
+        self.ac_online: Optional[bool] = None
+        self.applied: Dict[str, float] = {}
+        
+    def reload(self, preferences: Dict[str, RefreshRates]):
+        """Replace the preferences; the next update applies them"""
+        self.preferences = preferences
+        self.ac_online = None
+        
+    def rate_for(self, connector: str, ac_online: bool) -> Optional[float]:
+        """Return the configured rate of a monitor for a power source"""
+        for key in (connector, ALL_MONITORS):
+            preference = self.preferences.get(key)
+            if preference is not None and preference.for_source(ac_online) is not None:
+                return preference.for_source(ac_online)
+        return None
+        
+    def targets(self, monitors: List[Monitor], ac_online: bool) -> Dict[str, float]:
+        """Return the rates to switch to, leaving out monitors already there"""
+        rates = {}
+        for monitor in monitors:
+            rate = self.rate_for(monitor.connector, ac_online)
+            if rate is None or not monitor.enabled:
+                continue
+            mode = monitor.find_mode(rate)
+            if mode is None:
+                width, height = monitor.current.resolution
+                logger.warning(f"{monitor.connector} has no {rate:g} Hz mode at {width}x{height}")
+            elif not mode.is_current:
+                rates[monitor.connector] = rate
+        return rates
+        
+    def update(self, ac_online: Optional[bool], dry_run: bool = False) -> Dict[str, float]:
+        """Switch rates if the power source changed; returns the rates set per connector"""
+        if not self.preferences or ac_online is None or ac_online == self.ac_online:
+            return {}
+        self.ac_online = ac_online
+        source = 'AC' if ac_online else 'battery'
+        
+        try:
+            rates = self.targets(self.controller.get_monitors(), ac_online)
+        except Exception as e:
+            logger.warning(f"Cannot read monitors: {e}")
+            # Nothing was switched: try again on the next evaluation
+            self.ac_online = None
+            return {}
+        if not rates:
+            logger.debug(f"Every monitor already runs at its {source} refresh rate")
+            return {}
+            
+        for connector, rate in rates.items():
+            logger.info(f"Refresh rate on {source}: {connector} -> {rate:g} Hz")
+        if not dry_run:
+            try:
+                self.controller.set_monitor_refresh_rates(rates)
+            except Exception as e:
+                logger.error(f"Failed to switch refresh rates: {e}")
+                # Try again on the next evaluation
+                self.ac_online = None
+                return {}
+        self.applied = rates
+        return rates
@@ -0,0 +1,205 @@
+"""
+Battery runtime estimation from sampled discharge rates
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .history import default_state_dir
+
+logger = logging.getLogger(__name__)
+
+# Rates adapt to a new workload within a few time constants
+DEFAULT_TIME_CONSTANT = 600
+# Observed discharge time before a learned rate is trusted
+MIN_OBSERVED = 300
+# Samples further apart than this don't carry a usable rate
+MAX_SAMPLE_GAP = 900
+
+STATE_VERSION = 1
+
+RateKey = Tuple[Optional[str], Optional[str]]
+
+
+class RuntimeEstimate(NamedTuple):
+    """Remaining battery runtime for the current CPU profile and GPU mode"""
+    seconds: float
+    watts: float
+    # 'learned' (averaged rate for this profile/mode) or 'instant' (power_now)
+    source: str
+    cpu_profile: Optional[str]
+    gpu_mode: Optional[str]
+    # Estimated seconds for every profile/mode pair with a learned rate
+    alternatives: Dict[RateKey, float]
+
+
+def default_runtime_file() -> str:
+    """Return the file learned discharge rates are kept in"""
+    return os.path.join(default_state_dir(), 'runtime.json')
+
+
+def format_duration(seconds: float) -> str:
+    """Format a runtime as e.g. '3 h 25 min', rounded to 5 minutes"""
+    minutes = int(round(seconds / 300)) * 5
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours} h {minutes} min"
+    if hours:
+        return f"{hours} h"
+    return f"{max(minutes, 5)} min" if minutes else "< 5 min"
+
+
+class RuntimeEstimator:
+    """Learn the discharge rate per (CPU profile, GPU mode)
+    
+    Each discharging sample updates an exponentially weighted moving
+    average of the power draw for the profile/mode active at the time,
+    weighted by the time since the previous sample so irregular sampling
+    doesn't skew it. Updates are O(1) and only one average per pair is
+    stored. power_now is used when the battery reports it; otherwise the
+    rate comes from the drop in energy_now between samples.
+    """
+    
+    def __init__(self, path: Optional[str] = None, time_constant: float = DEFAULT_TIME_CONSTANT):
+        self.path = path or default_runtime_file()
+        self.time_constant = time_constant
+        self.rates: Dict[RateKey, float] = {}
+        self.observed: Dict[RateKey, float] = {}
+        self._last_time: Optional[float] = None
+        self._last_key: Optional[RateKey] = None
+        # Energy reading the current energy_now based rate is measured from
+        self._anchor: Optional[Tuple[float, int]] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        
+    def update(self, timestamp: float, discharging: bool, energy_now: Optional[int],
+               power_now: Optional[int], cpu_profile: Optional[str], gpu_mode: Optional[str]):
+        """Add a sample; energy in µWh, power in µW"""
+        key = (cpu_profile, gpu_mode)
+        with self._lock:
+            self._ensure_loaded()
+            if not discharging or key != self._last_key:
+                # Rates measured across a mode switch or a charge aren't meaningful
+                self._anchor = None
+            dt = 0.0
+            if self._last_time is not None and key == self._last_key:
+                dt = timestamp - self._last_time
+                if not 0 < dt <= MAX_SAMPLE_GAP:
+                    dt = 0.0
+                    self._anchor = None
+            self._last_time = timestamp
+            self._last_key = key
+            if not discharging:
+                return
+                
+            if power_now:
+                self._observe(key, abs(power_now) / 1000000, dt)
+            elif energy_now is not None:
+                self._observe_energy(key, timestamp, energy_now)
+                
+    def _observe_energy(self, key: RateKey, timestamp: float, energy_now: int):
+        """Derive a rate from energy drops (lock held)"""
+        if self._anchor is None:
+            self._anchor = (timestamp, energy_now)
+            return
+        anchor_time, anchor_energy = self._anchor
+        # energy_now often updates less frequently than we sample
+        if energy_now >= anchor_energy:
+            return
+        elapsed = timestamp - anchor_time
+        watts = (anchor_energy - energy_now) * 3600 / 1000000 / elapsed
+        self._anchor = (timestamp, energy_now)
+        self._observe(key, watts, elapsed)
+        
+    def _observe(self, key: RateKey, watts: float, dt: float):
+        """Fold a measured rate into the average for key (lock held)"""
+        current = self.rates.get(key)
+        if current is None:
+            self.rates[key] = watts
+        else:
+            alpha = 1 - math.exp(-dt / self.time_constant)
+            self.rates[key] = current + alpha * (watts - current)
+        self.observed[key] = self.observed.get(key, 0.0) + dt
+        
+    def rate(self, cpu_profile: Optional[str], gpu_mode: Optional[str]) -> Optional[float]:
+        """Return the learned rate in watts, or None if there isn't enough data"""
+        key = (cpu_profile, gpu_mode)
+        with self._lock:
+            self._ensure_loaded()
+            if self.observed.get(key, 0.0) < MIN_OBSERVED:
+                return None
+            return self.rates.get(key)
+            
+    def estimate(self, energy_now: int, power_now: Optional[int], cpu_profile: Optional[str],
+                 gpu_mode: Optional[str]) -> Optional[RuntimeEstimate]:
+        """Estimate the remaining runtime for a battery holding energy_now µWh"""
+        watt_hours = energy_now / 1000000
+        with self._lock:
+            self._ensure_loaded()
+            alternatives = {
+                key: watt_hours / watts * 3600
+                for key, watts in self.rates.items()
+                if watts > 0 and self.observed.get(key, 0.0) >= MIN_OBSERVED
+            }
+            
+        watts = self.rate(cpu_profile, gpu_mode)
+        source = 'learned'
+        if watts is None and power_now:
+            watts = abs(power_now) / 1000000
+            source = 'instant'
+        if not watts:
+            return None
+            
+        return RuntimeEstimate(
+            seconds=watt_hours / watts * 3600,
+            watts=watts,
+            source=source,
+            cpu_profile=cpu_profile,
+            gpu_mode=gpu_mode,
+            alternatives=alternatives,
+        )
+        
+    def _ensure_loaded(self):
+        """Load saved rates on first use (lock held)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != STATE_VERSION:
+                return
+            for entry in data.get('rates', []):
+                key = (entry.get('cpu_profile'), entry.get('gpu_mode'))
+                self.rates[key] = float(entry['watts'])
+                self.observed[key] = float(entry.get('observed', 0.0))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable runtime state {self.path}: {e}")
+            
+    def save(self):
+        """Write learned rates to disk"""
+        with self._lock:
+            if not self.rates:
+                return
+            data = {
+                'version': STATE_VERSION,
+                'rates': [
+                    {'cpu_profile': key[0], 'gpu_mode': key[1], 'watts': round(watts, 3),
+                     'observed': round(self.observed.get(key, 0.0), 1)}
+                    for key, watts in self.rates.items()
+                ],
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save runtime state: {e}")
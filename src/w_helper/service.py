@@ -0,0 +1,762 @@
+"""
+Session bus access to a running instance's controller
+
+A running GUI or `w-helper daemon --bus` exports its SystemController on
+the session bus and leaves a marker file in $XDG_RUNTIME_DIR, so CLI
+commands can use the warm controller (with its resolved tools, open
+sysfs files and cached state) instead of building a cold one. The marker
+is checked before anything D-Bus related is imported, keeping the CLI
+cheap when nothing runs.
+
+The exported object also carries the current settings and a battery
+snapshot as properties, with PropertiesChanged sent when they change.
+When the daemon runs, other instances read and write the hardware
+through it (ServiceBackend), so it is polled once per session however
+many clients there are.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .backends import HardwareBackend
+from .display import Monitor
+from .power_supply import PowerSnapshot
+from .runtime import RuntimeEstimate
+
+logger = logging.getLogger(__name__)
+
+CONTROLLER_INTERFACE = 'com.github.w_helper.Controller'
+CONTROLLER_PATH = '/com/github/w_helper/Controller'
+DAEMON_BUS_NAME = 'com.github.w_helper.Daemon'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+REMOTE_ENV = 'W_HELPER_REMOTE'
+# Generous enough for a GPU mode switch
+CALL_TIMEOUT_MS = 90000
+# A live instance answers a property read at once
+PING_TIMEOUT_MS = 2000
+# Seconds between battery reads and between full re-reads of the settings
+BATTERY_INTERVAL = 5.0
+STATE_INTERVAL = 60.0
+
+# D-Bus property -> (state key, signature, value while unknown)
+PROPERTIES: Dict[str, Tuple[str, str, Any]] = {
+    'CpuProfile': ('cpu_profile', 's', ''),
+    'GpuMode': ('gpu_mode', 's', ''),
+    'ChargeLimit': ('charge_limit', 'i', -1),
+    'Battery': ('battery', 'a{sv}', {}),
+}
+# Signatures of the Battery dictionary's entries
+BATTERY_FIELDS = {
+    'capacity': 'i',
+    'status': 's',
+    'power_watts': 'd',
+    'energy_wh': 'd',
+    'ac_online': 'b',
+}
+
+# Entries of Mutter's monitor and mode property dictionaries that Monitor
+# reads, with their signatures
+MONITOR_PROPERTIES = {'display-name': 's', 'is-builtin': 'b'}
+MODE_PROPERTIES = {'is-current': 'b', 'is-preferred': 'b'}
+MONITORS_SIGNATURE = 'a((ssss)a(siiddada{sv})a{sv})'
+
+
+def known(value: Any, unknown: Any) -> Any:
+    """Send None as the value meaning unknown"""
+    return unknown if value is None else value
+
+
+def optional(unknown: Any) -> Callable:
+    """Decoder for a single result that is sent as unknown instead of None"""
+    return lambda value: None if value == unknown else value
+
+
+def single(value: Any) -> Any:
+    """Decoder for a single result"""
+    return value
+
+
+def set_result(success: bool, message: str) -> bool:
+    """Decoder for the Set methods: success, with the failure logged like a local one"""
+    if not success:
+        logger.error(message)
+    return success
+
+
+def encode_runtime_estimate(estimate: Optional[RuntimeEstimate]) -> tuple:
+    """Convert a RuntimeEstimate to GetRuntimeEstimate's results"""
+    if estimate is None:
+        return False, 0.0, 0.0, '', '', '', []
+    alternatives = [(profile, mode, seconds) for (profile, mode), seconds in estimate.alternatives.items()]
+    return (True, estimate.seconds, estimate.watts, estimate.source,
+            estimate.cpu_profile or '', estimate.gpu_mode or '', alternatives)
+
+
+def decode_runtime_estimate(found: bool, seconds: float, watts: float, source: str,
+                            cpu_profile: str, gpu_mode: str, alternatives: list) -> Optional[RuntimeEstimate]:
+    """Rebuild a RuntimeEstimate from GetRuntimeEstimate's results"""
+    if not found:
+        return None
+    return RuntimeEstimate(seconds, watts, source, cpu_profile or None, gpu_mode or None,
+                           {(profile, mode): runtime for profile, mode, runtime in alternatives})
+
+
+def encode_monitors(monitors: List[Monitor]) -> tuple:
+    """Send monitors as the GetCurrentState data they were parsed from
+    
+    Only the property entries Monitor reads are kept, as the types of
+    Mutter's other entries aren't known here.
+    """
+    from gi.repository import GLib
+    
+    def properties(values: Dict[str, Any], signatures: Dict[str, str]) -> Dict[str, Any]:
+        return {key: GLib.Variant(signatures[key], value) for key, value in values.items() if key in signatures}
+        
+    return ([(tuple(spec), [(*mode[:6], properties(mode[6], MODE_PROPERTIES)) for mode in modes],
+              properties(monitor_properties, MONITOR_PROPERTIES))
+             for spec, modes, monitor_properties in (monitor.raw for monitor in monitors)],)
+
+
+def decode_monitors(data: list) -> List[Monitor]:
+    """Rebuild monitors from GetMonitors' result"""
+    return [Monitor(raw) for raw in data]
+
+
+class RemoteMethod(NamedTuple):
+    """A controller method exported as a typed D-Bus method"""
+    name: str
+    # "signature name" of each argument and result
+    arguments: Tuple[str, ...]
+    results: Tuple[str, ...]
+    # (controller, *arguments) -> results, run in the exporting process
+    serve: Callable
+    # *results -> the controller method's return value, in the client
+    decode: Callable
+    
+    @property
+    def in_signature(self) -> str:
+        return ''.join(argument.split()[0] for argument in self.arguments)
+        
+    @property
+    def out_signature(self) -> str:
+        return ''.join(result.split()[0] for result in self.results)
+
+
+# Controller methods callable over the bus. The Set methods report the
+# outcome in the exporting process (its status messages and history)
+# and return it with the tool's output.
+REMOTE_METHODS: Dict[str, RemoteMethod] = {
+    'get_cpu_profiles': RemoteMethod(
+        'GetCpuProfiles', (), ('as profiles',),
+        lambda controller: (controller.get_cpu_profiles(),), single),
+    'get_current_cpu_profile': RemoteMethod(
+        'GetCurrentCpuProfile', (), ('s profile',),
+        lambda controller: (known(controller.get_current_cpu_profile(), ''),), optional('')),
+    'set_cpu_profile': RemoteMethod(
+        'SetCpuProfile', ('s profile',), ('b success', 's message'),
+        lambda controller, profile: controller.set_setting('cpu_profile', profile), set_result),
+    'get_gpu_modes': RemoteMethod(
+        'GetGpuModes', (), ('as modes',),
+        lambda controller: (controller.get_gpu_modes(),), single),
+    'get_current_gpu_mode': RemoteMethod(
+        'GetCurrentGpuMode', (), ('s mode',),
+        lambda controller: (known(controller.get_current_gpu_mode(), ''),), optional('')),
+    'set_gpu_mode': RemoteMethod(
+        'SetGpuMode', ('s mode',), ('b success', 's message'),
+        lambda controller, mode: controller.set_setting('gpu_mode', mode), set_result),
+    'get_monitors': RemoteMethod(
+        'GetMonitors', (), (f'{MONITORS_SIGNATURE} monitors',),
+        lambda controller: encode_monitors(controller.get_monitors()), decode_monitors),
+    'get_available_refresh_rates': RemoteMethod(
+        'GetAvailableRefreshRates', (), ('as rates',),
+        lambda controller: (controller.get_available_refresh_rates(),), single),
+    'get_current_refresh_rate': RemoteMethod(
+        'GetCurrentRefreshRate', (), ('s rate',),
+        lambda controller: (known(controller.get_current_refresh_rate(), ''),), optional('')),
+    'set_refresh_rate': RemoteMethod(
+        'SetRefreshRate', ('s rate', 'b persistent'), ('b success',),
+        lambda controller, rate, persistent: (controller.set_refresh_rate(rate, persistent),), single),
+    'get_battery_info': RemoteMethod(
+        'GetBatteryInfo', (), ('a{ss} info',),
+        lambda controller: (controller.get_battery_info(),), single),
+    'get_battery_charge_limit': RemoteMethod(
+        'GetChargeLimit', (), ('i limit',),
+        lambda controller: (known(controller.get_battery_charge_limit(), -1),), optional(-1)),
+    'set_battery_charge_limit': RemoteMethod(
+        'SetChargeLimit', ('y limit',), ('b success', 's message'),
+        lambda controller, limit: controller.set_setting('charge_limit', limit), set_result),
+    'get_runtime_estimate': RemoteMethod(
+        'GetRuntimeEstimate', (),
+        ('b found', 'd seconds', 'd watts', 's source', 's cpu_profile', 's gpu_mode', 'a(ssd) alternatives'),
+        lambda controller: encode_runtime_estimate(controller.get_runtime_estimate()), decode_runtime_estimate),
+}
+# D-Bus method name -> controller method
+DBUS_METHODS = {method.name: name for name, method in REMOTE_METHODS.items()}
+# Set method of each setting, used by ServiceBackend
+SETTING_METHODS = {
+    'charge_limit': 'set_battery_charge_limit',
+    'cpu_profile': 'set_cpu_profile',
+    'gpu_mode': 'set_gpu_mode',
+}
+
+
+def interface_xml() -> str:
+    """Introspection data of the controller interface"""
+    lines = ['<node>', f"  <interface name='{CONTROLLER_INTERFACE}'>"]
+    for method in REMOTE_METHODS.values():
+        lines.append(f"    <method name='{method.name}'>")
+        for direction, args in (('in', method.arguments), ('out', method.results)):
+            for arg in args:
+                signature, name = arg.split()
+                lines.append(f"      <arg type='{signature}' name='{name}' direction='{direction}'/>")
+        lines.append('    </method>')
+    for name, (_, signature, _) in PROPERTIES.items():
+        lines.append(f"    <property name='{name}' type='{signature}' access='read'/>")
+    lines += ['  </interface>', '</node>']
+    return '\n'.join(lines)
+
+
+class RemoteError(Exception):
+    """A remote call failed or no instance could be reached"""
+
+
+def runtime_dir() -> str:
+    """Return the per-user runtime directory for W-Helper"""
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.path.join('/tmp', f'w-helper-{os.getuid()}')
+    return os.path.join(base, 'w-helper')
+
+
+def instance_file() -> str:
+    """Return the marker file a running instance leaves behind"""
+    return os.path.join(runtime_dir(), 'instance.json')
+
+
+def write_instance(bus_name: str, kind: str):
+    """Announce this process as the instance to forward commands to"""
+    path = instance_file()
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'pid': os.getpid(), 'bus_name': bus_name, 'path': CONTROLLER_PATH,
+                       'kind': kind, 'bus': os.environ.get('DBUS_SESSION_BUS_ADDRESS')}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write {path}: {e}")
+
+
+def remove_instance():
+    """Remove the marker file if it is ours"""
+    instance = read_instance()
+    if instance is not None and instance.get('pid') == os.getpid():
+        try:
+            os.unlink(instance_file())
+        except OSError:
+            pass
+
+
+def read_instance() -> Optional[Dict[str, Any]]:
+    """Return the marker of a live instance on this session bus, or None"""
+    try:
+        with open(instance_file(), 'r') as f:
+            instance = json.load(f)
+        pid = int(instance['pid'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    # A marker from another session (e.g. over ssh) isn't reachable here
+    if instance.get('bus') != os.environ.get('DBUS_SESSION_BUS_ADDRESS'):
+        return None
+    return instance
+
+
+def battery_properties(snapshot: PowerSnapshot) -> Dict[str, Any]:
+    """Summarize a power snapshot as the Battery property's entries"""
+    values: Dict[str, Any] = {}
+    if snapshot.ac_online is not None:
+        values['ac_online'] = snapshot.ac_online
+    battery = snapshot.battery
+    if battery is None:
+        return values
+    if battery.capacity is not None:
+        values['capacity'] = battery.capacity
+    if battery.status is not None:
+        values['status'] = battery.status
+    # Rounded so sensor noise doesn't turn into a signal every read
+    if battery.power_now is not None:
+        values['power_watts'] = round(battery.power_now / 1000000, 1)
+    if battery.energy_now is not None:
+        values['energy_wh'] = round(battery.energy_now / 1000000, 1)
+    return values
+
+
+def to_variant(name: str, value: Any):
+    """Wrap a published value in a GLib.Variant of the property's type"""
+    from gi.repository import GLib
+    
+    signature = PROPERTIES[name][1]
+    if name == 'Battery':
+        value = {key: GLib.Variant(BATTERY_FIELDS[key], entry) for key, entry in value.items()}
+    return GLib.Variant(signature, value)
+
+
+class ControllerService:
+    """Serve REMOTE_METHODS and PROPERTIES of a controller on a D-Bus connection
+    
+    Calls run on the controller's task runner, so a slow tool doesn't
+    block the main loop of the exporting process. Properties are served
+    from the last published values: refresh() reads them and start()
+    keeps them current from the controller's 'state-changed' signal, a
+    battery read every BATTERY_INTERVAL and a full re-read every
+    STATE_INTERVAL. PropertiesChanged is only sent for values that differ
+    from what was published.
+    """
+    
+    def __init__(self, controller):
+        self.controller = controller
+        self.connection = None
+        self.registration_id = None
+        self.published: Dict[str, Any] = {name: unknown for name, (_, _, unknown) in PROPERTIES.items()}
+        self._publish_lock = threading.Lock()
+        self._handler_id = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+    def dispatch(self, method: str, arguments: tuple) -> tuple:
+        """Serve a controller method and return its D-Bus results"""
+        remote = REMOTE_METHODS[method]
+        results = remote.serve(self.controller, *arguments)
+        # Successful writes are published through 'state-changed'; after a
+        # failed one the setting is unknown and has to be re-read
+        if method.startswith('set_') and not results[0]:
+            self.refresh_state()
+        return results
+        
+    def register(self, connection) -> bool:
+        """Export the controller on a Gio.DBusConnection"""
+        from gi.repository import Gio
+        
+        interface = Gio.DBusNodeInfo.new_for_xml(interface_xml()).interfaces[0]
+        try:
+            self.registration_id = connection.register_object(
+                CONTROLLER_PATH, interface, self.on_method_call, self.on_get_property, None
+            )
+        except Exception as e:
+            logger.warning(f"Failed to export controller on the session bus: {e}")
+            return False
+        self.connection = connection
+        return True
+        
+    def unregister(self):
+        """Stop serving calls"""
+        self.stop()
+        if self.connection is not None and self.registration_id:
+            self.connection.unregister_object(self.registration_id)
+        self.connection = None
+        self.registration_id = None
+        
+    def start(self):
+        """Keep the properties up to date (see refresh() for the first read)"""
+        self._handler_id = self.controller.connect('state-changed', self.on_state_changed)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='w-helper-service', daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """Stop refreshing the properties"""
+        if self._handler_id is not None:
+            self.controller.disconnect(self._handler_id)
+            self._handler_id = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            
+    def run(self):
+        """Refresher thread"""
+        next_state = STATE_INTERVAL
+        elapsed = 0.0
+        while not self._stop.wait(BATTERY_INTERVAL):
+            elapsed += BATTERY_INTERVAL
+            self.refresh_battery()
+            if elapsed >= next_state:
+                next_state += STATE_INTERVAL
+                self.refresh_state()
+                
+    def refresh(self):
+        """Read every property"""
+        self.refresh_state()
+        self.refresh_battery()
+        
+    def refresh_state(self):
+        """Re-read the settings and publish the ones that changed"""
+        try:
+            state = self.controller.get_state()
+        except Exception as e:
+            logger.warning(f"Failed to read settings: {e}")
+            return
+        self.publish({name: state[key] for name, (key, _, _) in PROPERTIES.items() if key in state})
+        
+    def refresh_battery(self):
+        """Re-read the battery and publish it if it changed"""
+        try:
+            snapshot = self.controller.get_power_snapshot()
+        except Exception as e:
+            logger.warning(f"Failed to read the battery: {e}")
+            return
+        values = {'Battery': battery_properties(snapshot)}
+        battery = snapshot.battery
+        if battery is not None and battery.charge_limit is not None:
+            values['ChargeLimit'] = battery.charge_limit
+        self.publish(values)
+        
+    def on_state_changed(self, controller, key, value):
+        """Publish a setting the controller learned about"""
+        for name, (state_key, _, _) in PROPERTIES.items():
+            if state_key == key:
+                self.publish({name: value})
+                
+    def publish(self, values: Dict[str, Any]):
+        """Update properties and send PropertiesChanged for the ones that differ"""
+        changed = {}
+        with self._publish_lock:
+            for name, value in values.items():
+                if value is None:
+                    value = PROPERTIES[name][2]
+                if self.published[name] != value:
+                    self.published[name] = value
+                    changed[name] = value
+        if not changed or self.connection is None:
+            return
+            
+        from gi.repository import GLib
+        
+        logger.debug(f"Properties changed: {changed}")
+        try:
+            self.connection.emit_signal(
+                None, CONTROLLER_PATH, PROPERTIES_INTERFACE, 'PropertiesChanged',
+                GLib.Variant('(sa{sv}as)', (
+                    CONTROLLER_INTERFACE,
+                    {name: to_variant(name, value) for name, value in changed.items()},
+                    [],
+                ))
+            )
+        except Exception as e:
+            logger.warning(f"Failed to send PropertiesChanged: {e}")
+            
+    def on_get_property(self, connection, sender, path, interface, name):
+        """Answer Properties.Get/GetAll from the published values"""
+        with self._publish_lock:
+            value = self.published[name]
+        return to_variant(name, value)
+        
+    def on_method_call(self, connection, sender, path, interface, method, parameters, invocation):
+        """Answer a method call from a worker thread"""
+        from gi.repository import GLib
+        
+        # Gio has already checked the arguments against the introspection data
+        name = DBUS_METHODS[method]
+        signature = REMOTE_METHODS[name].out_signature
+        
+        def reply(results):
+            invocation.return_value(GLib.Variant(f'({signature})', results))
+            
+        def fail(error):
+            invocation.return_dbus_error(f'{CONTROLLER_INTERFACE}.Error', str(error))
+            
+        self.controller.run_async(self.dispatch, name, parameters.unpack(), callback=reply, error_callback=fail)
+
+
+class RemoteController:
+    """Client for a ControllerService, usable in place of a SystemController
+    
+    Only REMOTE_METHODS are available; anything else raises
+    AttributeError, so callers can tell which commands can be forwarded.
+    """
+    
+    def __init__(self, connection, bus_name: str, path: str = CONTROLLER_PATH):
+        self.connection = connection
+        self.bus_name = bus_name
+        self.path = path
+        
+    def call_raw(self, method: str, *args) -> tuple:
+        """Call a controller method in the remote instance and return its D-Bus results"""
+        from gi.repository import Gio, GLib
+        
+        remote = REMOTE_METHODS[method]
+        try:
+            reply = self.connection.call_sync(
+                self.bus_name, self.path, CONTROLLER_INTERFACE, remote.name,
+                GLib.Variant(f'({remote.in_signature})', args),
+                GLib.VariantType.new(f'({remote.out_signature})'), Gio.DBusCallFlags.NO_AUTO_START,
+                CALL_TIMEOUT_MS, None
+            )
+        except GLib.Error as e:
+            # "GDBus.Error:<error name>: <message>" for errors raised by the service
+            message = e.message.split(': ', 1)[-1] if e.message.startswith('GDBus.Error:') else e.message
+            raise RemoteError(message) from e
+        return reply.unpack()
+        
+    def call(self, method: str, *args) -> Any:
+        """Call a controller method in the remote instance"""
+        return REMOTE_METHODS[method].decode(*self.call_raw(method, *args))
+        
+    def ping(self, timeout_ms: int = PING_TIMEOUT_MS):
+        """Check that the instance answers, without running anything in it
+        
+        Reads a published property: it costs a round trip rather than a
+        tool invocation, and unlike Peer.Ping (answered by GDBus's own
+        thread) it is served by the instance's main loop, so a hung GUI
+        fails the check instead of taking CALL_TIMEOUT_MS per command.
+        """
+        from gi.repository import Gio, GLib
+        
+        try:
+            self.connection.call_sync(
+                self.bus_name, self.path, PROPERTIES_INTERFACE, 'Get',
+                GLib.Variant('(ss)', (CONTROLLER_INTERFACE, 'CpuProfile')),
+                GLib.VariantType.new('(v)'), Gio.DBusCallFlags.NO_AUTO_START, timeout_ms, None
+            )
+        except GLib.Error as e:
+            raise RemoteError(e.message) from e
+        
+    def __getattr__(self, name: str) -> Callable:
+        if name not in REMOTE_METHODS:
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
+        
+    def cancel_commands(self):
+        """Nothing to cancel locally"""
+
+
+def connect_remote() -> Optional[RemoteController]:
+    """Return a client for a running instance, or None to run in-process"""
+    if os.environ.get(REMOTE_ENV) == '0':
+        return None
+    instance = read_instance()
+    if instance is None:
+        return None
+    try:
+        from gi.repository import Gio
+        connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        remote = RemoteController(connection, instance['bus_name'], instance.get('path', CONTROLLER_PATH))
+        # The marker can outlive a hung or crashed instance
+        remote.ping()
+    except Exception as e:
+        logger.debug(f"Running instance not reachable, running in-process: {e}")
+        return None
+    logger.debug(f"Forwarding to the running {instance.get('kind', 'instance')} (pid {instance['pid']})")
+    return remote
+
+
+class ServiceBackend(HardwareBackend):
+    """Backend that reads and writes the hardware through a running daemon
+    
+    Current settings come from the daemon's published properties, so
+    reading them costs one bus round trip and no tool invocation. Writes
+    go through the daemon's Set methods, which makes it notify every
+    other client.
+    """
+    
+    name = 'service'
+    
+    def __init__(self, connection, bus_name: str = DAEMON_BUS_NAME):
+        self.connection = connection
+        self.bus_name = bus_name
+        self.remote = RemoteController(connection, bus_name)
+        
+    def get_property(self, name: str) -> Any:
+        """Read a published property, or None while it is unknown"""
+        from gi.repository import Gio, GLib
+        
+        try:
+            reply = self.connection.call_sync(
+                self.bus_name, CONTROLLER_PATH, PROPERTIES_INTERFACE, 'Get',
+                GLib.Variant('(ss)', (CONTROLLER_INTERFACE, name)),
+                GLib.VariantType.new('(v)'), Gio.DBusCallFlags.NO_AUTO_START, CALL_TIMEOUT_MS, None
+            )
+        except GLib.Error as e:
+            raise RemoteError(e.message) from e
+        value = reply.unpack()[0]
+        return None if value == PROPERTIES[name][2] else value
+        
+    def write(self, key: str, value: Any) -> Tuple[bool, str]:
+        """Write a setting through the daemon"""
+        try:
+            return self.remote.call_raw(SETTING_METHODS[key], value)
+        except RemoteError as e:
+            return False, str(e)
+            
+    def get_cpu_profiles(self) -> List[str]:
+        """Get available CPU profiles"""
+        return self.remote.call('get_cpu_profiles')
+        
+    def get_current_cpu_profile(self) -> Optional[str]:
+        """Get current CPU profile"""
+        try:
+            return self.get_property('CpuProfile')
+        except RemoteError as e:
+            logger.error(f"Failed to read CPU profile from the daemon: {e}")
+            return None
+            
+    def set_cpu_profile(self, profile: str) -> Tuple[bool, str]:
+        """Set CPU profile"""
+        return self.write('cpu_profile', profile)
+        
+    def get_gpu_modes(self) -> List[str]:
+        """Get available GPU modes"""
+        return self.remote.call('get_gpu_modes')
+        
+    def get_current_gpu_mode(self) -> Optional[str]:
+        """Get current GPU mode"""
+        try:
+            return self.get_property('GpuMode')
+        except RemoteError as e:
+            logger.error(f"Failed to read GPU mode from the daemon: {e}")
+            return None
+            
+    def set_gpu_mode(self, mode: str) -> Tuple[bool, str]:
+        """Set GPU mode"""
+        return self.write('gpu_mode', mode)
+        
+    def set_battery_charge_limit(self, limit: int) -> Tuple[bool, str]:
+        """Set battery charge limit"""
+        return self.write('charge_limit', limit)
+        
+    def watch(self, callback: Callable[[str, Any], None]) -> bool:
+        """Forward the daemon's PropertiesChanged signals"""
+        from gi.repository import Gio
+        
+        def on_properties_changed(connection, sender, path, interface, signal, parameters):
+            changed_interface, changed, invalidated = parameters.unpack()
+            if changed_interface != CONTROLLER_INTERFACE:
+                return
+            for name, value in changed.items():
+                key, _, unknown = PROPERTIES[name]
+                if name != 'Battery':
+                    callback(key, None if value == unknown else value)
+                    
+        self.connection.signal_subscribe(
+            self.bus_name, PROPERTIES_INTERFACE, 'PropertiesChanged', CONTROLLER_PATH,
+            None, Gio.DBusSignalFlags.NONE, on_properties_changed
+        )
+        return True
+
+
+class DaemonBus:
+    """Own DAEMON_BUS_NAME and serve a controller from its own thread
+    
+    The policy daemon's loop is select()-based, so the bus is handled by
+    a GLib main loop on a separate thread. Backend change notifications
+    are delivered on that loop too.
+    """
+    
+    def __init__(self, controller):
+        self.controller = controller
+        self.service = ControllerService(controller)
+        self.error: Optional[str] = None
+        self._loop = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        
+    def start(self) -> bool:
+        """Start serving; return False (see error) if the name can't be owned"""
+        self._thread = threading.Thread(target=self.run, name='w-helper-bus', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            self._thread.join()
+            self._thread = None
+            return False
+        return True
+        
+    def stop(self):
+        """Release the name and stop the loop"""
+        if self._thread is None:
+            return
+        self._loop.quit()
+        self._thread.join()
+        self._thread = None
+        
+    def run(self):
+        """Bus thread"""
+        try:
+            from gi.repository import Gio, GLib
+        except ImportError as e:
+            self.error = f"PyGObject is not available ({e})"
+            self._ready.set()
+            return
+            
+        context = GLib.MainContext.new()
+        # Objects and signal subscriptions dispatch to the context that is
+        # the thread default when they are registered
+        context.push_thread_default()
+        self._loop = GLib.MainLoop.new(context, False)
+        owner_id = 0
+        try:
+            try:
+                connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            except GLib.Error as e:
+                self.error = e.message
+                return
+            if not self.service.register(connection):
+                self.error = "Failed to export the controller"
+                return
+            self.controller.watch_backend()
+            # Clients see real values as soon as they can see the name
+            self.service.refresh()
+            self.service.start()
+            owner_id = Gio.bus_own_name_on_connection(
+                connection, DAEMON_BUS_NAME, Gio.BusNameOwnerFlags.DO_NOT_QUEUE,
+                self.on_name_acquired, self.on_name_lost
+            )
+            self._loop.run()
+        finally:
+            if owner_id:
+                Gio.bus_unown_name(owner_id)
+            self.service.unregister()
+            remove_instance()
+            context.pop_thread_default()
+            self._ready.set()
+            
+    def on_name_acquired(self, connection, name):
+        """Announce the daemon once clients can reach it"""
+        logger.info(f"Serving {name} on the session bus")
+        write_instance(name, 'daemon')
+        self._ready.set()
+        
+    def on_name_lost(self, connection, name):
+        """Give up if another daemon has the name or the bus went away"""
+        if not self._ready.is_set():
+            self.error = f"{name} is already owned by another daemon"
+        else:
+            logger.warning(f"Lost {name} on the session bus")
+        self._loop.quit()
+
+
+def connect_service_backend() -> Optional[ServiceBackend]:
+    """Return a backend using the running daemon, or None if there is none"""
+    if os.environ.get(REMOTE_ENV) == '0':
+        return None
+    instance = read_instance()
+    if instance is None or instance.get('kind') != 'daemon' or instance['pid'] == os.getpid():
+        return None
+    try:
+        from gi.repository import Gio
+        connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        backend = ServiceBackend(connection, instance['bus_name'])
+        # Also proves the daemon still answers
+        backend.get_property('CpuProfile')
+    except Exception as e:
+        logger.debug(f"Daemon not reachable, using the hardware directly: {e}")
+        return None
+    logger.debug(f"Using the daemon's controller (pid {instance['pid']})")
+    return backend
@@ -0,0 +1,80 @@
+"""
+GUI startup latency measurement
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TRACE_ENV = 'W_HELPER_STARTUP_TRACE'
+
+
+def process_age() -> float:
+    """Return seconds since this process was started, or 0 if unknown"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Fields after the command name; starttime is field 22 overall
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimer:
+    """Record named startup milestones relative to process start
+    
+    Once every expected mark has been recorded the timings are logged,
+    passed to the registered listeners and, if W_HELPER_STARTUP_TRACE
+    names a file, written there as JSON (milliseconds).
+    """
+    
+    def __init__(self, expected: Iterable[str] = ()):
+        self.origin = time.monotonic() - process_age()
+        self.marks: Dict[str, float] = OrderedDict()
+        self.expected = set(expected)
+        self.listeners: List[Callable[[Dict[str, float]], None]] = []
+        self.reported = False
+        
+    def expect(self, *names: str):
+        """Add marks that must be recorded before startup is complete"""
+        self.expected.update(names)
+        
+    def mark(self, name: str):
+        """Record a milestone (only the first occurrence counts)"""
+        if name in self.marks:
+            return
+        self.marks[name] = time.monotonic() - self.origin
+        logger.debug(f"Startup mark {name}: {self.marks[name] * 1000:.1f} ms")
+        
+        if not self.reported and self.expected.issubset(self.marks):
+            self.reported = True
+            self.report()
+            
+    def timings_ms(self) -> Dict[str, float]:
+        """Return recorded marks in milliseconds"""
+        return OrderedDict((name, round(value * 1000, 3)) for name, value in self.marks.items())
+        
+    def report(self, trace_file: Optional[str] = None):
+        """Log the timings and notify listeners"""
+        timings = self.timings_ms()
+        summary = ', '.join(f"{name} {value:.0f} ms" for name, value in timings.items())
+        logger.info(f"Startup timings: {summary}")
+        
+        trace_file = trace_file or os.environ.get(STARTUP_TRACE_ENV)
+        if trace_file:
+            try:
+                with open(trace_file, 'w') as f:
+                    json.dump(timings, f, indent=2)
+            except OSError as e:
+                logger.warning(f"Failed to write startup trace: {e}")
+                
+        for listener in self.listeners:
+            listener(timings)
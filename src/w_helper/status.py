@@ -0,0 +1,129 @@
+"""
+Concurrent collection of the system status shown by `w-helper status`
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+DEFAULT_PROBE_TIMEOUT = 5.0
+DEFAULT_WATCH_INTERVAL = 5.0
+
+# (key, label, controller getter) in display order
+STATUS_PROBES: List[Tuple[str, str, str]] = [
+    ('cpu_profile', 'CPU Profile', 'get_current_cpu_profile'),
+    ('gpu_mode', 'GPU Mode', 'get_current_gpu_mode'),
+    ('refresh_rate', 'Refresh Rate', 'get_current_refresh_rate'),
+    ('battery', 'Battery', 'get_battery_info'),
+    ('charge_limit', 'Charge Limit', 'get_battery_charge_limit'),
+]
+
+
+class ProbeResult(NamedTuple):
+    """Outcome of a single status probe"""
+    value: Any
+    error: Optional[str]
+    duration: float
+
+
+def _run_probe(func: Callable[[], Any], results: Dict[str, ProbeResult], key: str):
+    """Run a probe and store its result"""
+    start = time.monotonic()
+    try:
+        value = func()
+        results[key] = ProbeResult(value, None, time.monotonic() - start)
+    except Exception as e:
+        results[key] = ProbeResult(None, str(e), time.monotonic() - start)
+
+
+def collect_status(controller, timeout: float = DEFAULT_PROBE_TIMEOUT,
+                   probes: Optional[List[Tuple[str, str, str]]] = None) -> Dict[str, ProbeResult]:
+    """Run all status probes concurrently and return results in probe order
+    
+    Probes run on daemon threads so a hung daemon can't keep the process
+    alive; a probe that hasn't finished within `timeout` seconds is
+    reported as an error and abandoned.
+    """
+    probes = probes if probes is not None else STATUS_PROBES
+    results: Dict[str, ProbeResult] = {}
+    threads = []
+    
+    start = time.monotonic()
+    for key, label, getter in probes:
+        thread = threading.Thread(
+            target=_run_probe,
+            args=(getattr(controller, getter), results, key),
+            name=f"w-helper-probe-{key}",
+            daemon=True
+        )
+        thread.start()
+        threads.append((key, thread))
+        
+    deadline = start + timeout
+    ordered = OrderedDict()
+    for key, thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if key in results:
+            ordered[key] = results[key]
+        else:
+            ordered[key] = ProbeResult(None, f"timed out after {timeout:g}s", time.monotonic() - start)
+            
+    return ordered
+
+
+def status_record(results: Dict[str, ProbeResult]) -> Dict[str, Any]:
+    """Convert probe results into a JSON-serializable record
+    
+    Failed probes have a null value and their message under "errors".
+    """
+    record: Dict[str, Any] = OrderedDict()
+    record['timestamp'] = time.time()
+    errors = {}
+    for key, result in results.items():
+        record[key] = result.value
+        if result.error is not None:
+            errors[key] = result.error
+    if errors:
+        record['errors'] = errors
+    return record
+
+
+def changed_fields(previous: Optional[Dict[str, Any]], record: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the fields of a record that differ from the previous one
+    
+    The timestamp is always included. Fields that disappeared (such as an
+    "errors" entry that cleared up) are reported as null.
+    """
+    if previous is None:
+        return record
+        
+    changes: Dict[str, Any] = OrderedDict()
+    changes['timestamp'] = record['timestamp']
+    for key, value in record.items():
+        if key != 'timestamp' and previous.get(key) != value:
+            changes[key] = value
+    for key in previous:
+        if key not in record:
+            changes[key] = None
+    return changes
+
+
+def watch_status(controller, interval: float = DEFAULT_WATCH_INTERVAL,
+                 timeout: float = DEFAULT_PROBE_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """Collect status every `interval` seconds, yielding only what changed
+    
+    The first record is complete; later ones carry the timestamp plus the
+    fields that changed, and ticks where nothing changed yield nothing.
+    """
+    previous = None
+    next_tick = time.monotonic()
+    while True:
+        record = status_record(collect_status(controller, timeout=timeout))
+        changes = changed_fields(previous, record)
+        if len(changes) > 1:
+            yield changes
+        previous = record
+        
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.monotonic()))
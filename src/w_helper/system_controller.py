@@ -1,32 +1,156 @@
+import importlib.util
 import json
-import subprocess
 import logging
-import re
 import os
-from typing import List, Dict, Optional, Tuple
-from gi.repository import GObject
+import threading
+from typing import Any, Callable, List, Dict, NamedTuple, Optional, Tuple
 
-try:
-    from pydbus import SessionBus
-    PYDBUS_AVAILABLE = True
-except ImportError:
-    PYDBUS_AVAILABLE = False
+from .backends import HardwareBackend, create_backend
+from .cache import PERMANENT, StateCache
+from .coalesce import WriteCoalescer
+from .commands import CommandResult, CommandRunner
+from .display import (APPLY_PERSISTENT, APPLY_TEMPORARY, DisplayConfigClient, Monitor,
+                      build_mode_config, build_refresh_rate_config)
+from .instrument import timed
+from .power_supply import PowerSnapshot, PowerSupplyReader
+from .runtime import RuntimeEstimate, RuntimeEstimator
+from .tasks import TaskRunner
+from .tools import ToolResolver, default_cache_file
+
+# Only check for pydbus here: importing it pulls in GObject introspection,
+# which CLI commands that never touch D-Bus shouldn't pay for
+PYDBUS_AVAILABLE = importlib.util.find_spec('pydbus') is not None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Settings apply_state() handles, in the order they are written. The
+# charge limit and CPU profile take effect immediately; a GPU mode switch
+# may need a logout, so it goes last and is the least likely to need
+# rolling back.
+STATE_KEYS = ('charge_limit', 'cpu_profile', 'gpu_mode')
+STATE_LABELS = {
+    'charge_limit': 'charge limit',
+    'cpu_profile': 'CPU profile',
+    'gpu_mode': 'GPU mode',
+}
+# Setting -> (status type, message when written, message when the write failed)
+SETTING_STATUS = {
+    'charge_limit': ('battery', 'Battery charge limit set to {}%', 'Failed to set battery limit: {}'),
+    'cpu_profile': ('cpu', 'CPU profile set to {}', 'Failed to set CPU profile: {}'),
+    'gpu_mode': ('gpu', 'GPU mode set to {} (restart may be required)', 'Failed to set GPU mode: {}'),
+}
+
+
+class ApplyResult(NamedTuple):
+    """Outcome of SystemController.apply_state()"""
+    success: bool
+    # Settings that were written and kept
+    changed: Dict[str, Any]
+    # Settings that already had the desired value
+    unchanged: List[str]
+    # Setting whose write failed, and the error
+    failed: Optional[str]
+    error: Optional[str]
+    # Settings restored to their previous value after the failure
+    rolled_back: List[str]
+    message: str
+
 
-class SystemController(GObject.Object):
-    """Controller for system hardware interactions"""
+class SystemController:
+    """Controller for system hardware interactions
     
-    __gsignals__ = {
-        'status-changed': (GObject.SignalFlags.RUN_FIRST, None, (str, str, bool))
-    }
+    The controller has no GObject dependency. Handlers connected with
+    connect() are called as handler(controller, *args); the GUI wraps the
+    controller in a GObject emitter (see gobject_controller.py).
     
-    def __init__(self):
-        super().__init__()
+    'status-changed' (type, message, success) reports the outcome of user
+    actions; 'state-changed' (key, value) fires whenever a setting in
+    STATE_KEYS is known to have a new value, whoever changed it.
+    """
+    
+    SIGNALS = ('status-changed', 'state-changed')
+    
+    def __init__(self, tools: Optional[ToolResolver] = None, backend: Optional[HardwareBackend] = None,
+                 sysfs_root: Optional[str] = None, local: bool = False):
+        self._handlers: Dict[int, Tuple[str, Callable, tuple]] = {}
+        self._next_handler_id = 1
+        self.tools = tools if tools is not None else self.create_tool_resolver()
+        self.commands = CommandRunner(self.tools)
+        if backend is None:
+            backend = create_backend(self.run_command, local=local)
+        self.backend = backend
+        logger.debug(f"Using {self.backend.name} hardware backend")
+        self._display = None
+        self._display_lock = threading.Lock()
+        self.power = PowerSupplyReader(sysfs_root)
+        self.cache = StateCache()
+        self.runtime = RuntimeEstimator()
+        self.tasks = TaskRunner()
+        self.writes = WriteCoalescer(self.run_async)
+        self.writes.register('charge_limit', self.set_battery_charge_limit)
         self.check_system_requirements()
         
+    def connect(self, signal: str, callback: Callable, *args) -> int:
+        """Connect a handler to a signal and return its handler ID"""
+        if signal not in self.SIGNALS:
+            raise ValueError(f"Unknown signal: {signal}")
+            
+        handler_id = self._next_handler_id
+        self._next_handler_id += 1
+        self._handlers[handler_id] = (signal, callback, args)
+        return handler_id
+        
+    def disconnect(self, handler_id: int):
+        """Disconnect a signal handler"""
+        self._handlers.pop(handler_id, None)
+        
+    def emit(self, signal: str, *args):
+        """Call every handler connected to a signal"""
+        for handler_signal, callback, extra_args in list(self._handlers.values()):
+            if handler_signal == signal:
+                try:
+                    callback(self, *args, *extra_args)
+                except Exception:
+                    logger.exception(f"Error in {signal} handler")
+                
+    def run_async(self, func: Callable, *args, callback: Optional[Callable] = None,
+                  error_callback: Optional[Callable] = None, queue: Optional[str] = None):
+        """Run a blocking call on a worker thread (see TaskRunner.submit)"""
+        return self.tasks.submit(func, *args, callback=callback,
+                                 error_callback=error_callback, queue=queue)
+        
+    def watch_backend(self) -> bool:
+        """Keep cached state in sync with changes made by other programs
+        
+        Uses the backend's change notifications, which need a GLib main
+        loop; without them cached values simply expire after their TTL.
+        """
+        return self.backend.watch(self.on_backend_changed)
+        
+    def on_backend_changed(self, key: str, value):
+        """Update the cache from a daemon change notification"""
+        logger.debug(f"{key} changed externally: {value}")
+        if value is None:
+            self.cache.invalidate(key)
+        else:
+            self.cache.set(key, value)
+            self.emit('state-changed', key, value)
+            
+    def get_cache_stats(self) -> Dict:
+        """Return state cache hit/miss counters"""
+        return self.cache.stats()
+        
+    @staticmethod
+    def create_tool_resolver() -> ToolResolver:
+        """Create the tool resolver, persisting lookups if W_HELPER_TOOL_CACHE is set"""
+        cache_setting = os.environ.get('W_HELPER_TOOL_CACHE', '')
+        if cache_setting in ('', '0'):
+            return ToolResolver()
+        if cache_setting == '1':
+            return ToolResolver(cache_file=default_cache_file())
+        return ToolResolver(cache_file=cache_setting)
+        
     def check_system_requirements(self):
         """Check if required system utilities are available"""
         required_tools = {
@@ -35,227 +159,346 @@ class SystemController(GObject.Object):
             'xrandr': 'X11 display configuration',
         }
         
-        missing_tools = []
-        for tool, description in required_tools.items():
-            if not self.command_exists(tool):
-                missing_tools.append(f"{tool} ({description})")
+        missing_tools = [
+            f"{tool} ({required_tools[tool]})"
+            for tool in self.tools.missing(required_tools)
+        ]
                 
         if missing_tools:
             logger.warning(f"Missing tools: {', '.join(missing_tools)}")
             
     def command_exists(self, command: str) -> bool:
         """Check if a command exists in PATH"""
-        try:
-            subprocess.run(['which', command], check=True, 
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+        return self.tools.exists(command)
             
     def run_command(self, command: List[str], require_success: bool = True) -> Tuple[bool, str]:
-        """Run a system command and return success status and output"""
-        try:
-            result = subprocess.run(
-                command,
-                capture_output=True,    
-                text=True,
-                check=require_success
-            )
+        """Run a system command and return success status and output
+        
+        With require_success=False a non-zero exit status still counts as
+        success; timeouts and commands that can't be started never do.
+        """
+        result = self.execute(command)
+        if result.ok or (not require_success and result.returncode is not None):
             return True, result.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.strip() if e.stderr else str(e)
-            logger.error(f"Command failed: {' '.join(command)}: {error_msg}")
-            return False, error_msg
-        except FileNotFoundError:
-            error_msg = f"Command not found: {command[0]}"
-            logger.error(error_msg)
-            return False, error_msg
+        logger.error(f"Command failed: {' '.join(command)}: {result.message}")
+        return False, result.message
+        
+    def execute(self, command: List[str], timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> CommandResult:
+        """Run a system command through the managed runner (see CommandRunner.run)"""
+        return self.commands.run(command, timeout=timeout, cancel=cancel)
+        
+    def cancel_commands(self):
+        """Stop all running tool invocations"""
+        self.commands.cancel_all()
             
     # CPU Profile Methods
+    @timed('controller')
     def get_cpu_profiles(self) -> List[str]:
-        """Get available CPU profiles"""
-        success, output = self.run_command(['asusctl', 'profile', '-l'], False)
-        if not success:
-            raise RuntimeError(f"Failed to get CPU profiles: {output}")
-            
-        profiles = []
-        for line in output.split('\n'):
-            line = line.strip()
-            if line and 'Starting' not in line:
-                profiles.append(line)
-        
-        if not profiles:
-            raise RuntimeError(f"No CPU profiles found in output: {repr(output)}")
-            
-        return profiles
+        """Get available CPU profiles (read once per process)"""
+        return list(self.cache.get('cpu_profiles', self.backend.get_cpu_profiles, ttl=PERMANENT))
         
+    @timed('controller')
     def get_current_cpu_profile(self) -> Optional[str]:
         """Get current CPU profile"""
-        success, output = self.run_command(['asusctl', 'profile', '-p'], False)
-        if not success:
-            return None
-            
-        # Parse output to find current profile
-        match = re.search(r'Active profile is\s*(\w+)', output)
-        if match:
-            return match.group(1)
-        return None
+        return self.cache.get('cpu_profile', self.backend.get_current_cpu_profile)
         
+    @timed('controller')
     def set_cpu_profile(self, profile: str) -> bool:
         """Set CPU profile"""
-        success, output = self.run_command(['asusctl', 'profile', '-P', profile], False)
-        
-        if success:
-            self.emit('status-changed', 'cpu', f'CPU profile set to {profile}', True)
-        else:
-            self.emit('status-changed', 'cpu', f'Failed to set CPU profile: {output}', False)
-            
-        return success
+        return self.set_setting('cpu_profile', profile)[0]
         
+    @timed('controller')
     def get_gpu_modes(self) -> List[str]:
-        """Get available GPU modes"""
-        success, output = self.run_command(['supergfxctl', '-s'], False)
-        if not success:
-            raise RuntimeError(f"Failed to run 'supergfxctl -s': {output}")
-    
-        # Parse the output - it can be in different formats
-        modes = []
-        
-        # Check if output looks like a list format: [Mode1, Mode2, Mode3]
-        if output.startswith('[') and output.endswith(']'):
-            # Remove brackets and split by comma
-            content = output[1:-1]
-            for item in content.split(','):
-                mode = item.strip()
-                if mode:
-                    modes.append(mode)
-        else:
-            # Parse line by line for text format
-            for line in output.split('\n'):
-                line = line.strip()
-                if line and not line.startswith('Available') and not line.startswith('Current'):
-                    modes.append(line)
-    
-        if not modes:
-            raise RuntimeError(f"No GPU modes found in supergfxctl output: {repr(output)}")
-    
-        return modes
+        """Get available GPU modes (read once per process)"""
+        return list(self.cache.get('gpu_modes', self.backend.get_gpu_modes, ttl=PERMANENT))
         
+    @timed('controller')
     def get_current_gpu_mode(self) -> Optional[str]:
         """Get current GPU mode"""
-        success, output = self.run_command(['supergfxctl', '--get'], False)
-        if not success:
-            return None
-        return output.strip()
+        return self.cache.get('gpu_mode', self.backend.get_current_gpu_mode)
         
+    @timed('controller')
     def set_gpu_mode(self, mode: str) -> bool:
         """Set GPU mode"""
-        success, output = self.run_command(['supergfxctl', '-m', mode], False)
-        
-        if success:
-            self.emit('status-changed', 'gpu', f'GPU mode set to {mode} (restart may be required)', True)
-        else:
-            self.emit('status-changed', 'gpu', f'Failed to set GPU mode: {output}', False)
-            
-        return success
+        return self.set_setting('gpu_mode', mode)[0]
         
     # Display Methods
-    def get_available_refresh_rates(self) -> List[str]:
-        """Get available refresh rates using GNOME DisplayConfig D-Bus interface"""
+    @property
+    def display(self) -> DisplayConfigClient:
+        """Shared DisplayConfig client, created on first use"""
+        with self._display_lock:
+            if self._display is None:
+                self._display = DisplayConfigClient()
+            return self._display
+            
+    @timed('controller')
+    def get_monitors(self) -> List[Monitor]:
+        """Get every monitor with its mode table"""
         if not PYDBUS_AVAILABLE:
             raise RuntimeError("pydbus is required for display configuration")
             
         try:
-            bus = SessionBus()
-            display_config = bus.get("org.gnome.Mutter.DisplayConfig")
-            
-            # Get current display config
-            serial, monitors, logical_monitors, properties = display_config.GetCurrentState()
+            return self.display.get_current_state().monitors
+        except Exception as e:
+            raise RuntimeError(f"Failed to get monitors via D-Bus: {e}")
             
-            rates = set()
-            for monitor in monitors:
-                for mode in monitor[1]:  # modes are in the second element
-                    refresh = mode[3]  # refresh rate is at index 3
-                    rates.add(str(int(refresh)))
+    @timed('controller')
+    def get_available_refresh_rates(self) -> List[str]:
+        """Get the refresh rates enabled monitors offer at their current resolution"""
+        rates = {}
+        for monitor in self.get_monitors():
+            if monitor.enabled:
+                for mode in monitor.modes_at(*monitor.current.resolution):
+                    rates[mode.label] = mode.refresh
                     
-            if not rates:
-                raise RuntimeError("No refresh rates found")
-                
-            return sorted(list(rates))
+        if not rates:
+            raise RuntimeError("No refresh rates found")
             
-        except Exception as e:
-            raise RuntimeError(f"Failed to get refresh rates via D-Bus: {e}")
+        return sorted(rates, key=rates.get)
         
+    @timed('controller')
     def get_current_refresh_rate(self) -> Optional[str]:
-        """Get current refresh rate using GNOME DisplayConfig D-Bus interface"""
+        """Get the primary monitor's current refresh rate"""
         if not PYDBUS_AVAILABLE:
             return None
             
         try:
-            bus = SessionBus()
-            display_config = bus.get("org.gnome.Mutter.DisplayConfig")
-            
-            # Get current display config
-            serial, monitors, logical_monitors, properties = display_config.GetCurrentState()
-            
-            # Find the current mode for the primary monitor
-            for monitor in monitors:
-                for mode in monitor[1]:  # modes
-                    if len(mode) > 6 and isinstance(mode[6], dict) and mode[6].get('is-current', False):
-                        refresh = mode[3]  # refresh rate is at index 3
-                        return str(int(refresh))
-            
-            return None
-            
+            monitor = self.display.get_current_state().primary
         except Exception as e:
             logger.error(f"Failed to get current refresh rate: {e}")
             return None
+            
+        return monitor.current.label if monitor is not None else None
+        
+    @timed('controller')
+    def set_refresh_rate(self, rate: str, persistent: bool = False) -> bool:
+        """Set refresh rate using GNOME DisplayConfig D-Bus interface
         
-    def set_refresh_rate(self, rate: str) -> bool:
-        """Set refresh rate using GNOME DisplayConfig D-Bus interface"""
+        Every enabled monitor that has a mode with this rate at its
+        current resolution switches to it; the layout and scale are kept.
+        A temporary change lasts until the session ends, a persistent one
+        is saved (and GNOME Shell asks the user to keep it).
+        """
         if not PYDBUS_AVAILABLE:
             self.emit('status-changed', 'display', 'pydbus is required for display configuration', False)
             return False
             
-        self.emit('status-changed', 'display', 
-                 f'Refresh rate setting to {rate}Hz is not yet implemented. '
-                 f'Please use your system settings.', False)
-        return False
+        try:
+            requested = float(rate)
+            self.apply_display_config(lambda state: build_refresh_rate_config(state, requested), persistent)
+        except Exception as e:
+            logger.error(f"Failed to set refresh rate: {e}")
+            self.emit('status-changed', 'display', f'Failed to set refresh rate: {e}', False)
+            return False
+            
+        self.emit('status-changed', 'display', f'Refresh rate set to {rate}Hz', True)
+        return True
+        
+    @timed('controller')
+    def set_monitor_refresh_rates(self, rates: Dict[str, float], persistent: bool = False) -> List[str]:
+        """Switch monitors (by connector) to their own rates in one request
         
+        Returns the connectors that changed mode; when every monitor
+        already runs at its rate nothing is sent. Raises on failure.
+        """
+        if not PYDBUS_AVAILABLE:
+            raise RuntimeError("pydbus is required for display configuration")
+            
+        return self.apply_display_config(lambda state: build_mode_config(state, rates), persistent)
+        
+    def apply_display_config(self, build: Callable, persistent: bool = False) -> List[str]:
+        """Apply build(DisplayState) -> (serial, logical monitors, changed connectors)
+        
+        Nothing is sent if no monitor changes. The request is rebuilt once
+        if the cached state went stale before MonitorsChanged arrived.
+        """
+        method = APPLY_PERSISTENT if persistent else APPLY_TEMPORARY
+        for attempt in range(2):
+            serial, config, changed = build(self.display.get_current_state())
+            if not changed:
+                return changed
+            try:
+                self.display.apply_monitors_config(serial, method, config)
+                return changed
+            except Exception as e:
+                if attempt or self.display.get_current_state().serial == serial:
+                    raise
+                logger.debug(f"Display state changed under us, retrying: {e}")
+                
     # Battery Methods
+    @timed('controller')
+    def get_power_snapshot(self) -> PowerSnapshot:
+        """Read all batteries and AC adapters"""
+        return self.power.snapshot()
+        
+    @timed('controller')
     def get_battery_charge_limit(self) -> Optional[int]:
         """Get current battery charge limit"""
+        battery = self.power.primary_battery
+        if battery is None:
+            return None
+            
+        value = self.power.read(battery, 'charge_control_end_threshold')
         try:
-            with open('/sys/class/power_supply/BAT0/charge_control_end_threshold', 'r') as f:
-                return int(f.read().strip())
-        except Exception as e:
-            logger.error(f"Failed to read charge limit: {e}")
+            limit = int(value)
+        except (TypeError, ValueError):
+            path = os.path.join(self.power.root, battery, 'charge_control_end_threshold')
+            logger.error(f"Failed to read charge limit from {path}")
             return None
+            
+        self.writes.set_known('charge_limit', limit)
+        return limit
         
+    @timed('controller')
     def set_battery_charge_limit(self, limit: int) -> bool:
         """Set battery charge limit"""
-        success, output = self.run_command(['asusctl', '-c', str(limit)], False)
+        return self.set_setting('charge_limit', limit)[0]
+        
+    @timed('controller')
+    def get_battery_info(self) -> Dict[str, str]:
+        """Get battery information"""
+        info = {}
+        
+        battery = self.get_power_snapshot().battery
+        if battery is None:
+            return info
+            
+        if battery.capacity is not None:
+            info['capacity'] = f"{battery.capacity}%"
+        if battery.status is not None:
+            info['status'] = battery.status
+        if battery.power_now is not None:
+            info['power'] = f"{battery.power_now / 1000000:.1f} W"
+        if battery.energy_now is not None:
+            info['energy'] = f"{battery.energy_now / 1000000:.1f} Wh"
+        if battery.voltage_now is not None:
+            info['voltage'] = f"{battery.voltage_now / 1000000:.2f} V"
+        if battery.cycle_count is not None:
+            info['cycle_count'] = str(battery.cycle_count)
+        if battery.health is not None:
+            info['health'] = f"{battery.health:.0f}%"
+            
+        return info
+        
+    @timed('controller')
+    def get_runtime_estimate(self) -> Optional[RuntimeEstimate]:
+        """Estimate the remaining battery runtime, or None unless discharging"""
+        battery = self.get_power_snapshot().battery
+        if battery is None or battery.status != 'Discharging' or battery.energy_now is None:
+            return None
+            
+        return self.runtime.estimate(battery.energy_now, battery.power_now,
+                                     self.get_current_cpu_profile(), self.get_current_gpu_mode())
+        
+    # State Methods
+    def get_state(self, keys=STATE_KEYS) -> Dict[str, Any]:
+        """Read the current value of several settings"""
+        getters = {
+            'charge_limit': self.get_battery_charge_limit,
+            'cpu_profile': self.get_current_cpu_profile,
+            'gpu_mode': self.get_current_gpu_mode,
+        }
+        return {key: getters[key]() for key in keys}
+        
+    def set_setting(self, key: str, value: Any) -> Tuple[bool, str]:
+        """Write one setting and report the outcome with 'status-changed'"""
+        success, output = self.write_setting(key, value)
+        status_type, written, failed = SETTING_STATUS[key]
         
         if success:
-            self.emit('status-changed', 'battery', f'Battery charge limit set to {limit}%', True)
+            self.emit('status-changed', status_type, written.format(value), True)
         else:
-            self.emit('status-changed', 'battery', f'Failed to set battery limit: {output}', False)
+            self.emit('status-changed', status_type, failed.format(output), False)
             
-        return success
+        return success, output
         
-    def get_battery_info(self) -> Dict[str, str]:
-        """Get battery information"""
-        info = {}
+    def write_setting(self, key: str, value: Any) -> Tuple[bool, str]:
+        """Write one setting through the backend without emitting a signal"""
+        if key == 'charge_limit':
+            success, output = self.backend.set_battery_charge_limit(value)
+            if success:
+                self.writes.set_known('charge_limit', value)
+        elif key == 'cpu_profile':
+            success, output = self.backend.set_cpu_profile(value)
+        elif key == 'gpu_mode':
+            success, output = self.backend.set_gpu_mode(value)
+        else:
+            raise ValueError(f"Unknown setting: {key}")
+            
+        if success:
+            self.cache.set(key, value)
+            self.emit('state-changed', key, value)
+        else:
+            # The hardware may be in any state after a failed write
+            self.cache.invalidate(key)
+        return success, output
         
-        # Try to get battery info from power supply
-        battery_path = '/sys/class/power_supply/BAT0'
-        if os.path.exists(battery_path):
-            try:
-                with open(f'{battery_path}/capacity', 'r') as f:
-                    info['capacity'] = f.read().strip() + '%'
-                with open(f'{battery_path}/status', 'r') as f:
-                    info['status'] = f.read().strip()
-            except Exception as e:
-                logger.warning(f"Failed to read battery info: {e}")
-                
-        return info 
\ No newline at end of file
+    def diff_state(self, desired: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return (current, changes) for the settings in desired, in apply order"""
+        unknown = set(desired) - set(STATE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+            
+        current = self.get_state([key for key in STATE_KEYS if key in desired])
+        changes = {key: desired[key] for key in current if current[key] != desired[key]}
+        return current, changes
+        
+    @timed('controller')
+    def apply_state(self, desired: Dict[str, Any]) -> ApplyResult:
+        """Bring several settings to the desired values as one transaction
+        
+        Only settings that differ from the hardware are written, in
+        STATE_KEYS order. If a write fails, the settings already written
+        are restored to their previous values in reverse order. A single
+        'preset' status-changed signal reports the outcome.
+        """
+        current, changes = self.diff_state(desired)
+        unchanged = [key for key in current if key not in changes]
+        
+        applied = []
+        failed = None
+        error = None
+        for key, value in changes.items():
+            success, output = self.write_setting(key, value)
+            if not success:
+                failed, error = key, output
+                break
+            applied.append(key)
+            
+        rolled_back = []
+        if failed is not None:
+            for key in reversed(applied):
+                previous = current[key]
+                if previous is None:
+                    logger.error(f"Cannot roll back {key}: previous value unknown")
+                    continue
+                success, output = self.write_setting(key, previous)
+                if success:
+                    rolled_back.append(key)
+                else:
+                    logger.error(f"Failed to roll back {key} to {previous}: {output}")
+                    
+        kept = {key: changes[key] for key in applied if key not in rolled_back}
+        if failed is not None:
+            message = f"Failed to set {STATE_LABELS[failed]}: {error}"
+            if rolled_back:
+                message += f"; restored {', '.join(STATE_LABELS[key] for key in rolled_back)}"
+        elif kept:
+            message = "Set " + ', '.join(f"{STATE_LABELS[key]} to {value}" for key, value in kept.items())
+            if 'gpu_mode' in kept:
+                message += " (restart may be required)"
+        else:
+            message = "Settings already applied"
+            
+        result = ApplyResult(
+            success=failed is None,
+            changed=kept,
+            unchanged=unchanged,
+            failed=failed,
+            error=error,
+            rolled_back=rolled_back,
+            message=message,
+        )
+        self.emit('status-changed', 'preset', message, result.success)
+        return result
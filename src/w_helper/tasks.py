@@ -0,0 +1,88 @@
+"""
+Background execution of blocking controller calls
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+
+def call_directly(func: Callable, *args):
+    """Default dispatcher: run completion callbacks on the worker thread"""
+    func(*args)
+
+
+class TaskRunner:
+    """Run blocking calls on worker threads and report back via a dispatcher
+    
+    Completion callbacks are handed to `dispatch`, which the GUI replaces
+    with one that schedules them on the GLib main loop. Tasks submitted
+    with the same `queue` name run one at a time in submission order, so
+    writes to the same setting can't overtake each other.
+    """
+    
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, dispatch: Callable = call_directly):
+        self.max_workers = max_workers
+        self.dispatch = dispatch
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._queues: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        
+    def _executor(self, queue: Optional[str]) -> ThreadPoolExecutor:
+        """Return the executor for a queue, creating it on first use"""
+        with self._lock:
+            if queue is None:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='w-helper-task'
+                    )
+                return self._pool
+                
+            if queue not in self._queues:
+                self._queues[queue] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f'w-helper-{queue}'
+                )
+            return self._queues[queue]
+            
+    def submit(self, func: Callable, *args, callback: Optional[Callable[[Any], Any]] = None,
+               error_callback: Optional[Callable[[Exception], Any]] = None,
+               queue: Optional[str] = None) -> Future:
+        """Run func(*args) in the background
+        
+        callback(result) or error_callback(exception) is delivered through
+        the dispatcher when the call finishes. Errors without an
+        error_callback are logged.
+        """
+        future = self._executor(queue).submit(func, *args)
+        
+        def on_done(done: Future):
+            if done.cancelled():
+                return
+            error = done.exception()
+            if error is not None:
+                if error_callback is not None:
+                    self.dispatch(error_callback, error)
+                else:
+                    logger.error(f"Background call {getattr(func, '__name__', func)} failed: {error}")
+            elif callback is not None:
+                self.dispatch(callback, done.result())
+                
+        future.add_done_callback(on_done)
+        return future
+        
+    def shutdown(self, wait: bool = True):
+        """Stop accepting tasks and optionally wait for running ones"""
+        with self._lock:
+            executors = list(self._queues.values())
+            if self._pool is not None:
+                executors.append(self._pool)
+            self._pool = None
+            self._queues.clear()
+            
+        for executor in executors:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,143 @@
+"""
+In-process resolution of the external command line tools W-Helper drives
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+def default_cache_file() -> str:
+    """Return the default location of the persistent tool cache"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'w-helper', 'tools.json')
+
+
+class ToolResolver:
+    """Resolve tool names to absolute paths without forking `which`
+    
+    Lookups walk PATH inside the process and are cached for the lifetime
+    of the resolver. When a cache file is given, positive lookups are also
+    persisted there; the file is discarded when PATH changes and single
+    entries are dropped when the binary's mtime no longer matches.
+    """
+    
+    def __init__(self, search_path: Optional[str] = None, cache_file: Optional[str] = None):
+        self.search_path = search_path
+        self.cache_file = cache_file
+        self._paths: Dict[str, Optional[str]] = {}
+        self._persisted: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        
+        if self.cache_file:
+            self._load_cache()
+            
+    @property
+    def current_path(self) -> str:
+        """PATH used for lookups"""
+        if self.search_path is not None:
+            return self.search_path
+        return os.environ.get('PATH', os.defpath)
+        
+    def resolve(self, tool: str) -> Optional[str]:
+        """Return the absolute path of a tool, or None if it is not installed"""
+        if os.path.isabs(tool):
+            return tool
+            
+        with self._lock:
+            if tool in self._paths:
+                return self._paths[tool]
+                
+            path = self._lookup_persisted(tool)
+            if path is None:
+                path = shutil.which(tool, path=self.current_path)
+                if path is not None and self.cache_file:
+                    self._remember(tool, path)
+                    
+            self._paths[tool] = path
+            return path
+            
+    def exists(self, tool: str) -> bool:
+        """Check if a tool can be found in PATH"""
+        return self.resolve(tool) is not None
+        
+    def missing(self, tools: Iterable[str]) -> List[str]:
+        """Return the tools that cannot be found in PATH"""
+        return [tool for tool in tools if not self.exists(tool)]
+        
+    def invalidate(self, tool: Optional[str] = None):
+        """Forget a cached lookup, or all of them"""
+        with self._lock:
+            if tool is None:
+                self._paths.clear()
+                dropped = bool(self._persisted)
+                self._persisted.clear()
+            else:
+                self._paths.pop(tool, None)
+                dropped = self._persisted.pop(tool, None) is not None
+                
+            if dropped and self.cache_file:
+                self._save_cache()
+                
+    def _lookup_persisted(self, tool: str) -> Optional[str]:
+        """Return a persisted path if the binary is unchanged"""
+        entry = self._persisted.get(tool)
+        if not entry:
+            return None
+            
+        path, mtime_ns = entry
+        try:
+            if os.stat(path).st_mtime_ns == mtime_ns:
+                return path
+        except OSError:
+            pass
+            
+        del self._persisted[tool]
+        return None
+        
+    def _remember(self, tool: str, path: str):
+        """Persist a successful lookup"""
+        try:
+            self._persisted[tool] = [path, os.stat(path).st_mtime_ns]
+        except OSError:
+            return
+        self._save_cache()
+        
+    def _load_cache(self):
+        """Load persisted lookups, discarding them if PATH changed"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+            
+        if data.get('version') != CACHE_VERSION or data.get('path') != self.current_path:
+            logger.debug("Discarding stale tool cache")
+            return
+            
+        tools = data.get('tools')
+        if isinstance(tools, dict):
+            self._persisted = tools
+            
+    def _save_cache(self):
+        """Write persisted lookups atomically"""
+        data = {
+            'version': CACHE_VERSION,
+            'path': self.current_path,
+            'tools': self._persisted,
+        }
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.debug(f"Failed to write tool cache: {e}")
@@ -2,9 +2,12 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 
-from gi.repository import Gtk, Adw, GLib
+from gi.repository import Gtk, Adw
 import logging
 
+from ..power_monitor import PowerSupplyMonitor
+from ..runtime import format_duration
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +33,12 @@ class BatteryWidget(Adw.PreferencesGroup):
         
         self.add(self.info_row)
         
+        # Runtime estimate row, shown while discharging
+        self.runtime_row = Adw.ActionRow()
+        self.runtime_row.set_title("Estimated Runtime")
+        self.runtime_row.set_visible(False)
+        self.add(self.runtime_row)
+        
         # Charge limit row
         self.limit_row = Adw.ActionRow()
         self.limit_row.set_title("Charge Limit")
@@ -53,80 +62,151 @@ class BatteryWidget(Adw.PreferencesGroup):
         self.limit_row.add_suffix(self.limit_scale)
         self.add(self.limit_row)
         
-        # Load current state
-        self.load_battery_info()
-        self.load_charge_limit()
+        self.updating = False
+        
+        # Pushes battery changes once the initial state is loaded
+        self.power_monitor = PowerSupplyMonitor(self.read_battery_status, self.apply_battery_info)
+        # Estimates depend on the CPU profile and GPU mode
+        self.status_handler = self.system_controller.connect('status-changed', self.on_status_changed)
+        self.connect('destroy', self.on_destroy)
         
-    def load_battery_info(self):
-        """Load current battery information"""
-        try:
-            info = self.system_controller.get_battery_info()
+        # State is loaded by load_current_state() once the window is up
+        self.limit_scale.set_sensitive(False)
+        
+    def apply_battery_info(self, info):
+        """Show loaded battery information"""
+        if info:
+            capacity = info.get('capacity', 'Unknown')
+            status = info.get('status', 'Unknown')
             
-            if info:
-                capacity = info.get('capacity', 'Unknown')
-                status = info.get('status', 'Unknown')
-                
-                subtitle = f"{capacity} - {status}"
-                self.info_row.set_subtitle(subtitle)
-                
-                # Update battery icon based on status
-                if status.lower() == 'charging':
-                    self.battery_icon.set_from_icon_name("battery-charging-symbolic")
-                elif status.lower() == 'discharging':
-                    self.battery_icon.set_from_icon_name("battery-symbolic")
-                elif status.lower() == 'full':
-                    self.battery_icon.set_from_icon_name("battery-full-symbolic")
-                else:
-                    self.battery_icon.set_from_icon_name("battery-symbolic")
+            subtitle = f"{capacity} - {status}"
+            self.info_row.set_subtitle(subtitle)
+            
+            # Update battery icon based on status
+            if status.lower() == 'charging':
+                self.battery_icon.set_from_icon_name("battery-charging-symbolic")
+            elif status.lower() == 'discharging':
+                self.battery_icon.set_from_icon_name("battery-symbolic")
+            elif status.lower() == 'full':
+                self.battery_icon.set_from_icon_name("battery-full-symbolic")
             else:
-                self.info_row.set_subtitle("Battery information not available")
+                self.battery_icon.set_from_icon_name("battery-symbolic")
                 
-        except Exception as e:
-            logger.error(f"Failed to load battery info: {e}")
-            self.info_row.set_subtitle(f"Error: {e}")
+            if status.lower() == 'discharging':
+                self.load_runtime_estimate()
+            else:
+                self.runtime_row.set_visible(False)
+        else:
+            self.info_row.set_subtitle("Battery information not available")
+            
+    def load_runtime_estimate(self):
+        """Load the runtime estimate in the background"""
+        def failed(error):
+            logger.warning(f"Failed to estimate battery runtime: {error}")
+            self.runtime_row.set_visible(False)
+            
+        self.system_controller.run_async(
+            self.system_controller.get_runtime_estimate,
+            callback=self.apply_runtime_estimate, error_callback=failed
+        )
+        
+    def apply_runtime_estimate(self, estimate):
+        """Show the remaining runtime and the alternatives"""
+        if estimate is None:
+            self.runtime_row.set_visible(False)
+            return
+            
+        subtitle = f"{format_duration(estimate.seconds)} at {estimate.watts:.1f} W"
+        current = (estimate.cpu_profile, estimate.gpu_mode)
+        others = sorted(
+            ((seconds, key) for key, seconds in estimate.alternatives.items() if key != current),
+            reverse=True
+        )
+        if others:
+            subtitle += "\n" + " · ".join(
+                f"{profile or 'Unknown'}/{mode or 'Unknown'}: {format_duration(seconds)}"
+                for seconds, (profile, mode) in others
+            )
+        self.runtime_row.set_subtitle(subtitle)
+        self.runtime_row.set_visible(True)
+        
+    def on_status_changed(self, controller, status_type, message, success):
+        """Refresh the runtime estimate after a CPU profile or GPU mode change"""
+        if success and status_type in ('cpu', 'gpu', 'preset') and self.runtime_row.get_visible():
+            self.load_runtime_estimate()
             
-    def load_charge_limit(self):
-        """Load current charge limit"""
-        try:
-            limit = self.system_controller.get_battery_charge_limit()
-            if limit is not None:
+    def apply_charge_limit(self, limit):
+        """Show the loaded charge limit"""
+        if limit is not None:
+            # Don't write the limit back while moving the slider to it
+            self.updating = True
+            try:
                 self.limit_scale.set_value(limit)
-            else:
-                self.limit_row.set_subtitle("Charge limit control not available")
-                self.limit_scale.set_sensitive(False)
-                
-        except Exception as e:
-            logger.error(f"Failed to load charge limit: {e}")
-            self.limit_row.set_subtitle(f"Error: {e}")
+            finally:
+                self.updating = False
+            self.limit_row.set_subtitle(f"Current limit: {limit}%")
+            self.limit_scale.set_sensitive(True)
+        else:
+            self.limit_row.set_subtitle("Charge limit control not available")
             self.limit_scale.set_sensitive(False)
             
+    def fetch_state(self):
+        """Read battery information and charge limit (runs on a worker thread)"""
+        info = self.system_controller.get_battery_info()
+        limit = self.system_controller.get_battery_charge_limit()
+        return info, limit
+        
     def on_limit_changed(self, scale):
         """Handle charge limit change"""
+        if self.updating:
+            return
+            
         limit = int(scale.get_value())
         
         # Update subtitle to show current value
         self.limit_row.set_subtitle(f"Current limit: {limit}%")
         
-        # Set limit in background to avoid blocking UI
-        GLib.idle_add(self.set_limit_async, limit)
+        # Set limit once the slider settles, off the main thread
+        self.set_limit_async(limit)
         
     def set_limit_async(self, limit):
-        """Set charge limit asynchronously"""
-        try:
-            self.system_controller.set_battery_charge_limit(limit)
-        except Exception as e:
-            logger.error(f"Failed to set charge limit: {e}")
-        return False
-        
-    def load_current_state(self):
-        """Load current battery state"""
-        self.load_battery_info()
-        self.load_charge_limit()
+        """Set charge limit asynchronously
         
-        # Refresh battery info periodically
-        GLib.timeout_add_seconds(30, self.refresh_battery_info)
+        Slider drags are coalesced: only the last value is written, and
+        not at all if it matches the current hardware limit.
+        """
+        self.system_controller.writes.submit('charge_limit', limit)
         
-    def refresh_battery_info(self):
-        """Refresh battery information"""
-        self.load_battery_info()
-        return True  # Continue periodic refresh 
\ No newline at end of file
+    def load_current_state(self, on_loaded=None):
+        """Load current battery state"""
+        def loaded(result):
+            info, limit = result
+            self.apply_battery_info(info)
+            self.apply_charge_limit(limit)
+            self.power_monitor.start(initial_state=self.battery_status(info))
+            if on_loaded:
+                on_loaded()
+                
+        def failed(error):
+            logger.error(f"Failed to load battery state: {error}")
+            self.info_row.set_subtitle(f"Error: {error}")
+            if on_loaded:
+                on_loaded()
+                
+        self.system_controller.run_async(self.fetch_state, callback=loaded, error_callback=failed)
+        
+    @staticmethod
+    def battery_status(info):
+        """The part of the battery information this widget shows"""
+        return {key: info[key] for key in ('capacity', 'status') if key in info}
+        
+    def read_battery_status(self):
+        """Read capacity and status for the power supply monitor"""
+        return self.battery_status(self.system_controller.get_battery_info())
+        
+    def on_destroy(self, widget):
+        """Stop monitoring when the widget goes away"""
+        self.power_monitor.stop()
+        if self.status_handler is not None:
+            self.system_controller.disconnect(self.status_handler)
+            self.status_handler = None
@@ -2,7 +2,7 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 
-from gi.repository import Gtk, Adw, GLib
+from gi.repository import Gtk, Adw
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,16 +24,41 @@ class CpuProfileWidget(Adw.ActionRow):
         self.profile_dropdown.connect('notify::selected', self.on_profile_changed)
         
         self.add_suffix(self.profile_dropdown)
+        self.updating = False
         
-        # Load available profiles
-        self.load_profiles()
+        # Profiles are loaded by load_current_state() once the window is up
+        self.profile_dropdown.set_sensitive(False)
+        self.set_subtitle("Loading...")
+        
+    def load_profiles(self, on_loaded=None):
+        """Load available CPU profiles in the background"""
+        def loaded(result):
+            self.apply_profiles(*result)
+            if on_loaded:
+                on_loaded()
+                
+        def failed(error):
+            logger.error(f"Failed to load CPU profiles: {error}")
+            self.set_subtitle(f"Error: {error}")
+            if on_loaded:
+                on_loaded()
+                
+        self.system_controller.run_async(self.fetch_profiles, callback=loaded, error_callback=failed)
         
-    def load_profiles(self):
-        """Load available CPU profiles"""
+    def fetch_profiles(self):
+        """Read available and current CPU profiles (runs on a worker thread)"""
+        profiles = self.system_controller.get_cpu_profiles()
+        current_profile = self.system_controller.get_current_cpu_profile()
+        return profiles, current_profile
+        
+    def apply_profiles(self, profiles, current_profile):
+        """Show loaded CPU profiles"""
+        logger.info(f"Available CPU profiles: {profiles}")
+        logger.info(f"Current CPU profile: {current_profile}")
+        
+        # Don't write the profile back while filling in the dropdown
+        self.updating = True
         try:
-            profiles = self.system_controller.get_cpu_profiles()
-            logger.info(f"Available CPU profiles: {profiles}")
-            
             # Create string list model
             string_list = Gtk.StringList()
             for profile in profiles:
@@ -41,38 +66,53 @@ class CpuProfileWidget(Adw.ActionRow):
                 
             self.profile_dropdown.set_model(string_list)
             
-            # Set current profile
-            current_profile = self.system_controller.get_current_cpu_profile()
-            logger.info(f"Current CPU profile: {current_profile}")
-            
             if current_profile and current_profile in profiles:
                 self.profile_dropdown.set_selected(profiles.index(current_profile))
             elif profiles:
                 # If we can't get current profile, set to first available
                 self.profile_dropdown.set_selected(0)
-                
-        except Exception as e:
-            logger.error(f"Failed to load CPU profiles: {e}")
-            self.set_subtitle(f"Error: {e}")
+        finally:
+            self.updating = False
             
+        self.profile_dropdown.set_sensitive(True)
+        self.set_subtitle("Control CPU performance mode")
+        
     def on_profile_changed(self, dropdown, param):
         """Handle profile selection change"""
+        if self.updating:
+            return
+            
         selected_index = dropdown.get_selected()
         if selected_index != Gtk.INVALID_LIST_POSITION:
             model = dropdown.get_model()
             profile = model.get_string(selected_index)
             
-            # Set profile in background to avoid blocking UI
-            GLib.idle_add(self.set_profile_async, profile)
+            # Set profile on a worker thread to avoid blocking UI
+            self.set_profile_async(profile)
             
     def set_profile_async(self, profile):
         """Set CPU profile asynchronously"""
-        try:
-            self.system_controller.set_cpu_profile(profile)
-        except Exception as e:
-            logger.error(f"Failed to set CPU profile: {e}")
-        return False
+        self.profile_dropdown.set_sensitive(False)
+        self.system_controller.run_async(
+            self.system_controller.set_cpu_profile, profile,
+            callback=self.on_profile_set,
+            error_callback=self.on_profile_set_failed,
+            queue='cpu'
+        )
+        
+    def on_profile_set(self, success):
+        """Called on the main loop when a profile change finished"""
+        if success:
+            self.profile_dropdown.set_sensitive(True)
+        else:
+            # Show the profile that is actually active again
+            self.load_profiles()
+            
+    def on_profile_set_failed(self, error):
+        """Called on the main loop when a profile change raised"""
+        logger.error(f"Failed to set CPU profile: {error}")
+        self.load_profiles()
         
-    def load_current_state(self):
+    def load_current_state(self, on_loaded=None):
         """Load current CPU profile state"""
-        self.load_profiles() 
\ No newline at end of file
+        self.load_profiles(on_loaded) 
\ No newline at end of file
@@ -24,6 +24,7 @@ class GpuModeWidget(Adw.ActionRow):
         self.mode_dropdown.connect('notify::selected', self.on_mode_changed)
         
         self.add_suffix(self.mode_dropdown)
+        self.warning_timeout_id = None
         
         # Warning label for restart requirement
         # self.warning_label = Gtk.Label()
@@ -36,15 +37,41 @@ class GpuModeWidget(Adw.ActionRow):
         # warning_box.append(self.warning_label)
         # self.add_suffix(warning_box)
         
-        # Load available modes
-        self.load_modes()
+        self.updating = False
+        
+        # Modes are loaded by load_current_state() once the window is up
+        self.mode_dropdown.set_sensitive(False)
+        self.set_subtitle("Loading...")
+        
+    def load_modes(self, on_loaded=None):
+        """Load available GPU modes in the background"""
+        def loaded(result):
+            self.apply_modes(*result)
+            if on_loaded:
+                on_loaded()
+                
+        def failed(error):
+            logger.error(f"Failed to load GPU modes: {error}")
+            self.set_subtitle(f"Error: {error}")
+            if on_loaded:
+                on_loaded()
+                
+        self.system_controller.run_async(self.fetch_modes, callback=loaded, error_callback=failed)
         
-    def load_modes(self):
-        """Load available GPU modes"""
+    def fetch_modes(self):
+        """Read available and current GPU modes (runs on a worker thread)"""
+        modes = self.system_controller.get_gpu_modes()
+        current_mode = self.system_controller.get_current_gpu_mode()
+        return modes, current_mode
+        
+    def apply_modes(self, modes, current_mode):
+        """Show loaded GPU modes"""
+        logger.info(f"Available GPU modes: {modes}")
+        logger.info(f"Current GPU mode: {current_mode}")
+        
+        # Don't switch the GPU while filling in the dropdown
+        self.updating = True
         try:
-            modes = self.system_controller.get_gpu_modes()
-            logger.info(f"Available GPU modes: {modes}")
-            
             # Create string list model
             string_list = Gtk.StringList()
             for mode in modes:
@@ -52,48 +79,66 @@ class GpuModeWidget(Adw.ActionRow):
                 
             self.mode_dropdown.set_model(string_list)
             
-            # Set current mode
-            current_mode = self.system_controller.get_current_gpu_mode()
-            logger.info(f"Current GPU mode: {current_mode}")
-            
             if current_mode and current_mode in modes:
                 self.mode_dropdown.set_selected(modes.index(current_mode))
             elif modes:
                 # If we can't get current mode, set to first available
                 self.mode_dropdown.set_selected(0)
-                
-        except Exception as e:
-            logger.error(f"Failed to load GPU modes: {e}")
-            self.set_subtitle(f"Error: {e}")
+        finally:
+            self.updating = False
             
+        self.mode_dropdown.set_sensitive(True)
+        self.set_subtitle("Switch between integrated and discrete GPU")
+        
     def on_mode_changed(self, dropdown, param):
         """Handle GPU mode selection change"""
+        if self.updating:
+            return
+            
         selected_index = dropdown.get_selected()
         if selected_index != Gtk.INVALID_LIST_POSITION:
             model = dropdown.get_model()
             mode = model.get_string(selected_index)
             
-            # Set mode in background to avoid blocking UI
-            GLib.idle_add(self.set_mode_async, mode)
+            # Set mode on a worker thread, supergfxctl can take seconds
+            self.set_mode_async(mode)
             
     def set_mode_async(self, mode):
         """Set GPU mode asynchronously"""
-        try:
-            success = self.system_controller.set_gpu_mode(mode)
-            if success:
-                # Show restart warning
-                self.warning_label.set_visible(True)
-                # Hide warning after 10 seconds
-                GLib.timeout_add_seconds(10, self.hide_warning)
-        except Exception as e:
-            logger.error(f"Failed to set GPU mode: {e}")
-        return False
+        self.mode_dropdown.set_sensitive(False)
+        self.set_subtitle(f"Switching to {mode}...")
+        self.system_controller.run_async(
+            self.system_controller.set_gpu_mode, mode,
+            callback=self.on_mode_set,
+            error_callback=self.on_mode_set_failed,
+            queue='gpu'
+        )
+        
+    def on_mode_set(self, success):
+        """Called on the main loop when a GPU mode change finished"""
+        if success:
+            self.mode_dropdown.set_sensitive(True)
+            # Show restart warning
+            self.set_subtitle("⚠ Restart required after change")
+            # Hide warning after 10 seconds
+            if self.warning_timeout_id is not None:
+                GLib.source_remove(self.warning_timeout_id)
+            self.warning_timeout_id = GLib.timeout_add_seconds(10, self.hide_warning)
+        else:
+            # Show the mode that is actually active again
+            self.load_modes()
+            
+    def on_mode_set_failed(self, error):
+        """Called on the main loop when a GPU mode change raised"""
+        logger.error(f"Failed to set GPU mode: {error}")
+        self.load_modes()
         
     def hide_warning(self):
         """Hide the restart warning"""
-        self.warning_label.set_visible(False)
+        self.warning_timeout_id = None
+        self.set_subtitle("Switch between integrated and discrete GPU")
         return False
         
-    def load_current_state(self):
+    def load_current_state(self, on_loaded=None):
         """Load current GPU mode state"""
-        self.load_modes() 
\ No newline at end of file
+        self.load_modes(on_loaded) 
\ No newline at end of file
@@ -2,7 +2,7 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 
-from gi.repository import Gtk, Adw, GLib
+from gi.repository import Gtk, Adw
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,16 +24,41 @@ class RefreshRateWidget(Adw.ActionRow):
         self.rate_dropdown.connect('notify::selected', self.on_rate_changed)
         
         self.add_suffix(self.rate_dropdown)
+        self.updating = False
         
-        # Load available refresh rates
-        self.load_refresh_rates()
+        # Rates are loaded by load_current_state() once the window is up
+        self.rate_dropdown.set_sensitive(False)
+        self.set_subtitle("Loading...")
+        
+    def load_refresh_rates(self, on_loaded=None):
+        """Load available refresh rates in the background"""
+        def loaded(result):
+            self.apply_refresh_rates(*result)
+            if on_loaded:
+                on_loaded()
+                
+        def failed(error):
+            logger.error(f"Failed to load refresh rates: {error}")
+            self.set_subtitle(f"Error: {error}")
+            if on_loaded:
+                on_loaded()
+                
+        self.system_controller.run_async(self.fetch_refresh_rates, callback=loaded, error_callback=failed)
         
-    def load_refresh_rates(self):
-        """Load available refresh rates"""
+    def fetch_refresh_rates(self):
+        """Read available and current refresh rates (runs on a worker thread)"""
+        rates = self.system_controller.get_available_refresh_rates()
+        current_rate = self.system_controller.get_current_refresh_rate()
+        return rates, current_rate
+        
+    def apply_refresh_rates(self, rates, current_rate):
+        """Show loaded refresh rates"""
+        logger.info(f"Available refresh rates: {rates}")
+        logger.info(f"Current refresh rate: {current_rate}")
+        
+        # Don't apply a rate while filling in the dropdown
+        self.updating = True
         try:
-            rates = self.system_controller.get_available_refresh_rates()
-            logger.info(f"Available refresh rates: {rates}")
-            
             # Create string list model with Hz suffix
             string_list = Gtk.StringList()
             for rate in rates:
@@ -41,22 +66,22 @@ class RefreshRateWidget(Adw.ActionRow):
                 
             self.rate_dropdown.set_model(string_list)
             
-            # Set current refresh rate
-            current_rate = self.system_controller.get_current_refresh_rate()
-            logger.info(f"Current refresh rate: {current_rate}")
-            
             if current_rate and current_rate in rates:
                 self.rate_dropdown.set_selected(rates.index(current_rate))
             elif rates:
                 # If we can't get current rate, set to first available
                 self.rate_dropdown.set_selected(0)
-                
-        except Exception as e:
-            logger.error(f"Failed to load refresh rates: {e}")
-            self.set_subtitle(f"Error: {e}")
+        finally:
+            self.updating = False
             
+        self.rate_dropdown.set_sensitive(True)
+        self.set_subtitle("Control display refresh rate")
+        
     def on_rate_changed(self, dropdown, param):
         """Handle refresh rate selection change"""
+        if self.updating:
+            return
+            
         selected_index = dropdown.get_selected()
         if selected_index != Gtk.INVALID_LIST_POSITION:
             model = dropdown.get_model()
@@ -64,17 +89,35 @@ class RefreshRateWidget(Adw.ActionRow):
             # Extract numeric value (remove "Hz" suffix)
             rate = rate_text.replace('Hz', '')
             
-            # Set refresh rate in background to avoid blocking UI
-            GLib.idle_add(self.set_rate_async, rate)
+            # Set refresh rate on a worker thread to avoid blocking UI
+            self.set_rate_async(rate)
             
     def set_rate_async(self, rate):
         """Set refresh rate asynchronously"""
-        try:
-            self.system_controller.set_refresh_rate(rate)
-        except Exception as e:
-            logger.error(f"Failed to set refresh rate: {e}")
-        return False
+        self.rate_dropdown.set_sensitive(False)
+        self.set_subtitle(f"Switching to {rate}Hz...")
+        # Saved like a change in Settings, so GNOME Shell asks to keep it
+        self.system_controller.run_async(
+            self.system_controller.set_refresh_rate, rate, True,
+            callback=self.on_rate_set,
+            error_callback=self.on_rate_set_failed,
+            queue='display'
+        )
+        
+    def on_rate_set(self, success):
+        """Called on the main loop when a refresh rate change finished"""
+        if success:
+            self.rate_dropdown.set_sensitive(True)
+            self.set_subtitle("Control display refresh rate")
+        else:
+            # Show the rate that is actually active again
+            self.load_refresh_rates()
+            
+    def on_rate_set_failed(self, error):
+        """Called on the main loop when a refresh rate change raised"""
+        logger.error(f"Failed to set refresh rate: {error}")
+        self.load_refresh_rates()
         
-    def load_current_state(self):
+    def load_current_state(self, on_loaded=None):
         """Load current refresh rate state"""
-        self.load_refresh_rates() 
\ No newline at end of file
+        self.load_refresh_rates(on_loaded) 
\ No newline at end of file
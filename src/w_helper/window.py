@@ -4,19 +4,26 @@ gi.require_version('Adw', '1')
 
 from gi.repository import Gtk, Adw, GLib, Gio
 import logging
+from functools import partial
 
 from .widgets.cpu_profile_widget import CpuProfileWidget
 from .widgets.gpu_mode_widget import GpuModeWidget
+from .widgets.refresh_rate_widget import RefreshRateWidget
 from .widgets.battery_widget import BatteryWidget
+from .startup import StartupTimer
 
 
 class WHelperWindow(Adw.ApplicationWindow):
     """Main application window"""
     
-    def __init__(self, application, system_controller):
+    def __init__(self, application, system_controller, startup_timer=None):
         super().__init__(application=application)
         
         self.system_controller = system_controller
+        self.startup_timer = startup_timer or StartupTimer()
+        self.startup_timer.expect('first-frame', 'cpu-loaded', 'gpu-loaded', 'display-loaded', 'battery-loaded')
+        self.first_frame_handler = None
+        self.connect('realize', self.on_realize)
         self.setup_ui()
         
     def setup_ui(self):
@@ -83,7 +90,14 @@ class WHelperWindow(Adw.ApplicationWindow):
         gpu_group.add(self.gpu_widget)
         content_box.append(gpu_group)
         
-
+        # Display Section
+        display_group = Adw.PreferencesGroup()
+        display_group.set_title("Display")
+        display_group.set_description("Lower refresh rates save power on battery")
+        
+        self.refresh_rate_widget = RefreshRateWidget(self.system_controller)
+        display_group.add(self.refresh_rate_widget)
+        content_box.append(display_group)
         
         # Battery Section
         battery_group = Adw.PreferencesGroup()
@@ -133,15 +147,31 @@ class WHelperWindow(Adw.ApplicationWindow):
         self.status_banner.remove_css_class("error")
         return False
         
+    def on_realize(self, window):
+        """Start watching for the first painted frame"""
+        frame_clock = self.get_frame_clock()
+        self.first_frame_handler = frame_clock.connect('after-paint', self.on_first_frame)
+        
+    def on_first_frame(self, frame_clock):
+        """Record time to first frame"""
+        frame_clock.disconnect(self.first_frame_handler)
+        self.first_frame_handler = None
+        self.startup_timer.mark('first-frame')
+        
     def load_initial_state(self):
-        """Load initial system state"""
-        try:
-            logging.info("Loading initial system state...")
-            # Load current states for all widgets
-            self.cpu_widget.load_current_state()
-            self.gpu_widget.load_current_state()
-            self.battery_widget.load_current_state()
-            logging.info("Initial system state loaded successfully")
-        except Exception as e:
-            logging.error(f"Failed to load initial state: {e}")
-            self.on_status_changed(None, "error", f"Failed to load system state: {e}", False) 
\ No newline at end of file
+        """Load initial system state
+        
+        Widgets start out in a loading state; each one probes the hardware
+        once on a worker thread and fills itself in when its result
+        arrives, so the window is presented without waiting for them.
+        """
+        logging.info("Loading initial system state...")
+        self.startup_timer.mark('widgets-built')
+        self.cpu_widget.load_current_state(partial(self.on_widget_loaded, 'cpu'))
+        self.gpu_widget.load_current_state(partial(self.on_widget_loaded, 'gpu'))
+        self.refresh_rate_widget.load_current_state(partial(self.on_widget_loaded, 'display'))
+        self.battery_widget.load_current_state(partial(self.on_widget_loaded, 'battery'))
+        
+    def on_widget_loaded(self, name):
+        """Record when a widget finished loading its state"""
+        self.startup_timer.mark(f'{name}-loaded')
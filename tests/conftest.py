@@ -0,0 +1,109 @@
+"""
+Shared fixtures for the W-Helper tests
+
+Like the benchmarks, the tests never touch real hardware: they reuse the
+fake asusctl/supergfxctl scripts and power_supply tree from
+benchmarks/common.py, and D-Bus tests run against mock services on a
+private dbus-daemon.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), 'benchmarks'))
+
+from common import dbus_session, make_fake_sysfs, make_fake_tools  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_dirs(tmp_path, monkeypatch):
+    """Keep history, caches and the instance marker out of the real home"""
+    for variable in ('XDG_CONFIG_HOME', 'XDG_CACHE_HOME', 'XDG_STATE_HOME', 'XDG_RUNTIME_DIR'):
+        path = tmp_path / variable.lower()
+        path.mkdir()
+        monkeypatch.setenv(variable, str(path))
+        
+        
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    """Put fake asusctl/supergfxctl/xrandr scripts first on PATH; yields their directory"""
+    tools_dir = make_fake_tools(str(tmp_path / 'bin'))
+    monkeypatch.setenv('PATH', tools_dir + os.pathsep + os.environ.get('PATH', os.defpath))
+    monkeypatch.setenv('FAKE_TOOL_STATE', tools_dir)
+    monkeypatch.setenv('W_HELPER_BACKEND', 'cli')
+    monkeypatch.setenv('W_HELPER_REMOTE', '0')
+    monkeypatch.delenv('W_HELPER_TOOL_CACHE', raising=False)
+    return tools_dir
+
+
+@pytest.fixture
+def fake_sysfs(tmp_path, monkeypatch):
+    """Point W_HELPER_SYSFS_ROOT at a fake power_supply tree; yields its path"""
+    root = make_fake_sysfs(str(tmp_path / 'power_supply'))
+    monkeypatch.setenv('W_HELPER_SYSFS_ROOT', root)
+    return root
+    
+    
+@pytest.fixture
+def controller(fake_tools, fake_sysfs):
+    """SystemController on the CLI backend against fake tools and sysfs"""
+    from w_helper.system_controller import SystemController
+    controller = SystemController(sysfs_root=fake_sysfs, local=True)
+    yield controller
+    controller.tasks.shutdown()
+
+
+def require_dbus(*modules: str):
+    """Skip the test unless dbus-daemon and the given Python modules are available"""
+    if shutil.which('dbus-daemon') is None:
+        pytest.skip("dbus-daemon is not installed")
+    for module in modules:
+        pytest.importorskip(module)
+
+
+@pytest.fixture
+def private_bus():
+    """Run a private dbus-daemon and yield its address"""
+    require_dbus('gi', 'pydbus')
+    with dbus_session() as address:
+        yield address
+
+
+def connect(address: str):
+    """Open a pydbus connection to a bus address"""
+    from pydbus import connect as pydbus_connect
+    return pydbus_connect(address)
+
+
+def wait_for_name(bus, name: str, timeout: float = 5.0):
+    """Wait until a bus name has an owner"""
+    dbus = bus.get('org.freedesktop.DBus', '/org/freedesktop/DBus')
+    deadline = time.monotonic() + timeout
+    while not dbus.NameHasOwner(name):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{name} did not appear on the bus")
+        time.sleep(0.02)
+
+
+def spawn_dbusmock(address: str, name: str, path: str, interface: str) -> subprocess.Popen:
+    """Serve a python-dbusmock object on a private bus (as the system bus)"""
+    env = dict(os.environ, DBUS_SYSTEM_BUS_ADDRESS=address)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'dbusmock', '--system', name, path, interface],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    wait_for_name(connect(address), name)
+    return process
+
+
+def stop(process: subprocess.Popen):
+    """Terminate a helper process and wait for it"""
+    process.terminate()
+    process.wait()
@@ -0,0 +1,224 @@
+"""
+DbusBackend against python-dbusmock stand-ins for asusd and supergfxd
+"""
+
+import time
+
+import pytest
+
+from common import dbus_session
+from conftest import connect, require_dbus, spawn_dbusmock, stop
+from w_helper.backends import (ASUSD_BUS_NAME, ASUSD_PLATFORM_INTERFACE, ASUSD_PLATFORM_PATH,
+                               SUPERGFXD_BUS_NAME, SUPERGFXD_INTERFACE, SUPERGFXD_PATH,
+                               DbusBackend, HardwareBackend)
+
+MOCK_INTERFACE = 'org.freedesktop.DBus.Mock'
+
+
+class RecordingBackend(HardwareBackend):
+    """Fallback that records which calls reached it"""
+    
+    name = 'recording'
+    
+    def __init__(self):
+        self.calls = []
+        
+    def get_cpu_profiles(self):
+        self.calls.append('get_cpu_profiles')
+        return ['Fallback']
+        
+    def get_current_cpu_profile(self):
+        self.calls.append('get_current_cpu_profile')
+        return 'Fallback'
+        
+    def set_cpu_profile(self, profile):
+        self.calls.append(('set_cpu_profile', profile))
+        return False, 'fallback'
+        
+    def get_gpu_modes(self):
+        self.calls.append('get_gpu_modes')
+        return ['Fallback']
+        
+    def get_current_gpu_mode(self):
+        self.calls.append('get_current_gpu_mode')
+        return 'Fallback'
+        
+    def set_gpu_mode(self, mode):
+        self.calls.append(('set_gpu_mode', mode))
+        return False, 'fallback'
+        
+    def set_battery_charge_limit(self, limit):
+        self.calls.append(('set_battery_charge_limit', limit))
+        return False, 'fallback'
+
+
+@pytest.fixture
+def system_bus(monkeypatch):
+    """Private bus standing in for the system bus; yields its address"""
+    require_dbus('gi', 'pydbus', 'dbusmock')
+    with dbus_session() as address:
+        monkeypatch.setenv('DBUS_SYSTEM_BUS_ADDRESS', address)
+        yield address
+
+
+def start_asusd(address: str, choices=(0, 2, 3), profile: int = 0):
+    """Mock asusd's platform interface with the given PlatformProfileChoices"""
+    from gi.repository import GLib
+    process = spawn_dbusmock(address, ASUSD_BUS_NAME, ASUSD_PLATFORM_PATH, ASUSD_PLATFORM_INTERFACE)
+    mock = connect(address).get(ASUSD_BUS_NAME, ASUSD_PLATFORM_PATH)[MOCK_INTERFACE]
+    mock.AddProperties(ASUSD_PLATFORM_INTERFACE, {
+        'PlatformProfile': GLib.Variant('u', profile),
+        'PlatformProfileChoices': GLib.Variant('au', list(choices)),
+        'ChargeControlEndThreshold': GLib.Variant('y', 80),
+    })
+    return process
+
+
+def start_supergfxd(address: str, supported=(0, 1, 5), mode: int = 0):
+    """Mock supergfxd with Supported, Mode and SetMode"""
+    process = spawn_dbusmock(address, SUPERGFXD_BUS_NAME, SUPERGFXD_PATH, SUPERGFXD_INTERFACE)
+    mock = connect(address).get(SUPERGFXD_BUS_NAME, SUPERGFXD_PATH)[MOCK_INTERFACE]
+    mock.AddMethod(SUPERGFXD_INTERFACE, 'Supported', '', 'au', f'ret = {list(supported)}')
+    mock.AddMethod(SUPERGFXD_INTERFACE, 'Mode', '', 'u', f'ret = getattr(self, "gfx_mode", {mode})')
+    mock.AddMethod(SUPERGFXD_INTERFACE, 'SetMode', 'u', 'u', 'self.gfx_mode = args[0]; ret = 0')
+    return process
+
+
+def platform_property(address: str, name: str):
+    """Read a property straight from the mock asusd"""
+    platform = connect(address).get(ASUSD_BUS_NAME, ASUSD_PLATFORM_PATH)[ASUSD_PLATFORM_INTERFACE]
+    return getattr(platform, name)
+
+
+def test_profiles_come_from_platform_profile_choices(system_bus):
+    asusd = start_asusd(system_bus, choices=(0, 2, 3), profile=2)
+    try:
+        fallback = RecordingBackend()
+        backend = DbusBackend(fallback, bus=connect(system_bus))
+        
+        assert backend.get_cpu_profiles() == ['Balanced', 'Quiet', 'LowPower']
+        assert backend.get_current_cpu_profile() == 'Quiet'
+        assert fallback.calls == []
+    finally:
+        stop(asusd)
+
+
+def test_set_profile_writes_the_offered_value(system_bus):
+    asusd = start_asusd(system_bus, choices=(0, 2, 3))
+    try:
+        fallback = RecordingBackend()
+        backend = DbusBackend(fallback, bus=connect(system_bus))
+        
+        assert backend.set_cpu_profile('LowPower') == (True, '')
+        assert platform_property(system_bus, 'PlatformProfile') == 3
+        assert backend.get_current_cpu_profile() == 'LowPower'
+        
+        # Not in PlatformProfileChoices: left to the fallback to report
+        assert backend.set_cpu_profile('Performance') == (False, 'fallback')
+        assert fallback.calls == [('set_cpu_profile', 'Performance')]
+        assert platform_property(system_bus, 'PlatformProfile') == 3
+    finally:
+        stop(asusd)
+
+
+def test_charge_limit_is_written_to_asusd(system_bus):
+    asusd = start_asusd(system_bus)
+    try:
+        backend = DbusBackend(RecordingBackend(), bus=connect(system_bus))
+        
+        assert backend.set_battery_charge_limit(60) == (True, '')
+        assert platform_property(system_bus, 'ChargeControlEndThreshold') == 60
+    finally:
+        stop(asusd)
+
+
+def test_gpu_modes_go_through_supergfxd(system_bus):
+    supergfxd = start_supergfxd(system_bus, supported=(0, 1, 5), mode=0)
+    try:
+        fallback = RecordingBackend()
+        backend = DbusBackend(fallback, bus=connect(system_bus))
+        
+        assert backend.get_gpu_modes() == ['Hybrid', 'Integrated', 'AsusMuxDgpu']
+        assert backend.get_current_gpu_mode() == 'Hybrid'
+        assert backend.set_gpu_mode('Integrated') == (True, '')
+        assert backend.get_current_gpu_mode() == 'Integrated'
+        assert fallback.calls == []
+    finally:
+        stop(supergfxd)
+
+
+def test_missing_daemon_is_retried_after_backoff(system_bus):
+    fallback = RecordingBackend()
+    backend = DbusBackend(fallback, bus=connect(system_bus), retry_after=0.5)
+    
+    # supergfxd isn't running yet
+    assert backend.get_gpu_modes() == ['Fallback']
+    
+    supergfxd = start_supergfxd(system_bus)
+    try:
+        # Still backing off: no introspection attempt on every call
+        assert backend.get_gpu_modes() == ['Fallback']
+        assert fallback.calls == ['get_gpu_modes', 'get_gpu_modes']
+        
+        time.sleep(0.6)
+        assert backend.get_gpu_modes() == ['Hybrid', 'Integrated', 'AsusMuxDgpu']
+        assert len(fallback.calls) == 2
+    finally:
+        stop(supergfxd)
+
+
+class FlakyBus:
+    """Bus on which daemons appear once started; counts introspections"""
+    
+    def __init__(self):
+        self.objects = {}
+        self.lookups = 0
+        
+    def get(self, name, path):
+        self.lookups += 1
+        if name not in self.objects:
+            raise RuntimeError(f"The name {name} was not provided by any .service files")
+        return self.objects[name]
+
+
+def test_backoff_without_a_bus(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    bus = FlakyBus()
+    fallback = RecordingBackend()
+    backend = DbusBackend(fallback, bus=bus, retry_after=30)
+    
+    assert backend.get_current_gpu_mode() == 'Fallback'
+    bus.objects[SUPERGFXD_BUS_NAME] = {SUPERGFXD_INTERFACE: type('Gfx', (), {'Mode': lambda self: 1})()}
+    clock[0] += 10
+    assert backend.get_current_gpu_mode() == 'Fallback'
+    assert bus.lookups == 1
+    
+    clock[0] += 30
+    assert backend.get_current_gpu_mode() == 'Integrated'
+    assert bus.lookups == 2
+
+
+class Platform:
+    """asusd platform interface as a pydbus proxy presents it"""
+    
+    def __init__(self, choices, profile):
+        self.PlatformProfileChoices = choices
+        self.PlatformProfile = profile
+
+
+@pytest.mark.parametrize('choices, current, written', [
+    ([0, 2, 3], 2, 3),
+    # asusd releases that serialize the profile by name
+    (['Balanced', 'Quiet', 'LowPower'], 'Quiet', 'LowPower'),
+])
+def test_profile_values_follow_asusd(choices, current, written):
+    platform = Platform(choices, current)
+    bus = FlakyBus()
+    bus.objects[ASUSD_BUS_NAME] = {ASUSD_PLATFORM_INTERFACE: platform}
+    backend = DbusBackend(RecordingBackend(), bus=bus)
+    
+    assert backend.get_cpu_profiles() == ['Balanced', 'Quiet', 'LowPower']
+    assert backend.get_current_cpu_profile() == 'Quiet'
+    assert backend.set_cpu_profile('LowPower') == (True, '')
+    assert platform.PlatformProfile == written
@@ -0,0 +1,106 @@
+"""
+StateCache expiry, shared loads and loads racing with writes
+"""
+
+import threading
+
+from w_helper.cache import StateCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        
+    def __call__(self):
+        return self.now
+
+
+def test_values_expire_after_the_ttl():
+    clock = Clock()
+    cache = StateCache(ttl=2.0, clock=clock)
+    loads = []
+    
+    def loader():
+        loads.append(clock.now)
+        return 'Balanced'
+        
+    assert cache.get('cpu_profile', loader) == 'Balanced'
+    clock.now = 1.9
+    assert cache.get('cpu_profile', loader) == 'Balanced'
+    clock.now = 2.0
+    assert cache.get('cpu_profile', loader) == 'Balanced'
+    assert loads == [0.0, 2.0]
+    assert cache.stats()['keys']['cpu_profile'] == {'hits': 1, 'misses': 2}
+
+
+def test_none_is_not_cached():
+    cache = StateCache()
+    results = iter([None, 'Hybrid'])
+    
+    assert cache.get('gpu_mode', lambda: next(results)) is None
+    assert cache.get('gpu_mode', lambda: next(results)) == 'Hybrid'
+
+
+def test_concurrent_misses_share_one_load():
+    cache = StateCache()
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+    
+    def loader():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return 'Quiet'
+        
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('cpu_profile', loader)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join()
+        
+    assert results == ['Quiet'] * 4
+    assert len(loads) == 1
+
+
+def load_racing(cache, key, old_value, write):
+    """Run cache.get(key) with a loader returning old_value, calling write() mid-load"""
+    loading = threading.Event()
+    written = threading.Event()
+    
+    def loader():
+        loading.set()
+        written.wait(5)
+        return old_value
+        
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.get(key, loader)))
+    thread.start()
+    loading.wait(5)
+    write()
+    written.set()
+    thread.join()
+    return results[0]
+
+
+def test_load_does_not_overwrite_a_newer_set():
+    cache = StateCache()
+    
+    # The caller still gets what it read...
+    assert load_racing(cache, 'cpu_profile', 'Balanced', lambda: cache.set('cpu_profile', 'Quiet')) == 'Balanced'
+    # ...but the cache keeps the written value
+    assert cache.get('cpu_profile', lambda: 'Balanced') == 'Quiet'
+
+
+def test_load_does_not_survive_an_invalidate():
+    cache = StateCache()
+    
+    load_racing(cache, 'gpu_mode', 'Hybrid', lambda: cache.invalidate('gpu_mode'))
+    assert cache.get('gpu_mode', lambda: 'Integrated') == 'Integrated'
+    
+    load_racing(cache, 'gpu_mode', 'Hybrid', cache.invalidate)
+    assert cache.get('gpu_mode', lambda: 'AsusMuxDgpu') == 'AsusMuxDgpu'
@@ -0,0 +1,108 @@
+"""
+WriteCoalescer: bursts collapse to one write, unchanged values aren't written
+"""
+
+import os
+import threading
+import time
+
+from w_helper.coalesce import WriteCoalescer
+
+
+def run_now(func, *args, callback=None, queue=None):
+    """run_async stand-in that runs the call on the calling thread"""
+    result = func(*args)
+    if callback is not None:
+        callback(result)
+
+
+class Setter:
+    """Records the values written and signals each write"""
+    
+    def __init__(self, success=True):
+        self.success = success
+        self.values = []
+        self.written = threading.Event()
+        
+    def __call__(self, value):
+        self.values.append(value)
+        self.written.set()
+        return self.success
+
+
+def coalescer(setter, quiet_period=0.05):
+    writes = WriteCoalescer(run_now, quiet_period=quiet_period)
+    writes.register('charge_limit', setter)
+    return writes
+
+
+def test_burst_writes_only_the_last_value():
+    setter = Setter()
+    writes = coalescer(setter)
+    results = []
+    
+    for limit in (60, 65, 70, 75):
+        writes.submit('charge_limit', limit, callback=results.append)
+    assert setter.written.wait(5)
+    time.sleep(0.15)
+    
+    assert setter.values == [75]
+    assert results == [True]
+    assert writes.get_known('charge_limit') == 75
+
+
+def test_value_on_the_hardware_is_not_written():
+    setter = Setter()
+    writes = coalescer(setter)
+    writes.set_known('charge_limit', 80)
+    results = []
+    
+    writes.submit('charge_limit', 80, callback=results.append)
+    writes.flush('charge_limit')
+    # A burst that ends where it started writes nothing either
+    writes.submit('charge_limit', 60)
+    writes.submit('charge_limit', 80)
+    time.sleep(0.15)
+    
+    assert setter.values == []
+    assert results == []
+
+
+def test_failed_write_leaves_the_known_value():
+    setter = Setter(success=False)
+    writes = coalescer(setter)
+    writes.set_known('charge_limit', 80)
+    
+    writes.submit('charge_limit', 60)
+    writes.flush('charge_limit')
+    
+    assert setter.values == [60]
+    assert writes.get_known('charge_limit') == 80
+    # Not on the hardware, so asking again writes again
+    writes.submit('charge_limit', 60)
+    writes.flush('charge_limit')
+    assert setter.values == [60, 60]
+
+
+def test_cancelled_value_is_not_written():
+    setter = Setter()
+    writes = coalescer(setter)
+    
+    writes.submit('charge_limit', 60)
+    writes.cancel('charge_limit')
+    time.sleep(0.15)
+    
+    assert setter.values == []
+
+
+def test_controller_skips_the_current_charge_limit(controller, fake_tools, monkeypatch):
+    log = os.path.join(fake_tools, 'calls.log')
+    monkeypatch.setenv('FAKE_TOOL_LOG', log)
+    # Read from sysfs, which also records it as on the hardware
+    assert controller.get_battery_charge_limit() == 80
+    
+    controller.writes.submit('charge_limit', 80)
+    controller.writes.flush('charge_limit')
+    controller.tasks.shutdown()
+    
+    assert not os.path.exists(log) or ' -c ' not in open(log).read()
@@ -0,0 +1,153 @@
+"""
+CommandRunner timeouts, cancellation and concurrency limits with fake tools
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from common import write_script
+from w_helper.commands import CommandRunner
+from w_helper.tools import ToolResolver
+
+# Hangs with a child in its process group; both have to be stopped
+HANGING_TOOL = """#!/bin/sh
+sleep 3600 &
+echo $$ $! > "$FAKE_TOOL_STATE/pids"
+wait
+"""
+
+# Records when each call starts and ends
+SLOW_TOOL = """#!/bin/sh
+echo start >> "$FAKE_TOOL_STATE/calls"
+sleep 0.2
+echo end >> "$FAKE_TOOL_STATE/calls"
+"""
+
+
+def alive(pid: int) -> bool:
+    """Whether a process exists and isn't a zombie"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def read_pids(tools_dir):
+    """PIDs of the hanging tool and its child, once it has started them"""
+    path = os.path.join(tools_dir, 'pids')
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) or not open(path).read().strip():
+        assert time.monotonic() < deadline, "hanging tool did not start"
+        time.sleep(0.01)
+    return [int(pid) for pid in open(path).read().split()]
+
+
+def wait_until_dead(pids, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while any(alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return [pid for pid in pids if alive(pid)]
+
+
+def max_overlap(tools_dir):
+    """Most calls that ran at the same time, from the start/end log"""
+    running = peak = 0
+    with open(os.path.join(tools_dir, 'calls')) as f:
+        for line in f:
+            running += 1 if line.strip() == 'start' else -1
+            peak = max(peak, running)
+    return peak
+
+
+def run_concurrently(runner, command, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runner.run(command)))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.fixture
+def runner(fake_tools):
+    return CommandRunner(ToolResolver(), timeout=5)
+
+
+def test_timeout_kills_the_process_group(runner, fake_tools):
+    write_script(fake_tools, 'hangctl', HANGING_TOOL)
+    
+    start = time.monotonic()
+    result = runner.run(['hangctl'], timeout=0.3)
+    
+    assert result.timed_out and not result.ok
+    assert time.monotonic() - start < 2
+    assert wait_until_dead(read_pids(fake_tools)) == []
+    assert runner.running == 0
+
+
+def test_cancel_commands_aborts_running_calls(controller, fake_tools):
+    write_script(fake_tools, 'hangctl', HANGING_TOOL)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(controller.execute(['hangctl'])))
+    thread.start()
+    pids = read_pids(fake_tools)
+    
+    controller.cancel_commands()
+    thread.join(timeout=2)
+    
+    assert not thread.is_alive()
+    assert results[0].cancelled and not results[0].timed_out
+    assert wait_until_dead(pids) == []
+
+
+def test_cancel_commands_aborts_waiting_calls(fake_tools):
+    write_script(fake_tools, 'hangctl', HANGING_TOOL)
+    runner = CommandRunner(ToolResolver(), timeout=5, limits={'hangctl': 1})
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runner.run(['hangctl'])))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    read_pids(fake_tools)
+    runner.cancel_all()
+    for thread in threads:
+        thread.join(timeout=2)
+        
+    assert len(results) == 2
+    assert all(result.cancelled for result in results)
+
+
+def test_one_call_per_tool_at_a_time(runner, fake_tools):
+    write_script(fake_tools, 'asusctl', SLOW_TOOL)
+    
+    results = run_concurrently(runner, ['asusctl', 'profile', '-l'], 4)
+    
+    assert all(result.ok for result in results)
+    assert max_overlap(fake_tools) == 1
+
+
+def test_other_tools_run_up_to_the_limit(fake_tools):
+    write_script(fake_tools, 'slowctl', SLOW_TOOL)
+    runner = CommandRunner(ToolResolver(), timeout=5, limits={'slowctl': 2})
+    
+    results = run_concurrently(runner, ['slowctl'], 6)
+    
+    assert all(result.ok for result in results)
+    assert max_overlap(fake_tools) == 2
+
+
+def test_queued_time_counts_towards_the_timeout(fake_tools):
+    write_script(fake_tools, 'slowctl', SLOW_TOOL)
+    runner = CommandRunner(ToolResolver(), timeout=0.3, limits={'slowctl': 1})
+    
+    results = run_concurrently(runner, ['slowctl'], 3)
+    
+    assert sum(result.ok for result in results) == 1
+    assert sum(result.timed_out for result in results) == 2
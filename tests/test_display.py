@@ -0,0 +1,208 @@
+"""
+Mode selection, and applying configurations to the DisplayConfig mock
+"""
+
+import os
+import time
+
+import pytest
+
+from common import dbus_session, fake_mutter
+from conftest import connect, require_dbus
+from w_helper.display import (APPLY_TEMPORARY, DisplayConfigClient, DisplayState, Monitor,
+                              build_mode_config, build_refresh_rate_config)
+
+
+def mode(refresh, current=False, preferred=False, width=2560, height=1600):
+    """A GetCurrentState mode entry"""
+    return (f'{width}x{height}@{refresh}', width, height, refresh, 1.5, [1.0, 1.5, 2.0],
+            {'is-current': current, 'is-preferred': preferred})
+
+
+def monitor(connector, modes, builtin=False):
+    """A GetCurrentState monitor entry"""
+    return ((connector, 'ACME', '0x0001', '0'), modes, {'display-name': connector, 'is-builtin': builtin})
+
+
+PANEL = monitor('eDP-1', [
+    mode(165.0, current=True, preferred=True), mode(164.97), mode(120.0), mode(60.0),
+    mode(60.0, width=1920, height=1200),
+], builtin=True)
+EXTERNAL = monitor('HDMI-1', [mode(60.0, current=True, width=1920, height=1080),
+                              mode(50.0, width=1920, height=1080)])
+OFF = monitor('DP-2', [mode(144.0, width=2560, height=1440)])
+
+
+def raw_state(serial):
+    """GetCurrentState result: the panel left of the external monitor, DP-2 disabled"""
+    logical = [(0, 0, 1.5, 0, True, [PANEL[0]], {}), (1707, 0, 1.0, 0, False, [EXTERNAL[0]], {})]
+    return serial, [PANEL, EXTERNAL, OFF], logical, {}
+
+
+def test_find_mode():
+    panel = Monitor(PANEL)
+    
+    assert panel.current.refresh == 165.0
+    assert panel.find_mode(165.0).refresh == 165.0
+    # Nearest within the same whole Hz
+    assert panel.find_mode(164.9).refresh == 164.97
+    assert panel.find_mode(60).resolution == (2560, 1600)
+    assert panel.find_mode(60, 1920, 1200).resolution == (1920, 1200)
+    assert panel.find_mode(144.0) is None
+    assert Monitor(OFF).find_mode(144.0) is None
+
+
+def test_find_mode_stays_within_half_a_hz():
+    fractional = Monitor(monitor('DP-1', [mode(59.94, current=True), mode(60.6), mode(143.51)]))
+    
+    assert fractional.find_mode(60.0).refresh == 59.94
+    # 143.51 rounds to 144 but is within half a Hz of 143.1
+    assert fractional.find_mode(143.1).refresh == 143.51
+    # 60.6 rounds to 61 and is more than half a Hz from 61.2
+    assert fractional.find_mode(61.2) is None
+    assert fractional.find_mode(60.4).refresh == 60.6
+    assert fractional.find_mode(59.3) is None
+
+
+def test_refresh_rate_config_keeps_the_layout():
+    state = DisplayState(raw_state(7))
+    
+    serial, config, changed = build_refresh_rate_config(state, 120.0)
+    
+    assert serial == 7
+    assert changed == ['eDP-1']
+    assert config == [
+        (0, 0, 1.5, 0, True, [('eDP-1', '2560x1600@120.0', {})]),
+        # No 120 Hz mode: keeps its current one
+        (1707, 0, 1.0, 0, False, [('HDMI-1', '1920x1080@60.0', {})]),
+    ]
+
+
+def test_mode_config_errors():
+    state = DisplayState(raw_state(1))
+    
+    with pytest.raises(ValueError, match='no 50 Hz mode'):
+        build_mode_config(state, {'eDP-1': 50.0})
+    with pytest.raises(ValueError, match='No enabled monitor DP-2'):
+        build_mode_config(state, {'DP-2': 144.0})
+    with pytest.raises(ValueError, match='No monitor has a 144 Hz mode'):
+        build_refresh_rate_config(state, 144.0)
+    # Already at the rate: nothing changes
+    assert build_refresh_rate_config(state, 165.0)[2] == []
+
+
+class FakeDisplay:
+    """DisplayConfigClient stand-in whose serial can move on behind the cache"""
+    
+    def __init__(self, fail=None):
+        self.serial = 1
+        self.fail = fail
+        self.cached = None
+        self.applied = []
+        
+    def get_current_state(self):
+        if self.cached is None:
+            self.cached = DisplayState(raw_state(self.serial))
+        return self.cached
+        
+    def apply_monitors_config(self, serial, method, config):
+        self.applied.append(serial)
+        self.cached = None
+        if self.fail:
+            raise ValueError(self.fail)
+        if serial != self.serial:
+            raise ValueError(f"The requested configuration is based on stale information (serial {serial})")
+        self.serial += 1
+
+
+def to_120(state):
+    return build_refresh_rate_config(state, 120.0)
+
+
+def test_stale_serial_is_retried(controller):
+    display = controller._display = FakeDisplay()
+    display.get_current_state()
+    # Someone else applied a configuration; MonitorsChanged hasn't arrived yet
+    display.serial = 2
+    
+    assert controller.apply_display_config(to_120) == ['eDP-1']
+    assert display.applied == [1, 2]
+
+
+def test_other_errors_are_not_retried(controller):
+    display = controller._display = FakeDisplay(fail="Scale 1.5 is not supported")
+    
+    with pytest.raises(ValueError, match='Scale'):
+        controller.apply_display_config(to_120)
+    assert display.applied == [1]
+
+
+def test_persistent_stale_serial_gives_up(controller):
+    display = controller._display = FakeDisplay()
+    # Rejected twice for a stale serial even though the state was re-read
+    display.serial = 99
+    display.get_current_state = lambda: DisplayState(raw_state(len(display.applied) + 1))
+    
+    with pytest.raises(ValueError, match='stale'):
+        controller.apply_display_config(to_120)
+    assert display.applied == [1, 2]
+
+
+@pytest.fixture
+def mutter():
+    """Address of a private session bus serving benchmarks/fake_mutter.py"""
+    require_dbus('gi', 'pydbus')
+    with dbus_session() as address:
+        with fake_mutter(dict(os.environ, DBUS_SESSION_BUS_ADDRESS=address)):
+            yield address
+
+
+def test_refresh_rates_from_mutter(controller, mutter):
+    controller._display = DisplayConfigClient(bus=connect(mutter))
+    
+    assert controller.get_available_refresh_rates() == ['60', '120', '165']
+    assert controller.get_current_refresh_rate() == '165'
+    assert controller.set_refresh_rate('120') is True
+    assert controller.get_current_refresh_rate() == '120'
+    # Already there: nothing is sent
+    assert controller.set_monitor_refresh_rates({'eDP-1': 120.0}) == []
+    with pytest.raises(ValueError, match='no 75 Hz mode'):
+        controller.set_monitor_refresh_rates({'eDP-1': 75.0})
+
+
+def switch_elsewhere(address, rate):
+    """Apply a rate from another client; returns the serial it was based on"""
+    other = DisplayConfigClient(bus=connect(address))
+    serial, config, _ = build_refresh_rate_config(other.get_current_state(), rate)
+    other.apply_monitors_config(serial, APPLY_TEMPORARY, config)
+    return serial
+
+
+def test_outside_changes_are_seen_without_a_main_loop(controller, mutter):
+    controller._display = DisplayConfigClient(bus=connect(mutter))
+    assert controller.get_current_refresh_rate() == '165'
+    
+    switch_elsewhere(mutter, 60.0)
+    # MonitorsChanged is dispatched by the next read; give it time to arrive
+    deadline = time.monotonic() + 5
+    while controller.get_current_refresh_rate() != '60' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert controller.get_current_refresh_rate() == '60'
+
+
+def test_stale_serial_is_retried_against_mutter(controller, mutter, monkeypatch):
+    display = controller._display = DisplayConfigClient(bus=connect(mutter))
+    display.get_current_state()
+    # Another client moves Mutter to the next serial, and its
+    # MonitorsChanged is still on the way when we apply
+    monkeypatch.setattr(display, 'dispatch_signals', lambda: None)
+    serial = switch_elsewhere(mutter, 60.0)
+    
+    sent = []
+    apply = display.apply_monitors_config
+    monkeypatch.setattr(display, 'apply_monitors_config',
+                        lambda serial, *args: sent.append(serial) or apply(serial, *args))
+    
+    assert controller.set_monitor_refresh_rates({'eDP-1': 120.0}) == ['eDP-1']
+    assert sent == [serial, serial + 1]
+    assert controller.get_current_refresh_rate() == '120'
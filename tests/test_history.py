@@ -0,0 +1,55 @@
+"""
+Power draw history records and `w-helper history` export
+"""
+
+import os
+import subprocess
+import sys
+
+from w_helper.history import RECORD, HistoryFile, PowerSample, pack_sample, unpack_sample
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+
+def run_cli(*args):
+    """Run the CLI in a subprocess and return the completed process"""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    return subprocess.run([sys.executable, '-m', 'w_helper.cli', *args],
+                          env=env, capture_output=True, text=True)
+
+
+def test_record_round_trip():
+    sample = PowerSample(1700000000.5, 12450, 76, True, False, 'Quiet', 'Integrated')
+    data = pack_sample(sample)
+    
+    assert len(data) == RECORD.size
+    assert unpack_sample(*RECORD.unpack(data)) == sample
+
+
+def test_unknown_fields_round_trip():
+    sample = PowerSample(1700000000.0, None, None, False, True, None, None)
+    
+    assert unpack_sample(*RECORD.unpack(pack_sample(sample))) == sample
+
+
+def test_export_writes_csv(fake_tools, tmp_path):
+    history_file = str(tmp_path / 'history.bin')
+    HistoryFile(history_file).append(pack_sample(
+        PowerSample(9e9, 12450, 76, False, False, 'Balanced', 'Hybrid')
+    ))
+    output = tmp_path / 'history.csv'
+    
+    result = run_cli('history', '--file', history_file, '--since', '1d', '--output', str(output))
+    
+    assert result.returncode == 0, result.stderr
+    assert output.read_text().count('\n') == 2
+
+
+def test_export_to_missing_directory_fails_cleanly(fake_tools, tmp_path):
+    output = tmp_path / 'missing' / 'history.csv'
+    
+    result = run_cli('history', '--file', str(tmp_path / 'history.bin'), '--output', str(output))
+    
+    assert result.returncode == 1
+    assert 'Failed to export history' in result.stderr
+    assert 'Traceback' not in result.stderr
@@ -0,0 +1,211 @@
+"""
+Power policy rules and the policy daemon against fake tools and sysfs
+"""
+
+import datetime
+import os
+
+import pytest
+
+from common import FAKE_ADAPTER, FAKE_BATTERY, write_script, write_supply
+from w_helper import policy
+from w_helper.daemon import PolicyDaemon
+from w_helper.policy import RETRY_INITIAL, PolicyEngine, PolicyError, PowerState, parse_policy
+
+POLICY = """
+[settings]
+hysteresis = 5
+
+[[rule]]
+name = "low battery"
+when = { battery_below = 30 }
+apply = { cpu_profile = "Quiet" }
+
+[[rule]]
+name = "on battery"
+when = { ac = false }
+apply = { cpu_profile = "Balanced", charge_limit = 80 }
+
+[[rule]]
+name = "plugged in"
+when = { ac = true }
+apply = { cpu_profile = "Performance", charge_limit = 60 }
+"""
+
+NOON = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+def load(text):
+    try:
+        import tomllib
+    except ImportError:
+        tomllib = pytest.importorskip('tomli')
+    return parse_policy(tomllib.loads(text))
+
+
+def state(ac_online=False, capacity=50):
+    return PowerState(ac_online=ac_online, capacity=capacity, now=NOON)
+
+
+@pytest.fixture
+def daemon(controller, tmp_path):
+    policy_file = tmp_path / 'policy.toml'
+    policy_file.write_text(POLICY)
+    daemon = PolicyDaemon(controller, policy_file=str(policy_file), proc_root=str(tmp_path))
+    yield daemon
+    daemon.close()
+
+
+class Clock:
+    """Stands in for the time module in w_helper.policy"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(policy, 'time', clock)
+    return clock
+
+
+def plug(sysfs_root, ac_online):
+    write_supply(sysfs_root, 'AC0', dict(FAKE_ADAPTER, online='1' if ac_online else '0'))
+
+
+def profile(tools_dir):
+    """Profile the fake asusctl holds (Balanced until one is set)"""
+    try:
+        with open(os.path.join(tools_dir, 'asusctl.profile')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return 'Balanced'
+
+
+def charge_limit(sysfs_root):
+    with open(os.path.join(sysfs_root, 'BAT0', 'charge_control_end_threshold')) as f:
+        return int(f.read())
+
+
+def test_first_matching_rule_wins_per_setting():
+    engine = PolicyEngine(None, load(POLICY))
+    
+    desired, reasons = engine.evaluate(state(ac_online=False, capacity=20))
+    
+    assert desired == {'cpu_profile': 'Quiet', 'charge_limit': 80}
+    assert reasons == {'cpu_profile': 'low battery', 'charge_limit': 'on battery'}
+
+
+def test_battery_threshold_hysteresis():
+    engine = PolicyEngine(None, load(POLICY))
+    
+    assert engine.evaluate(state(capacity=29))[0]['cpu_profile'] == 'Quiet'
+    # Held until 30% + 5
+    assert engine.evaluate(state(capacity=33))[0]['cpu_profile'] == 'Quiet'
+    assert engine.evaluate(state(capacity=35))[0]['cpu_profile'] == 'Balanced'
+    assert engine.evaluate(state(capacity=33))[0]['cpu_profile'] == 'Balanced'
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(PolicyError):
+        load('[[rule]]\nwhen = { ac = "yes" }\napply = { cpu_profile = "Quiet" }\n')
+
+
+def test_daemon_applies_on_transitions(daemon, fake_tools, fake_sysfs):
+    plug(fake_sysfs, False)
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Balanced'
+    assert charge_limit(fake_sysfs) == 80
+    
+    plug(fake_sysfs, True)
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Performance'
+    assert charge_limit(fake_sysfs) == 60
+
+
+def test_manual_change_is_kept_until_the_next_transition(daemon, controller, fake_tools, fake_sysfs):
+    plug(fake_sysfs, True)
+    daemon.evaluate()
+    controller.set_cpu_profile('Quiet')
+    
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Quiet'
+    
+    plug(fake_sysfs, False)
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Balanced'
+
+
+def test_failed_write_is_retried_after_a_delay(daemon, fake_tools, fake_sysfs, clock):
+    plug(fake_sysfs, True)
+    # asusd is busy: every asusctl call fails
+    working = open(os.path.join(fake_tools, 'asusctl')).read()
+    write_script(fake_tools, 'asusctl', '#!/bin/sh\necho "asusd is not responding" >&2\nexit 1\n')
+    
+    daemon.evaluate()
+    assert 'cpu_profile' not in daemon.engine.applied
+    
+    write_script(fake_tools, 'asusctl', working)
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Balanced'
+    
+    clock.now += RETRY_INITIAL
+    daemon.evaluate()
+    assert profile(fake_tools) == 'Performance'
+    assert charge_limit(fake_sysfs) == 60
+    assert daemon.engine.applied == {'cpu_profile': 'Performance', 'charge_limit': 60}
+
+
+def test_settled_settings_are_not_rewritten(daemon, fake_tools, fake_sysfs, monkeypatch):
+    log = os.path.join(fake_tools, 'calls.log')
+    monkeypatch.setenv('FAKE_TOOL_LOG', log)
+    write_supply(fake_sysfs, 'BAT0', dict(FAKE_BATTERY, charge_control_end_threshold='60'))
+    plug(fake_sysfs, True)
+    
+    daemon.evaluate()
+    daemon.evaluate()
+    
+    with open(log) as f:
+        writes = [line for line in f if ' -P ' in line or ' -c ' in line]
+    assert writes == ['asusctl profile -P Performance\n']
+
+
+def test_permanent_failure_backs_off(controller, fake_tools, monkeypatch, clock):
+    log = os.path.join(fake_tools, 'calls.log')
+    monkeypatch.setenv('FAKE_TOOL_LOG', log)
+    # supergfxctl never accepts Vfio, so the CPU profile is rolled back
+    engine = PolicyEngine(controller, load("""
+[[rule]]
+name = "always"
+when = { ac = false }
+apply = { cpu_profile = "Quiet", gpu_mode = "Vfio" }
+"""))
+    
+    def profile_writes():
+        with open(log) as f:
+            return [line for line in f if ' -P Quiet' in line]
+            
+    engine.step(state())
+    clock.now += RETRY_INITIAL - 1
+    engine.step(state())
+    assert len(profile_writes()) == 1
+    clock.now += 1
+    engine.step(state())
+    assert len(profile_writes()) == 2
+    
+    # The delay doubles while the outcome keeps failing
+    clock.now += RETRY_INITIAL
+    engine.step(state())
+    assert len(profile_writes()) == 2
+    clock.now += RETRY_INITIAL
+    engine.step(state())
+    assert len(profile_writes()) == 3
+    
+    # A different outcome is applied right away
+    engine.step(state(ac_online=True))
+    engine.step(state())
+    assert len(profile_writes()) == 4
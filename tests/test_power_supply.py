@@ -0,0 +1,92 @@
+"""
+PowerSupplyReader against a fake power_supply tree
+"""
+
+import os
+import threading
+import time
+
+from common import make_fake_sysfs
+from w_helper import power_supply
+from w_helper.power_supply import PowerSupplyReader
+
+
+def test_snapshot(fake_sysfs):
+    snapshot = PowerSupplyReader(fake_sysfs).snapshot()
+    
+    assert snapshot.ac_online is False
+    assert snapshot.battery.capacity == 76
+    assert snapshot.battery.charge_limit == 80
+    assert snapshot.battery.health == 83.6
+
+
+def test_rediscovery_does_not_close_descriptors_being_read(fake_sysfs, monkeypatch):
+    reader = PowerSupplyReader(fake_sysfs)
+    in_use = set()
+    closed_while_read = []
+    lock = threading.Lock()
+    real_pread, real_close = os.pread, os.close
+    
+    def pread(fd, size, offset):
+        with lock:
+            in_use.add(fd)
+        try:
+            # Widen the window for a concurrent discover()
+            time.sleep(0.0005)
+            return real_pread(fd, size, offset)
+        finally:
+            with lock:
+                in_use.discard(fd)
+                
+    def close(fd):
+        with lock:
+            if fd in in_use:
+                closed_while_read.append(fd)
+        real_close(fd)
+        
+    monkeypatch.setattr(power_supply.os, 'pread', pread)
+    monkeypatch.setattr(power_supply.os, 'close', close)
+    
+    capacities = []
+    stop = threading.Event()
+    
+    def snapshots():
+        while not stop.is_set():
+            capacities.append(reader.snapshot().battery.capacity)
+            
+    threads = [threading.Thread(target=snapshots) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(50):
+            reader.discover()
+            time.sleep(0.001)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    reader.close()
+    
+    assert closed_while_read == []
+    assert capacities and set(capacities) == {76}
+
+
+def test_discovery_happens_once_under_concurrent_first_use(tmp_path, monkeypatch):
+    root = make_fake_sysfs(str(tmp_path / 'power_supply'))
+    reader = PowerSupplyReader(root)
+    listings = []
+    real_listdir = os.listdir
+    
+    def listdir(path):
+        listings.append(path)
+        time.sleep(0.01)
+        return real_listdir(path)
+        
+    monkeypatch.setattr(power_supply.os, 'listdir', listdir)
+    threads = [threading.Thread(target=reader.snapshot) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+        
+    assert listings == [root]
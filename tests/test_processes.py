@@ -0,0 +1,84 @@
+"""
+ProcessWatcher against a fake /proc tree
+"""
+
+import os
+import shutil
+
+import pytest
+
+from common import make_fake_proc, write_process, write_uptime
+from w_helper.processes import ProcessWatcher
+
+UPTIME = 86400.0
+RULES = {0: ('steam', '*.exe'), 1: ('/usr/libexec/gcc/*',)}
+
+
+@pytest.fixture
+def proc_root(tmp_path):
+    return make_fake_proc(str(tmp_path / 'proc'), 50, uptime=UPTIME)
+
+
+@pytest.fixture
+def watcher(proc_root):
+    watcher = ProcessWatcher(RULES, proc_root=proc_root, linger=0)
+    watcher.scan()
+    return watcher
+
+
+def start(proc_root, watcher, pid, name, exe, age=0.0):
+    """Replace /proc/<pid> with a process started `age` seconds ago"""
+    shutil.rmtree(os.path.join(proc_root, str(pid)), ignore_errors=True)
+    starttime = int((UPTIME - age) * watcher.ticks_per_second)
+    write_process(proc_root, pid, name, exe, starttime=starttime)
+
+
+def test_matches_name_and_executable_path(proc_root, watcher):
+    start(proc_root, watcher, 5000, 'steam', '/usr/lib/steam/steam')
+    start(proc_root, watcher, 5001, 'cc1plus', '/usr/libexec/gcc/x86_64-linux/13/cc1plus')
+    
+    assert watcher.scan()
+    assert watcher.active() == {0, 1}
+    assert watcher.running(0) == [5000]
+    
+    shutil.rmtree(os.path.join(proc_root, '5000'))
+    assert watcher.scan()
+    assert watcher.active() == {1}
+
+
+def test_young_process_is_matched_after_exec(proc_root, watcher):
+    start(proc_root, watcher, 5000, 'bwrap', '/usr/bin/bwrap', age=1)
+    assert not watcher.scan()
+    
+    # Same process, now running the program it launched
+    start(proc_root, watcher, 5000, 'game.exe', '/opt/game/game.exe', age=1)
+    assert watcher.scan()
+    assert watcher.running(0) == [5000]
+
+
+def test_old_unmatched_processes_are_not_reread(proc_root, watcher):
+    start(proc_root, watcher, 5000, 'bash', '/usr/bin/bash', age=60)
+    watcher.scan()
+    
+    assert watcher.unmatched == set()
+
+
+def test_reused_pid_releases_the_rule(proc_root, watcher):
+    start(proc_root, watcher, 5000, 'steam', '/usr/lib/steam/steam', age=30)
+    watcher.scan()
+    
+    # steam exited and its PID went to an unrelated process between scans
+    start(proc_root, watcher, 5000, 'bash', '/usr/bin/bash', age=0)
+    assert watcher.scan()
+    assert watcher.active() == frozenset()
+    assert watcher.counts == {0: 0, 1: 0}
+
+
+def test_recheck_window_follows_process_age(proc_root, watcher):
+    start(proc_root, watcher, 5000, 'sh', '/usr/bin/sh', age=5)
+    watcher.scan()
+    assert (5000, watcher.pids[5000]) in watcher.unmatched
+    
+    write_uptime(proc_root, UPTIME + 10)
+    watcher.scan()
+    assert watcher.unmatched == set()
@@ -0,0 +1,48 @@
+"""
+RefreshRateSwitcher on AC/battery transitions
+"""
+
+from test_display import raw_state
+from w_helper.display import DisplayState
+from w_helper.policy import ALL_MONITORS, RefreshRates
+from w_helper.refresh_rate import RefreshRateSwitcher
+
+
+class Controller:
+    """Controller stand-in whose monitors can't be read until mutter_up"""
+    
+    def __init__(self):
+        self.mutter_up = False
+        self.switched = []
+        
+    def get_monitors(self):
+        if not self.mutter_up:
+            raise RuntimeError("Failed to get monitors via D-Bus: org.gnome.Mutter.DisplayConfig is not running")
+        return DisplayState(raw_state(1)).monitors
+        
+    def set_monitor_refresh_rates(self, rates):
+        self.switched.append(rates)
+        return list(rates)
+
+
+def test_switches_on_transitions():
+    controller = Controller()
+    controller.mutter_up = True
+    switcher = RefreshRateSwitcher(controller, {ALL_MONITORS: RefreshRates(ac=165.0, battery=60.0)})
+    
+    # Already at the AC rate; HDMI-1 is at 60 Hz anyway
+    assert switcher.update(True) == {}
+    assert switcher.update(False) == {'eDP-1': 60.0}
+    assert switcher.update(False) == {}
+    assert controller.switched == [{'eDP-1': 60.0}]
+
+
+def test_unreadable_monitors_are_retried():
+    controller = Controller()
+    switcher = RefreshRateSwitcher(controller, {'eDP-1': RefreshRates(battery=60.0)})
+    
+    # e.g. the daemon started before GNOME Shell
+    assert switcher.update(False) == {}
+    controller.mutter_up = True
+    assert switcher.update(False) == {'eDP-1': 60.0}
+    assert controller.switched == [{'eDP-1': 60.0}]
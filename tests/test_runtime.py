@@ -0,0 +1,90 @@
+"""
+RuntimeEstimator rates per CPU profile and GPU mode, and format_duration
+"""
+
+import pytest
+
+from w_helper.runtime import MIN_OBSERVED, RuntimeEstimator, format_duration
+
+WH = 1000000
+WATT = 1000000
+
+
+def discharge(estimator, start, count, cpu_profile, gpu_mode, watts=None, energy_step=None,
+              energy=60 * WH, interval=60):
+    """Feed count discharging samples one interval apart; returns the next timestamp"""
+    for i in range(count):
+        power_now = int(watts * WATT) if watts is not None else None
+        energy_now = energy - i * energy_step if energy_step is not None else energy
+        estimator.update(start + i * interval, True, energy_now, power_now, cpu_profile, gpu_mode)
+    return start + count * interval
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    return RuntimeEstimator(path=str(tmp_path / 'runtime.json'))
+
+
+def test_rates_are_kept_per_profile_and_mode(estimator):
+    end = discharge(estimator, 0, 11, 'Quiet', 'Integrated', watts=10)
+    discharge(estimator, end, 11, 'Performance', 'Hybrid', watts=25)
+    
+    assert estimator.rate('Quiet', 'Integrated') == pytest.approx(10)
+    assert estimator.rate('Performance', 'Hybrid') == pytest.approx(25)
+    assert estimator.rate('Balanced', 'Hybrid') is None
+    
+    estimate = estimator.estimate(50 * WH, 18 * WATT, 'Quiet', 'Integrated')
+    assert estimate.source == 'learned'
+    assert estimate.seconds == pytest.approx(5 * 3600)
+    assert estimate.alternatives == {
+        ('Quiet', 'Integrated'): pytest.approx(5 * 3600),
+        ('Performance', 'Hybrid'): pytest.approx(2 * 3600),
+    }
+
+
+def test_rate_from_energy_drops(estimator):
+    # 0.2 Wh a minute is 12 W
+    discharge(estimator, 0, 7, 'Balanced', 'Hybrid', energy_step=WH // 5)
+    
+    assert estimator.rate('Balanced', 'Hybrid') == pytest.approx(12)
+
+
+def test_short_observation_falls_back_to_power_now(estimator):
+    discharge(estimator, 0, MIN_OBSERVED // 60, 'Quiet', 'Integrated', watts=10)
+    
+    assert estimator.rate('Quiet', 'Integrated') is None
+    estimate = estimator.estimate(40 * WH, 20 * WATT, 'Quiet', 'Integrated')
+    assert estimate.source == 'instant'
+    assert estimate.seconds == pytest.approx(2 * 3600)
+    assert estimator.estimate(40 * WH, None, 'Quiet', 'Integrated') is None
+
+
+def test_charging_and_gaps_are_not_counted(estimator):
+    discharge(estimator, 0, 3, 'Quiet', 'Integrated', watts=10)
+    estimator.update(180, False, 60 * WH, 30 * WATT, 'Quiet', 'Integrated')
+    # Resumes after a suspend longer than MAX_SAMPLE_GAP
+    discharge(estimator, 5000, 3, 'Quiet', 'Integrated', watts=10)
+    
+    assert estimator.observed[('Quiet', 'Integrated')] == 240
+    assert estimator.rate('Quiet', 'Integrated') is None
+
+
+def test_rates_survive_a_restart(estimator):
+    discharge(estimator, 0, 11, 'Quiet', 'Integrated', watts=10)
+    estimator.save()
+    
+    reloaded = RuntimeEstimator(path=estimator.path)
+    assert reloaded.rate('Quiet', 'Integrated') == pytest.approx(10)
+
+
+@pytest.mark.parametrize('seconds, text', [
+    (0, '< 5 min'),
+    (140, '< 5 min'),
+    (200, '5 min'),
+    (45 * 60, '45 min'),
+    (3600, '1 h'),
+    (3 * 3600 + 25 * 60 + 40, '3 h 25 min'),
+    (2 * 3600 - 100, '2 h'),
+])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
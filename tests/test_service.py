@@ -0,0 +1,212 @@
+"""
+The controller's session bus API, served on a private dbus-daemon
+"""
+
+import contextlib
+import threading
+import time
+
+import pytest
+
+from common import dbus_session
+from conftest import require_dbus
+from w_helper.runtime import RuntimeEstimate
+from w_helper.service import (CONTROLLER_INTERFACE, CONTROLLER_PATH, PROPERTIES_INTERFACE, REMOTE_METHODS,
+                              ControllerService, RemoteController, RemoteError, ServiceBackend,
+                              decode_runtime_estimate, encode_runtime_estimate)
+
+
+def open_connection(address: str):
+    """Connect to a bus by address, without Gio's shared session connection"""
+    from gi.repository import Gio
+    flags = Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+    return Gio.DBusConnection.new_for_address_sync(address, flags, None, None)
+
+
+@contextlib.contextmanager
+def serve(controller, address: str):
+    """Export a controller from its own main loop thread, like DaemonBus
+    
+    Yields the connection and the main context serving it.
+    """
+    from gi.repository import GLib
+    
+    context = GLib.MainContext.new()
+    loop = GLib.MainLoop.new(context, False)
+    service = ControllerService(controller)
+    connection = open_connection(address)
+    registered = threading.Event()
+    
+    def run():
+        context.push_thread_default()
+        try:
+            service.register(connection)
+            service.refresh()
+            service.start()
+            registered.set()
+            loop.run()
+        finally:
+            service.unregister()
+            context.pop_thread_default()
+            
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert registered.wait(5)
+    try:
+        yield connection, context
+    finally:
+        # Queued on the loop, so it can't be missed if the loop isn't running yet
+        source = GLib.idle_source_new()
+        source.set_callback(lambda *args: loop.quit())
+        source.attach(context)
+        thread.join()
+
+
+@pytest.fixture
+def bus_address():
+    require_dbus('gi')
+    with dbus_session() as address:
+        yield address
+
+
+@pytest.fixture
+def served(controller, bus_address):
+    """(client connection, bus name) of the controller fixture served on a private bus"""
+    with serve(controller, bus_address) as (connection, _):
+        yield open_connection(bus_address), connection.get_unique_name()
+
+
+def iterate(until, timeout: float = 5.0):
+    """Run the default main context until until() is true or the timeout passes"""
+    from gi.repository import GLib
+    
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        context.iteration(False)
+        time.sleep(0.01)
+    return until()
+
+
+def test_methods_are_typed(served):
+    from gi.repository import Gio, GLib
+    
+    client, name = served
+    reply = client.call_sync(name, CONTROLLER_PATH, 'org.freedesktop.DBus.Introspectable', 'Introspect',
+                             None, GLib.VariantType.new('(s)'), Gio.DBusCallFlags.NONE, -1, None)
+    interface = Gio.DBusNodeInfo.new_for_xml(reply.unpack()[0]).lookup_interface(CONTROLLER_INTERFACE)
+    
+    def signature(method, direction):
+        args = getattr(interface.lookup_method(method), direction)
+        return ''.join(arg.signature for arg in args)
+        
+    assert signature('SetCpuProfile', 'in_args') == 's'
+    assert signature('SetGpuMode', 'in_args') == 's'
+    assert signature('SetChargeLimit', 'in_args') == 'y'
+    assert signature('SetChargeLimit', 'out_args') == 'bs'
+    assert signature('GetCpuProfiles', 'out_args') == 'as'
+    assert interface.lookup_method('Call') is None
+
+
+def test_remote_controller_matches_local(controller, served):
+    remote = RemoteController(*served)
+    
+    assert remote.get_cpu_profiles() == controller.get_cpu_profiles()
+    assert remote.get_gpu_modes() == controller.get_gpu_modes()
+    assert remote.get_battery_info() == controller.get_battery_info()
+    assert remote.get_battery_charge_limit() == 80
+    assert remote.get_runtime_estimate() == controller.get_runtime_estimate()
+    
+    assert remote.set_cpu_profile('Quiet') is True
+    assert remote.get_current_cpu_profile() == 'Quiet'
+    assert remote.set_battery_charge_limit(60) is True
+    assert controller.get_battery_charge_limit() == 60
+
+
+def test_failed_set_returns_the_tool_output(served):
+    remote = RemoteController(*served)
+    
+    success, message = remote.call_raw('set_gpu_mode', 'Vfio')
+    assert success is False
+    assert 'not supported' in message
+    assert remote.set_gpu_mode('Vfio') is False
+    assert remote.get_current_gpu_mode() == 'Hybrid'
+
+
+def test_arguments_are_checked_by_the_bus(served):
+    from gi.repository import Gio, GLib
+    
+    client, name = served
+    # A charge limit is a byte: a string is rejected before reaching the controller
+    with pytest.raises(GLib.Error, match='InvalidArgs'):
+        client.call_sync(name, CONTROLLER_PATH, CONTROLLER_INTERFACE, 'SetChargeLimit',
+                         GLib.Variant('(s)', ('80',)), None, Gio.DBusCallFlags.NONE, -1, None)
+
+
+def test_properties_changed_only_on_change(served):
+    from gi.repository import Gio
+    
+    client, name = served
+    changes = []
+    
+    def on_properties_changed(connection, sender, path, interface, signal, parameters):
+        changed_interface, changed, invalidated = parameters.unpack()
+        if 'CpuProfile' in changed:
+            changes.append(changed['CpuProfile'])
+            
+    client.signal_subscribe(name, PROPERTIES_INTERFACE, 'PropertiesChanged', CONTROLLER_PATH,
+                            None, Gio.DBusSignalFlags.NONE, on_properties_changed)
+    backend = ServiceBackend(client, name)
+    
+    assert backend.set_cpu_profile('Performance')[0] is True
+    assert iterate(lambda: changes)
+    assert backend.get_current_cpu_profile() == 'Performance'
+    
+    # Writing the same value again doesn't signal anything
+    assert backend.set_cpu_profile('Performance')[0] is True
+    iterate(lambda: len(changes) > 1, timeout=0.5)
+    assert changes == ['Performance']
+
+
+def test_ping_does_not_reach_the_controller(controller, served, monkeypatch):
+    client, name = served
+    monkeypatch.setattr(controller, 'get_cpu_profiles', lambda: pytest.fail("ping ran a controller method"))
+    
+    RemoteController(client, name).ping()
+    with pytest.raises(RemoteError):
+        RemoteController(client, 'com.github.w_helper.Missing').ping()
+
+
+def test_ping_fails_while_the_main_loop_is_stuck(controller, bus_address):
+    from gi.repository import GLib
+    
+    with serve(controller, bus_address) as (connection, context):
+        remote = RemoteController(open_connection(bus_address), connection.get_unique_name())
+        remote.ping()
+        
+        release = threading.Event()
+        source = GLib.idle_source_new()
+        source.set_callback(lambda *args: release.wait(5) and False)
+        source.attach(context)
+        try:
+            with pytest.raises(RemoteError):
+                remote.ping(timeout_ms=200)
+        finally:
+            release.set()
+        remote.ping()
+
+
+def test_runtime_estimate_round_trip():
+    estimate = RuntimeEstimate(7200.0, 12.5, 'learned', 'Quiet', None,
+                               {('Quiet', 'Integrated'): 9000.0, ('Balanced', 'Hybrid'): 6000.0})
+    
+    assert decode_runtime_estimate(*encode_runtime_estimate(estimate)) == estimate
+    assert decode_runtime_estimate(*encode_runtime_estimate(None)) is None
+
+
+def test_every_method_has_a_dbus_name():
+    names = [method.name for method in REMOTE_METHODS.values()]
+    
+    assert len(set(names)) == len(names)
+    assert REMOTE_METHODS['set_battery_charge_limit'].in_signature == 'y'
+    assert REMOTE_METHODS['get_runtime_estimate'].out_signature == 'bddsssa(ssd)'
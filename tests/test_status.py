@@ -0,0 +1,134 @@
+"""
+`w-helper status`: concurrent probes, timeouts, --json and --watch output
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+from w_helper import status
+from w_helper.cli import handle_status_command
+from w_helper.status import collect_status, status_record, watch_status
+
+
+class StubController:
+    """Controller whose status getters return canned values or raise"""
+    
+    def __init__(self, cpu_profiles=('Balanced',), fail=None):
+        self.cpu_profiles = itertools.chain(cpu_profiles, itertools.repeat(cpu_profiles[-1]))
+        self.fail = fail
+        
+    def get_current_cpu_profile(self):
+        return next(self.cpu_profiles)
+        
+    def get_current_gpu_mode(self):
+        if self.fail:
+            raise RuntimeError(self.fail)
+        return 'Hybrid'
+        
+    def get_current_refresh_rate(self):
+        return '165'
+        
+    def get_battery_info(self):
+        return {'capacity': '76%', 'status': 'Discharging'}
+        
+    def get_battery_charge_limit(self):
+        return 80
+
+
+def status_args(**overrides):
+    """Parsed `status` arguments"""
+    values = dict(json=False, watch=False, interval=status.DEFAULT_WATCH_INTERVAL,
+                  timeout=status.DEFAULT_PROBE_TIMEOUT)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_probes_run_concurrently(controller, monkeypatch):
+    monkeypatch.setenv('FAKE_TOOL_DELAY', '0.3')
+    
+    start = time.monotonic()
+    results = collect_status(controller)
+    elapsed = time.monotonic() - start
+    
+    assert results['cpu_profile'].value == 'Balanced'
+    assert results['gpu_mode'].value == 'Hybrid'
+    # Both tools sleep; run one after the other they'd take the sum
+    assert elapsed < results['cpu_profile'].duration + results['gpu_mode'].duration
+
+
+def test_hung_probe_times_out_without_the_others(controller, monkeypatch):
+    monkeypatch.setenv('FAKE_GFX_DELAY', '3600')
+    
+    start = time.monotonic()
+    try:
+        results = collect_status(controller, timeout=0.5)
+    finally:
+        controller.cancel_commands()
+        
+    assert time.monotonic() - start < 2
+    assert list(results) == [key for key, _, _ in status.STATUS_PROBES]
+    assert results['gpu_mode'].value is None
+    assert results['gpu_mode'].error == 'timed out after 0.5s'
+    assert results['cpu_profile'] == status.ProbeResult('Balanced', None, results['cpu_profile'].duration)
+    assert results['charge_limit'].value == 80
+
+
+def test_failing_probe_keeps_the_other_results():
+    results = collect_status(StubController(fail="supergfxd is not running"))
+    
+    assert results['gpu_mode'].error == "supergfxd is not running"
+    record = status_record(results)
+    assert record['gpu_mode'] is None
+    assert record['errors'] == {'gpu_mode': "supergfxd is not running"}
+    assert record['cpu_profile'] == 'Balanced'
+    assert record['charge_limit'] == 80
+
+
+def test_json_output(capsys):
+    assert handle_status_command(StubController(fail="supergfxd is not running"), status_args(json=True)) == 0
+    
+    record = json.loads(capsys.readouterr().out)
+    assert record['cpu_profile'] == 'Balanced'
+    assert record['refresh_rate'] == '165'
+    assert record['battery'] == {'capacity': '76%', 'status': 'Discharging'}
+    assert record['errors'] == {'gpu_mode': "supergfxd is not running"}
+    assert isinstance(record['timestamp'], float)
+
+
+def test_watch_yields_only_changes(monkeypatch):
+    monkeypatch.setattr(status.time, 'sleep', lambda seconds: None)
+    controller = StubController(cpu_profiles=('Balanced', 'Balanced', 'Quiet'))
+    
+    first, second = itertools.islice(watch_status(controller, interval=0.01), 2)
+    
+    assert first['cpu_profile'] == 'Balanced'
+    assert first['charge_limit'] == 80
+    # The unchanged second tick yielded nothing
+    assert set(second) == {'timestamp', 'cpu_profile'}
+    assert second['cpu_profile'] == 'Quiet'
+
+
+def test_watch_prints_one_json_line_per_change(monkeypatch, capsys):
+    ticks = []
+    
+    def sleep(seconds):
+        ticks.append(seconds)
+        if len(ticks) == 3:
+            raise KeyboardInterrupt
+            
+    monkeypatch.setattr(status.time, 'sleep', sleep)
+    controller = StubController(cpu_profiles=('Balanced', 'Balanced', 'Quiet'))
+    
+    assert handle_status_command(controller, status_args(watch=True, interval=0.01)) == 0
+    
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(lines) == 2
+    assert lines[0]['gpu_mode'] == 'Hybrid'
+    assert lines[1] == {'timestamp': lines[1]['timestamp'], 'cpu_profile': 'Quiet'}
+
+
+def test_watch_rejects_a_zero_interval(capsys):
+    assert handle_status_command(StubController(), status_args(watch=True, interval=0)) == 1
+    assert 'Interval' in capsys.readouterr().out
@@ -0,0 +1,65 @@
+"""
+SystemController against fake tools and a fake power_supply tree
+"""
+
+import logging
+import os
+import shutil
+
+
+def test_charge_limit_is_read_from_sysfs(controller):
+    assert controller.get_battery_charge_limit() == 80
+
+
+def test_no_battery_is_not_an_error(controller, fake_sysfs, caplog):
+    shutil.rmtree(os.path.join(fake_sysfs, 'BAT0'))
+    controller.power.discover()
+    
+    with caplog.at_level(logging.ERROR):
+        assert controller.get_battery_charge_limit() is None
+    assert caplog.records == []
+
+
+def test_failed_read_names_the_attribute(controller, fake_sysfs, caplog):
+    os.remove(os.path.join(fake_sysfs, 'BAT0', 'charge_control_end_threshold'))
+    
+    with caplog.at_level(logging.ERROR):
+        assert controller.get_battery_charge_limit() is None
+    assert os.path.join(fake_sysfs, 'BAT0', 'charge_control_end_threshold') in caplog.text
+
+
+def charge_limit_in_sysfs(fake_sysfs):
+    with open(os.path.join(fake_sysfs, 'BAT0', 'charge_control_end_threshold')) as f:
+        return int(f.read())
+
+
+def test_apply_state_rolls_back_after_a_failure(controller, fake_tools, fake_sysfs, monkeypatch):
+    log = os.path.join(fake_tools, 'calls.log')
+    monkeypatch.setenv('FAKE_TOOL_LOG', log)
+    presets = []
+    controller.connect('status-changed', lambda controller, *args: presets.append(args))
+    
+    # supergfxctl rejects Vfio after the charge limit and profile were written
+    result = controller.apply_state({'charge_limit': 60, 'cpu_profile': 'Quiet', 'gpu_mode': 'Vfio'})
+    
+    assert not result.success
+    assert result.failed == 'gpu_mode'
+    assert 'not supported' in result.error
+    assert result.rolled_back == ['cpu_profile', 'charge_limit']
+    assert result.changed == {}
+    assert presets == [('preset', result.message, False)]
+    # Restored on the hardware, most recent write first
+    with open(log) as f:
+        writes = [line.split(None, 1)[1].strip() for line in f if ' -P ' in line or ' -c ' in line]
+    assert writes == ['-c 60', 'profile -P Quiet', 'profile -P Balanced', '-c 80']
+    assert charge_limit_in_sysfs(fake_sysfs) == 80
+    assert controller.get_state() == {'charge_limit': 80, 'cpu_profile': 'Balanced', 'gpu_mode': 'Hybrid'}
+
+
+def test_apply_state_writes_only_what_differs(controller, fake_sysfs):
+    result = controller.apply_state({'charge_limit': 80, 'cpu_profile': 'Quiet', 'gpu_mode': 'Integrated'})
+    
+    assert result.success
+    assert result.changed == {'cpu_profile': 'Quiet', 'gpu_mode': 'Integrated'}
+    assert result.unchanged == ['charge_limit']
+    assert controller.get_state() == {'charge_limit': 80, 'cpu_profile': 'Quiet', 'gpu_mode': 'Integrated'}
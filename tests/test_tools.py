@@ -0,0 +1,77 @@
+"""
+ToolResolver lookups on PATH and their in-process and persistent caches
+"""
+
+import os
+
+import pytest
+
+from common import FAKE_XRANDR, write_script
+from w_helper import tools
+from w_helper.tools import ToolResolver
+
+
+def forbid_path_search(monkeypatch):
+    """Fail the test if a lookup walks PATH"""
+    monkeypatch.setattr(tools.shutil, 'which', lambda *args, **kwargs: pytest.fail("PATH was searched"))
+
+
+def count_path_searches(monkeypatch) -> list:
+    """Record the tools looked up on PATH"""
+    searched = []
+    which = tools.shutil.which
+    monkeypatch.setattr(tools.shutil, 'which', lambda tool, **kwargs: searched.append(tool) or which(tool, **kwargs))
+    return searched
+
+
+def test_tool_on_path_is_resolved(fake_tools):
+    resolver = ToolResolver()
+    
+    assert resolver.resolve('asusctl') == os.path.join(fake_tools, 'asusctl')
+    assert resolver.exists('supergfxctl')
+    assert resolver.resolve('/usr/bin/env') == '/usr/bin/env'
+
+
+def test_missing_tool(fake_tools):
+    resolver = ToolResolver()
+    
+    assert resolver.resolve('nosuchctl') is None
+    assert resolver.missing(['asusctl', 'nosuchctl', 'supergfxctl']) == ['nosuchctl']
+
+
+def test_lookups_are_cached_until_invalidated(fake_tools, monkeypatch):
+    resolver = ToolResolver()
+    path = resolver.resolve('asusctl')
+    assert resolver.resolve('nosuchctl') is None
+    
+    os.remove(path)
+    write_script(fake_tools, 'nosuchctl', FAKE_XRANDR)
+    with monkeypatch.context() as patch:
+        forbid_path_search(patch)
+        assert resolver.resolve('asusctl') == path
+        assert resolver.resolve('nosuchctl') is None
+        
+    resolver.invalidate('asusctl')
+    assert resolver.resolve('asusctl') is None
+    resolver.invalidate()
+    assert resolver.resolve('nosuchctl') == os.path.join(fake_tools, 'nosuchctl')
+
+
+def test_lookups_persist_across_resolvers(fake_tools, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'tools.json')
+    path = ToolResolver(cache_file=cache_file).resolve('asusctl')
+    
+    with monkeypatch.context() as patch:
+        forbid_path_search(patch)
+        assert ToolResolver(cache_file=cache_file).resolve('asusctl') == path
+        
+    # A changed binary is looked up again
+    os.utime(path, ns=(0, 0))
+    searched = count_path_searches(monkeypatch)
+    assert ToolResolver(cache_file=cache_file).resolve('asusctl') == path
+    assert searched == ['asusctl']
+    
+    # So is everything once PATH changes
+    monkeypatch.setenv('PATH', os.environ['PATH'] + os.pathsep + str(tmp_path))
+    assert ToolResolver(cache_file=cache_file).resolve('asusctl') == path
+    assert searched == ['asusctl', 'asusctl']